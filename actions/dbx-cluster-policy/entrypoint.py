@@ -1,30 +1,48 @@
 #!/usr/local/bin/python
 
-import os, subprocess, json, sys, requests, argparse
+import os, json, sys, argparse, difflib, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import FrozenSet, List, NamedTuple, Optional, Tuple
 
-###---------Functions----------###
-def authenticate_databricks_cli(auth_filename: str):
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dbx-common"))
+from dbx_client import DatabricksClient, DatabricksAPIError
+from dbx_resolver import POLICY
+from dbx_snapshot import SnapshotStore, get_snapshot_store
+
+# Number of policies planned and applied concurrently
+DEFAULT_MAX_WORKERS = 8
+# Keys identifying the principal of an access control list entry
+PRINCIPAL_KEYS = ("user_name", "group_name", "service_principal_name")
+
+Grant = Tuple[str, str]
+
+
+class PolicyPlan(NamedTuple):
     """
-    This method authenticates the Databricks CLI with a Databricks instance.
+    Changes needed to bring one cluster policy in line with its local definition.
     Args:
-        auth_filename (str): filename to be used for the temporary auth file
+        name (str): Cluster policy name
+        policy_id (str): Id of the existing policy, None if it has to be created
+        action (str): "create", "update" or "unchanged"
+        definition_diff (list): Unified diff lines from the remote to the local definition
+        grants_to_add (list): (principal key, principal) pairs missing the CAN_USE permission
     """
-    with open(auth_filename, "x") as tmpFile:
-        tmpFile.write(args.DBX_ACCESS_TOKEN)
-    try:
-        subprocess.check_call(
-            ["databricks", "configure", "-f", auth_filename, "--host", args.DBX_INSTANCE]
-        )
-    except Exception as e:
-        print(str(e))
-        sys.exit(1)
-    finally:
-        os.remove(auth_filename)
 
+    name: str
+    policy_id: Optional[str]
+    action: str
+    definition_diff: List[str]
+    grants_to_add: List[Grant]
+
+    @property
+    def has_changes(self) -> bool:
+        return self.action != "unchanged" or bool(self.grants_to_add)
 
-def build_json_for_cli(cluster_policy_path: str) -> dict:
+
+###---------Functions----------###
+def build_policy_json(cluster_policy_path: str) -> dict:
     """
-    This method builds a JSON dict that will be used to pass into the Cluster CLI.
+    This method builds a JSON dict that will be sent to the Cluster Policies API.
     Args:
         cluster_policy_path (str): Path to cluster policy
     Returns:
@@ -34,200 +52,279 @@ def build_json_for_cli(cluster_policy_path: str) -> dict:
     print("Making json for policy: " + filename)
     policy_name = os.path.splitext(filename)[0]
     print("Policy will be named: " + policy_name)
-    with open(cluster_policy_path, "r+") as local_policy_json_file:
+    with open(cluster_policy_path, "r") as local_policy_json_file:
         policy_definition = json.load(local_policy_json_file)
         local_json = {"name": policy_name, "definition": json.dumps(policy_definition)}
         return local_json
 
 
-def upload_new_cluster_policy(cluster_policy_json: dict):
+def canonicalize_definition(definition, indent: Optional[int] = None) -> str:
     """
-    This method uploads a cluster policy to Databricks using the Databricks CLI
+    This method renders a policy definition as JSON with sorted keys, so equal definitions render identically
     Args:
-        cluster_policy_json (dict): JSON dict that contains the cluster policy
+        definition (str or dict): Policy definition, either parsed or as the JSON string stored by Databricks
+        indent (int, optional): Indentation used to render a readable definition
+    Returns:
+        str: Canonical JSON of the definition
     """
-    print("Attempting to upload cluster policy....")
-    try:
-        if args.DRY_RUN == "false":
-            subprocess.check_call(
-                [
-                    "databricks",
-                    "cluster-policies",
-                    "create",
-                    "--json",
-                    json.dumps(cluster_policy_json),
-                ]
-            )
-        else:
-            print("DRY RUN DETECTED, not actually creating policy")
-    except Exception as e:
-        print(str(e))
-        sys.exit(1)
+    if isinstance(definition, str):
+        definition = json.loads(definition)
+    separators = (",", ": ") if indent is not None else (",", ":")
+    return json.dumps(definition, sort_keys=True, indent=indent, separators=separators)
+
+
+def definition_hash(definition) -> str:
+    """
+    This method returns the content hash of a policy definition, independent of key order and whitespace
+    Args:
+        definition (str or dict): Policy definition
+    Returns:
+        str: SHA-256 hex digest of the canonical definition
+    """
+    return hashlib.sha256(canonicalize_definition(definition).encode("utf-8")).hexdigest()
 
 
-def get_policy_id(policy_name: str):
+def principal_grant(team: str) -> Grant:
     """
-    This method uses the Databricks CLI to get the Policy ID from the name of a Cluster Policy
+    This method maps a CAN_USE input entry to its principal, users are recognized by the @ in their name
+    """
+    return ("user_name" if "@" in team else "group_name", team)
+
+
+def get_policy_index(client: DatabricksClient) -> dict:
+    """
+    This method lists the cluster policies of the Databricks instance once and indexes them by name
     Args:
-        policy_name (str): Cluster policy name to look up
+        client (DatabricksClient): Client for the Databricks instance
     Returns:
-        str: Policy Id if the cluster policy exists otherwise it returns an empty string
-    """
-    list_policy_output_f = subprocess.check_output(
-        ["databricks", "cluster-policies", "list", "--output", "JSON"]
-    )
-    list_policy_output = str(list_policy_output_f.decode(encoding="utf-8"))
-    policy_json = json.loads(list_policy_output)
-    # if no policies exist, assume no policy id
-    if policy_json["total_count"] == 0:
+        dict: Every existing cluster policy, keyed by policy name
+    """
+    policies = client.list_cluster_policies()
+    if not policies:
         print("No existing cluster policies found in given Databricks Instance.")
-        return ""
-    for policy in policy_json["policies"]:
-        if policy["name"] == policy_name:
-            print(
-                "Policy " + policy_name + " found with policy Id " + policy["policy_id"]
-            )
-            return policy["policy_id"]
-    return ""
+    return {policy["name"]: policy for policy in policies}
 
 
-def update_existing_cluster_policy(policy_id: str, cluster_policy_json: dict):
+def get_can_use_grants(client: DatabricksClient, policy_id: str) -> FrozenSet[Grant]:
     """
-    This method uses the Databricks CLI to update an existing cluster policy in Databricks
+    This method returns the principals granted CAN_USE directly on a cluster policy
     Args:
-        cluster_policy_json (dict): JSON dict that contains the cluster policy
-        policy_id (str): Cluster policy id to update
+        client (DatabricksClient): Client for the Databricks instance
+        policy_id (str): Cluster policy id
     Returns:
-        dict: Json Dict representation of cluster policy based on file path
+        frozenset: (principal key, principal) pairs, inherited grants are ignored
     """
-    print("Updating " + cluster_policy_json["name"] + " using policy id " + policy_id)
-    # updating existing json to have policy id for dbx cli requirements
-    local_json = {"policy_id": policy_id}
-    cluster_policy_json.update(local_json)
+    grants = set()
+    for entry in client.get_cluster_policy_permissions(policy_id).get("access_control_list", []):
+        principal_key = next((key for key in PRINCIPAL_KEYS if key in entry), None)
+        if principal_key is None:
+            continue
+        for permission in entry.get("all_permissions", []):
+            if permission.get("permission_level") == "CAN_USE" and not permission.get("inherited", False):
+                grants.add((principal_key, entry[principal_key]))
+    return frozenset(grants)
 
-    print("Policy ID updated in JSON successfully. Updating policy on Databricks....")
-    try:
-        if args.DRY_RUN == "false":
-            subprocess.check_call(
-                [
-                    "databricks",
-                    "cluster-policies",
-                    "edit",
-                    "--json",
-                    json.dumps(cluster_policy_json),
-                ]
+
+def plan_policy(
+    cluster_policy_json: dict, remote_policy: Optional[dict], can_use: List[str], current_grants: FrozenSet[Grant]
+) -> PolicyPlan:
+    """
+    This method compares a local cluster policy with the policy in Databricks
+    Args:
+        cluster_policy_json (dict): JSON dict that contains the local cluster policy
+        remote_policy (dict, optional): The policy of the same name in Databricks, None if it does not exist
+        can_use (list): Teams and users that should have CAN_USE on the policy
+        current_grants (frozenset): Principals currently granted CAN_USE on the policy
+    Returns:
+        PolicyPlan: The changes needed for the policy
+    """
+    name = cluster_policy_json["name"]
+    grants_to_add = [grant for grant in map(principal_grant, can_use) if grant not in current_grants]
+    local_lines = canonicalize_definition(cluster_policy_json["definition"], indent=2).splitlines()
+
+    if remote_policy is None:
+        definition_diff = list(difflib.unified_diff([], local_lines, "remote", "local", lineterm=""))
+        return PolicyPlan(name, None, "create", definition_diff, grants_to_add)
+
+    if definition_hash(remote_policy["definition"]) == definition_hash(cluster_policy_json["definition"]):
+        return PolicyPlan(name, remote_policy["policy_id"], "unchanged", [], grants_to_add)
+
+    remote_lines = canonicalize_definition(remote_policy["definition"], indent=2).splitlines()
+    definition_diff = list(difflib.unified_diff(remote_lines, local_lines, "remote", "local", lineterm=""))
+    return PolicyPlan(name, remote_policy["policy_id"], "update", definition_diff, grants_to_add)
+
+
+def plan_cluster_policies(
+    client: DatabricksClient, cluster_policy_jsons: List[dict], can_use: List[str], max_workers: int = DEFAULT_MAX_WORKERS
+) -> List[PolicyPlan]:
+    """
+    This method plans the changes for every local cluster policy from a single listing of the existing policies.
+    The current CAN_USE grants of existing policies are fetched concurrently, only when CAN_USE is given.
+    Args:
+        client (DatabricksClient): Client for the Databricks instance
+        cluster_policy_jsons (list): JSON dicts of the local cluster policies
+        can_use (list): Teams and users that should have CAN_USE on every policy
+        max_workers (int): Number of permission lookups run concurrently
+    Returns:
+        list: A PolicyPlan per local cluster policy, in the same order
+    """
+    policy_index = get_policy_index(client)
+    existing_names = [policy["name"] for policy in cluster_policy_jsons if policy["name"] in policy_index]
+    current_grants = {}
+    if can_use and existing_names:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            grants = executor.map(
+                lambda name: get_can_use_grants(client, policy_index[name]["policy_id"]), existing_names
             )
-        else:
-            print("DRY RUN DETECTED, not actually updating policy")
-    except Exception as e:
-        print(str(e))
-        sys.exit(1)
+            current_grants = dict(zip(existing_names, grants))
+
+    return [
+        plan_policy(policy, policy_index.get(policy["name"]), can_use, current_grants.get(policy["name"], frozenset()))
+        for policy in cluster_policy_jsons
+    ]
+
 
-def add_group_to_cluster_policy(teams: list, cluster_id: str) -> None:
+def format_plan(plans: List[PolicyPlan]) -> str:
     """
-    This method uses the Databricks API to add the teams/users to permissions as 'CAN USE'
+    This method renders the plans as a diff-style summary of what would change in Databricks
     Args:
-        teams (list): list of teams
-        cluster_id (str): Cluster policy id to update
+        plans (list): The PolicyPlans to render
     Returns:
-        None
+        str: The rendered plan
     """
+    symbols = {"create": "+", "update": "~", "unchanged": "="}
+    lines = []
+    for plan in plans:
+        lines.append(f"{symbols[plan.action]} cluster policy {plan.name} ({plan.action})")
+        lines.extend("    " + line for line in plan.definition_diff)
+        for principal_key, principal in plan.grants_to_add:
+            lines.append(f"+ grant CAN_USE on {plan.name} to {principal_key} {principal}")
+    changes = sum(plan.has_changes for plan in plans)
+    lines.append(f"Plan: {changes} of {len(plans)} cluster policies to change")
+    return "\n".join(lines)
 
-    # Modify args.DBX_INSTANCE for url
-    instance = args.DBX_INSTANCE.rstrip('/')
 
-    # check if the args.DBX_INSTANCE starts with 'https://' and build the URL accordingly
-    url = f"https://{instance}/api/2.0/permissions/cluster-policies/{cluster_id}"
-    if instance.startswith("https://"):
-        url = f"{instance}/api/2.0/permissions/cluster-policies/{cluster_id}"
+def apply_policy_plan(client: DatabricksClient, cluster_policy_json: dict, plan: PolicyPlan) -> str:
+    """
+    This method creates or edits a cluster policy and adds the missing CAN_USE grants, as planned
+    Args:
+        client (DatabricksClient): Client for the Databricks instance
+        cluster_policy_json (dict): JSON dict that contains the cluster policy
+        plan (PolicyPlan): The changes planned for the policy
+    Returns:
+        str: Policy id of the cluster policy
+    """
+    policy_id = plan.policy_id
+    if plan.action == "create":
+        policy_id = client.create_cluster_policy(cluster_policy_json["name"], cluster_policy_json["definition"])
+        print("Policy " + plan.name + " created with policy Id " + policy_id)
+    elif plan.action == "update":
+        client.edit_cluster_policy(policy_id, cluster_policy_json["name"], cluster_policy_json["definition"])
+        print("Policy " + plan.name + " updated using policy Id " + policy_id)
 
-    # create the access list with the right format
-    access_list = [{'user_name' if '@' in team else 'group_name': team, 'permission_level': 'CAN_USE'} for team in teams]
-    
-    # set the request headers
-    headers = {
-        'Authorization': f'Bearer {args.DBX_ACCESS_TOKEN}',
-        'Content-Type': 'application/json'
-    }
-    # send the PATCH request to add the teams to the cluster policy
-    response = requests.patch(url, headers=headers, data=json.dumps({"access_control_list": access_list}))
+    if plan.grants_to_add:
+        access_list = [
+            {principal_key: principal, "permission_level": "CAN_USE"} for principal_key, principal in plan.grants_to_add
+        ]
+        # PATCH adds the grants and keeps the existing ones
+        client.update_cluster_policy_permissions(policy_id, access_list)
+        print("Permissions updated in policy " + plan.name)
+    return policy_id
 
-    try:
-        # Try to parse the response as JSON
-        response_json = response.json()
-
-        # Check if the response JSON contains an error code
-        if "error_code" in response_json:
-            # If it does, print the error code
-            print(response_json['error_code'])
-        else:
-            # If it doesn't, print "SUCCESS"
-            print("SUCCESS")
-    except:
-        # If there's an error parsing the response as JSON, print "ERROR"
-        print("ERROR")
-        print(response.text)
+
+def apply_cluster_policies(
+    client: DatabricksClient,
+    cluster_policy_jsons: List[dict],
+    plans: List[PolicyPlan],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    snapshot_store: Optional[SnapshotStore] = None,
+) -> dict:
+    """
+    This method applies the plans with changes concurrently. A policy that fails is reported without stopping the others.
+    Args:
+        client (DatabricksClient): Client for the Databricks instance
+        cluster_policy_jsons (list): JSON dicts of the local cluster policies
+        plans (list): A PolicyPlan per local cluster policy, in the same order
+        max_workers (int): Number of policies applied concurrently
+        snapshot_store (SnapshotStore, optional): Workspace snapshots to invalidate when policies are created
+    Returns:
+        dict: Exception of every policy that failed, keyed by policy name
+    """
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            plan.name: executor.submit(apply_policy_plan, client, policy, plan)
+            for policy, plan in zip(cluster_policy_jsons, plans)
+            if plan.has_changes
+        }
+        for name, future in futures.items():
+            try:
+                future.result()
+            except DatabricksAPIError as e:
+                print("ERROR: Failed to apply cluster policy " + name + ": " + str(e))
+                failures[name] = e
+    if snapshot_store is not None and any(plan.action == "create" for plan in plans):
+        snapshot_store.invalidate(POLICY)
+    return failures
 
 
 ###----------Main Start-------------###
+if __name__ == "__main__":
+    # Set Argument Variables
+    parser = argparse.ArgumentParser()
+    parser.add_argument("DBX_INSTANCE")
+    parser.add_argument("DBX_ACCESS_TOKEN")
+    parser.add_argument("POLICY_DIR")
+    parser.add_argument("DRY_RUN")
+    parser.add_argument("CAN_USE")
+    parser.add_argument("-w", "--max-workers", type=int, default=DEFAULT_MAX_WORKERS)
+    args = parser.parse_args()
+    # Split CAN_USE into a list, an empty input means no permissions are managed
+    args.CAN_USE = [s.strip() for s in args.CAN_USE.split(",") if s.strip()]
 
-# Set Argument Variables
-parser = argparse.ArgumentParser()
-parser.add_argument("DBX_INSTANCE")
-parser.add_argument("DBX_ACCESS_TOKEN")
-parser.add_argument("POLICY_DIR")
-parser.add_argument("DRY_RUN")
-parser.add_argument("CAN_USE")
-args = parser.parse_args()
-# Split CAN_USE into a list
-args.CAN_USE = [s.strip() for s in args.CAN_USE.split(",")]
-
-# Validate variable values
-print("Validating Input Parameters...")
-if args.DRY_RUN != "true" and args.DRY_RUN != "false":
-    sys.exit('ERROR: Dry run variable must be set to "true" or "false".')
-print("SUCCESS")
-# Validate files exist in policy_dir
-print("Validating scripts exists in provided directory: " + args.POLICY_DIR)
-
-if not os.path.isdir(args.POLICY_DIR):
-    sys.exit("ERROR: " + args.POLICY_DIR + " does not exist!")
-
-if len(os.listdir(args.POLICY_DIR)) == 0:
-    sys.exit("ERROR: " + args.POLICY_DIR + " does not contain any files!")
-print("SUCCESS")
-
-print("Configuring Databricks CLI....")
-auth_filename = "auth"
-authenticate_databricks_cli(auth_filename)
-print("SUCCESS")
-
-print("Verifying files in " + args.POLICY_DIR)
-policy_files = os.listdir(args.POLICY_DIR)
-for file in policy_files:
-    if not file.endswith(".json"):
-        sys.exit(
-            "ERROR: " + file + " must be a JSON file. Please fix file and try again."
-        )
-print("SUCCESS")
-
-for policy in policy_files:
-    policy_full_path = args.POLICY_DIR + "/" + policy
-    print("Generating JSON to match what CLI expects")
-    generated_json = build_json_for_cli(policy_full_path)
-    print("Checking if cluster policy exists already")
-    policy_id = get_policy_id(generated_json["name"])
-    if policy_id == "":
-        print("New Cluster Policy detected. Adding new Policy to Databricks.")
-        upload_new_cluster_policy(generated_json)
-        print("SUCCESS")
+    # Validate variable values
+    print("Validating Input Parameters...")
+    if args.DRY_RUN != "true" and args.DRY_RUN != "false":
+        sys.exit('ERROR: Dry run variable must be set to "true" or "false".')
+    print("SUCCESS")
+    # Validate files exist in policy_dir
+    print("Validating scripts exists in provided directory: " + args.POLICY_DIR)
+
+    if not os.path.isdir(args.POLICY_DIR):
+        sys.exit("ERROR: " + args.POLICY_DIR + " does not exist!")
+
+    if len(os.listdir(args.POLICY_DIR)) == 0:
+        sys.exit("ERROR: " + args.POLICY_DIR + " does not contain any files!")
+    print("SUCCESS")
+
+    print("Verifying files in " + args.POLICY_DIR)
+    policy_files = sorted(os.listdir(args.POLICY_DIR))
+    for file in policy_files:
+        if not file.endswith(".json"):
+            sys.exit(
+                "ERROR: " + file + " must be a JSON file. Please fix file and try again."
+            )
+    print("SUCCESS")
+
+    print("Generating JSON to match what the Cluster Policies API expects")
+    cluster_policy_jsons = [build_policy_json(os.path.join(args.POLICY_DIR, policy)) for policy in policy_files]
+
+    client = DatabricksClient(args.DBX_INSTANCE, args.DBX_ACCESS_TOKEN)
+    print("Planning cluster policy changes")
+    try:
+        plans = plan_cluster_policies(client, cluster_policy_jsons, args.CAN_USE, args.max_workers)
+    except DatabricksAPIError as e:
+        print(str(e))
+        sys.exit(1)
+    print(format_plan(plans))
+
+    if args.DRY_RUN == "true":
+        print("DRY RUN DETECTED, not applying the plan")
     else:
-        print("Updating existing policy on Databricks.")
-        update_existing_cluster_policy(policy_id, generated_json)
-        print("SUCCESS")
-    if args.CAN_USE:
-        policy_id = get_policy_id(generated_json["name"])
-        print("Updating Permissions in Policy.")
-        add_group_to_cluster_policy(args.CAN_USE, policy_id)
-
-print("DONE")
+        failures = apply_cluster_policies(
+            client, cluster_policy_jsons, plans, args.max_workers, get_snapshot_store(args.DBX_INSTANCE)
+        )
+        if failures:
+            sys.exit("ERROR: Failed to apply " + str(len(failures)) + " cluster policies: " + ", ".join(failures))
+
+    print("DONE")
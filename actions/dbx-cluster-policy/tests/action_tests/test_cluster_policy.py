@@ -0,0 +1,96 @@
+import json
+
+from entrypoint import apply_cluster_policies, format_plan, plan_cluster_policies, plan_policy
+
+POLICY_DEFINITION = {
+    "spark_version": {"type": "regex", "pattern": ".*-scala2.12", "hidden": False},
+    "autotermination_minutes": {"type": "fixed", "value": 10},
+}
+
+
+class FakeClient:
+    def __init__(self, policies, grants):
+        self.policies = policies
+        self.grants = grants
+        self.calls = []
+
+    def list_cluster_policies(self):
+        self.calls.append(("list",))
+        return self.policies
+
+    def get_cluster_policy_permissions(self, policy_id):
+        return {
+            "access_control_list": [
+                {"group_name": group, "all_permissions": [{"permission_level": "CAN_USE", "inherited": inherited}]}
+                for group, inherited in self.grants.get(policy_id, [])
+            ]
+        }
+
+    def create_cluster_policy(self, name, definition):
+        self.calls.append(("create", name))
+        return "new-" + name
+
+    def edit_cluster_policy(self, policy_id, name, definition):
+        self.calls.append(("edit", policy_id))
+
+    def update_cluster_policy_permissions(self, policy_id, access_control_list):
+        self.calls.append(("permissions", policy_id, access_control_list))
+
+
+def local_policy(name, definition=POLICY_DEFINITION):
+    return {"name": name, "definition": json.dumps(definition)}
+
+
+def test_plan_policy_ignores_key_order():
+    """
+    This test asserts that a remote definition with the same content in a different key order is unchanged.
+    """
+    remote = {
+        "policy_id": "1",
+        "name": "p",
+        "definition": json.dumps(dict(reversed(list(POLICY_DEFINITION.items()))), indent=4),
+    }
+    plan = plan_policy(local_policy("p"), remote, ["admins"], frozenset({("group_name", "admins")}))
+    assert plan.action == "unchanged"
+    assert not plan.has_changes
+
+
+def test_plan_policy_update_diff():
+    """
+    This test asserts that a changed definition is planned as an update with a diff and only missing grants are added.
+    """
+    changed = dict(POLICY_DEFINITION, autotermination_minutes={"type": "fixed", "value": 30})
+    remote = {"policy_id": "1", "name": "p", "definition": json.dumps(POLICY_DEFINITION)}
+    plan = plan_policy(local_policy("p", changed), remote, ["admins", "a@b.com"], frozenset({("group_name", "admins")}))
+    assert plan.action == "update"
+    assert '-    "value": 10' in plan.definition_diff
+    assert '+    "value": 30' in plan.definition_diff
+    assert plan.grants_to_add == [("user_name", "a@b.com")]
+
+
+def test_plan_and_apply_cluster_policies():
+    """
+    This test asserts that policies are listed once and only the needed creates, edits and grants are sent.
+    """
+    client = FakeClient(
+        [
+            {"policy_id": "1", "name": "same", "definition": json.dumps(POLICY_DEFINITION)},
+            {"policy_id": "2", "name": "changed", "definition": json.dumps({})},
+        ],
+        # the inherited grant cannot satisfy the desired grant on the policy itself
+        {"1": [("admins", False)], "2": [("admins", True)]},
+    )
+    policies = [local_policy("same"), local_policy("changed"), local_policy("new")]
+
+    plans = plan_cluster_policies(client, policies, ["admins"])
+    assert [plan.action for plan in plans] == ["unchanged", "update", "create"]
+    assert "Plan: 2 of 3 cluster policies to change" in format_plan(plans)
+
+    assert apply_cluster_policies(client, policies, plans) == {}
+    assert client.calls.count(("list",)) == 1
+    assert sorted(call for call in client.calls if call[0] != "list") == [
+        ("create", "new"),
+        ("edit", "2"),
+        ("permissions", "2", [{"group_name": "admins", "permission_level": "CAN_USE"}]),
+        ("permissions", "new-new", [{"group_name": "admins", "permission_level": "CAN_USE"}]),
+    ]
@@ -0,0 +1,411 @@
+"""
+Shared Databricks REST client used by the actions in this repository.
+
+One ``requests.Session`` is kept per workspace host, so every call a process makes
+to the same workspace reuses pooled keep-alive connections instead of paying for a
+new TLS handshake per request. Requests to a host also share one ``Throttle``
+(see ``dbx_throttle``), so 429/503 responses are retried and the whole process backs
+off together. Actions import this module by adding the ``actions/dbx-common``
+directory to ``sys.path``.
+"""
+import atexit
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from dbx_throttle import Throttle, is_idempotent
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on pooled connections per host, sized for the worker pools used by the actions
+DEFAULT_POOL_MAXSIZE = 32
+# Largest page size accepted by /api/2.1/jobs/list
+MAX_JOBS_PAGE_SIZE = 100
+# Largest page size accepted by /api/2.1/jobs/runs/list
+MAX_RUNS_PAGE_SIZE = 25
+# Page size requested from /api/2.1/clusters/list
+CLUSTERS_PAGE_SIZE = 100
+
+_sessions: Dict[str, requests.Session] = {}
+_throttles: Dict[str, Throttle] = {}
+_sessions_lock = threading.Lock()
+
+
+class DatabricksAPIError(Exception):
+    """
+    Raised when the Databricks REST API returns a non-2xx response.
+
+    Args:
+        status_code (int): HTTP status code of the response.
+        error_code (str): Databricks error code, or the HTTP reason if none was returned.
+        message (str): Error message returned by the API.
+    """
+
+    def __init__(self, status_code: int, error_code: str, message: str):
+        super().__init__(f"{error_code} :: {message}")
+        self.status_code = status_code
+        self.error_code = error_code
+        self.message = message
+
+
+def normalize_host(host: str) -> str:
+    """
+    Normalize a Databricks workspace URL or hostname to ``https://<hostname>``.
+
+    Accepts bare hostnames, ``http://`` or ``https://`` URLs, trailing slashes and
+    trailing paths or query strings (e.g. ``https://adb-123.7.azuredatabricks.net/?o=123``).
+
+    Args:
+        host (str): Databricks workspace URL or hostname.
+    Returns:
+        str: The workspace base URL.
+    Raises:
+        ValueError: If no hostname can be parsed from the input.
+    """
+    host = host.strip()
+    if "://" not in host:
+        host = "https://" + host
+    netloc = urlparse(host).netloc
+    if not netloc:
+        raise ValueError(f"Invalid Databricks host: {host}")
+    return f"https://{netloc}"
+
+
+def get_session(host: str, pool_maxsize: int = DEFAULT_POOL_MAXSIZE) -> requests.Session:
+    """
+    Return the process-wide pooled session for a Databricks workspace, creating it on first use.
+
+    Args:
+        host (str): Databricks workspace URL or hostname.
+        pool_maxsize (int): Maximum number of pooled connections kept for the host.
+    Returns:
+        requests.Session: Session shared by every caller targeting the same host.
+    """
+    base_url = normalize_host(host)
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize))
+            _sessions[base_url] = session
+    return session
+
+
+def get_throttle(host: str) -> Throttle:
+    """
+    Return the process-wide throttle for a Databricks workspace, creating it on first use.
+
+    Args:
+        host (str): Databricks workspace URL or hostname.
+    Returns:
+        Throttle: Throttle shared by every caller targeting the same host.
+    """
+    base_url = normalize_host(host)
+    with _sessions_lock:
+        throttle = _throttles.get(base_url)
+        if throttle is None:
+            throttle = Throttle()
+            _throttles[base_url] = throttle
+    return throttle
+
+
+def log_throttle_stats() -> None:
+    """
+    Log how much time each workspace's requests spent waiting on throttling.
+    Registered to run at interpreter exit.
+    """
+    for base_url, throttle in _throttles.items():
+        if throttle.stats.requests == 0:
+            continue
+        # surface the summary in scripts that do not configure logging when throttling slowed them down
+        level = logging.WARNING if throttle.stats.throttled_responses else logging.INFO
+        logger.log(level, f"Databricks API throttling for {base_url}: {throttle.stats.summary()}")
+
+
+atexit.register(log_throttle_stats)
+
+
+def _encode_params(params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Drop unset query parameters and encode booleans the way the Databricks API expects.
+    """
+    if params is None:
+        return None
+    return {
+        key: (str(value).lower() if isinstance(value, bool) else value)
+        for key, value in params.items()
+        if value is not None
+    }
+
+
+def parse_response(response: requests.Response) -> Dict[str, Any]:
+    """
+    Return the JSON body of a successful response, raising DatabricksAPIError otherwise.
+    """
+    if not response.ok:
+        try:
+            error_json = response.json()
+            error_code = error_json.get("error_code", response.reason)
+            message = error_json.get("message", response.text)
+        except ValueError:
+            error_code, message = response.reason, response.text
+        raise DatabricksAPIError(response.status_code, error_code, message)
+    if not response.content:
+        return {}
+    return response.json()
+
+
+class DatabricksClient:
+    """
+    Typed wrapper around the Databricks REST endpoints used by the actions.
+
+    Args:
+        host (str): Databricks workspace URL or hostname.
+        token (str): Personal access token for the workspace.
+        pool_maxsize (int): Maximum number of pooled connections kept for the host.
+    """
+
+    def __init__(self, host: str, token: str, pool_maxsize: int = DEFAULT_POOL_MAXSIZE):
+        self.base_url = normalize_host(host)
+        self.hostname = urlparse(self.base_url).netloc
+        self.session = get_session(self.base_url, pool_maxsize)
+        self.throttle = get_throttle(self.base_url)
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        body: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send a request to the workspace over the pooled session. 429 responses, and 503 responses
+        of requests that are safe to repeat, are retried by the host throttle before an error is raised.
+        A body carrying an ``idempotency_token`` makes the request safe to repeat.
+
+        Args:
+            method (str): HTTP method.
+            endpoint (str): API path, e.g. ``/api/2.1/jobs/list``.
+            params (dict, optional): Query parameters. ``None`` values are dropped.
+            body (dict, optional): JSON request body.
+        Returns:
+            dict: Parsed JSON response, or an empty dict for empty responses.
+        Raises:
+            DatabricksAPIError: If the API returns a non-2xx response.
+        """
+        params = _encode_params(params)
+        data = json.dumps(body) if body is not None else None
+        response = self.throttle.call(
+            method,
+            endpoint,
+            lambda: self.session.request(
+                method, self.base_url + endpoint, headers=self.headers, params=params, data=data
+            ),
+            idempotent=is_idempotent(method, endpoint) or bool(body and body.get("idempotency_token")),
+        )
+        return parse_response(response)
+
+    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.request("GET", endpoint, params=params)
+
+    def post(self, endpoint: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.request("POST", endpoint, body=body)
+
+    def put(self, endpoint: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.request("PUT", endpoint, body=body)
+
+    def patch(self, endpoint: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.request("PATCH", endpoint, body=body)
+
+    ###---------Jobs----------###
+    def list_jobs(self, **params: Any) -> Dict[str, Any]:
+        """
+        Return a single page of ``/api/2.1/jobs/list``. Accepts the endpoint's query parameters
+        (``name``, ``limit``, ``page_token``, ``expand_tasks``...).
+        """
+        return self.get("/api/2.1/jobs/list", params=params)
+
+    def iter_jobs(self, **params: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every job in the workspace, following ``next_page_token`` with the largest page size.
+        Pages are fetched lazily, so callers can stop early without listing the whole workspace.
+        """
+        params = {"limit": MAX_JOBS_PAGE_SIZE, **params}
+        while True:
+            response_json = self.list_jobs(**params)
+            yield from response_json.get("jobs", [])
+            if not response_json.get("has_more") or not response_json.get("next_page_token"):
+                return
+            params["page_token"] = response_json["next_page_token"]
+
+    def get_job(self, job_id: int) -> Dict[str, Any]:
+        return self.get("/api/2.1/jobs/get", params={"job_id": job_id})
+
+    def create_job(self, settings: Dict[str, Any]) -> int:
+        """
+        Create a job and return its job ID.
+        """
+        return self.post("/api/2.1/jobs/create", settings)["job_id"]
+
+    def reset_job(self, job_id: int, new_settings: Dict[str, Any]) -> None:
+        """
+        Overwrite every setting of an existing job.
+        """
+        self.post("/api/2.1/jobs/reset", {"job_id": job_id, "new_settings": new_settings})
+
+    def delete_job(self, job_id: int) -> None:
+        self.post("/api/2.1/jobs/delete", {"job_id": job_id})
+
+    ###---------Job Runs----------###
+    def run_now(self, job_id: int, idempotency_token: Optional[str] = None, **params: Any) -> int:
+        """
+        Trigger a run of a job and return its run ID. Requests repeated with the same
+        ``idempotency_token`` return the run already triggered instead of starting another one.
+        """
+        body = {"job_id": job_id, **params}
+        if idempotency_token is not None:
+            body["idempotency_token"] = idempotency_token
+        return self.post("/api/2.1/jobs/run-now", body)["run_id"]
+
+    def get_run(self, run_id: int) -> Dict[str, Any]:
+        return self.get("/api/2.1/jobs/runs/get", params={"run_id": run_id})
+
+    def list_runs(self, **params: Any) -> Dict[str, Any]:
+        """
+        Return a single page of ``/api/2.1/jobs/runs/list``. Accepts the endpoint's query parameters
+        (``job_id``, ``completed_only``, ``start_time_from``, ``limit``, ``page_token``...).
+        """
+        return self.get("/api/2.1/jobs/runs/list", params=params)
+
+    def iter_runs(self, **params: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every run matching the parameters, newest start time first, following ``next_page_token``
+        with the largest page size. Pages are fetched lazily, so callers can stop early.
+        """
+        params = {"limit": MAX_RUNS_PAGE_SIZE, **params}
+        while True:
+            response_json = self.list_runs(**params)
+            yield from response_json.get("runs", [])
+            if not response_json.get("has_more") or not response_json.get("next_page_token"):
+                return
+            params["page_token"] = response_json["next_page_token"]
+
+    def submit_run(self, settings: Dict[str, Any], idempotency_token: Optional[str] = None) -> int:
+        """
+        Submit a one-time run and return its run ID.
+        """
+        body = dict(settings)
+        if idempotency_token is not None:
+            body["idempotency_token"] = idempotency_token
+        return self.post("/api/2.1/jobs/runs/submit", body)["run_id"]
+
+    def cancel_run(self, run_id: int) -> None:
+        self.post("/api/2.1/jobs/runs/cancel", {"run_id": run_id})
+
+    ###---------Clusters----------###
+    def list_clusters(self, **params: Any) -> Dict[str, Any]:
+        """
+        Return a single page of ``/api/2.1/clusters/list``.
+        """
+        return self.get("/api/2.1/clusters/list", params=params)
+
+    def iter_clusters(self, **params: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every cluster in the workspace, following ``next_page_token``.
+        """
+        params = {"page_size": CLUSTERS_PAGE_SIZE, **params}
+        while True:
+            response_json = self.list_clusters(**params)
+            yield from response_json.get("clusters", [])
+            if not response_json.get("next_page_token"):
+                return
+            params["page_token"] = response_json["next_page_token"]
+
+    ###---------SQL Warehouses----------###
+    def list_warehouses(self) -> List[Dict[str, Any]]:
+        return self.get("/api/2.0/sql/warehouses").get("warehouses", [])
+
+    ###---------Permissions----------###
+    def get_job_permissions(self, job_id: Any) -> Dict[str, Any]:
+        return self.get(f"/api/2.0/permissions/jobs/{job_id}")
+
+    def set_job_permissions(self, job_id: Any, access_control_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Replace the access control list of a job.
+        """
+        return self.put(f"/api/2.0/permissions/jobs/{job_id}", {"access_control_list": access_control_list})
+
+    def get_cluster_policy_permissions(self, policy_id: str) -> Dict[str, Any]:
+        return self.get(f"/api/2.0/permissions/cluster-policies/{policy_id}")
+
+    def update_cluster_policy_permissions(
+        self, policy_id: str, access_control_list: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Add entries to the access control list of a cluster policy, keeping existing grants.
+        """
+        return self.patch(
+            f"/api/2.0/permissions/cluster-policies/{policy_id}", {"access_control_list": access_control_list}
+        )
+
+    ###---------Cluster Policies----------###
+    def list_cluster_policies(self) -> List[Dict[str, Any]]:
+        return self.get("/api/2.0/policies/clusters/list").get("policies", [])
+
+    def create_cluster_policy(self, name: str, definition: str) -> str:
+        """
+        Create a cluster policy and return its policy ID.
+        """
+        return self.post("/api/2.0/policies/clusters/create", {"name": name, "definition": definition})["policy_id"]
+
+    def edit_cluster_policy(self, policy_id: str, name: str, definition: str) -> None:
+        self.post(
+            "/api/2.0/policies/clusters/edit", {"policy_id": policy_id, "name": name, "definition": definition}
+        )
+
+    ###---------Model Registry Webhooks----------###
+    def list_registry_webhooks(self, **params: Any) -> Dict[str, Any]:
+        """
+        Return a single page of ``/api/2.0/mlflow/registry-webhooks/list``.
+        """
+        return self.get("/api/2.0/mlflow/registry-webhooks/list", params=params)
+
+    def iter_registry_webhooks(self, **params: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every model registry webhook, following ``next_page_token``.
+        """
+        params = dict(params)
+        while True:
+            response_json = self.list_registry_webhooks(**params)
+            yield from response_json.get("webhooks", [])
+            if not response_json.get("next_page_token"):
+                return
+            params["page_token"] = response_json["next_page_token"]
+
+    def create_registry_webhook(self, webhook: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create a model registry webhook and return the created webhook.
+        """
+        return self.post("/api/2.0/mlflow/registry-webhooks/create", webhook)["webhook"]
+
+    def update_registry_webhook(self, webhook_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Update the given fields of a model registry webhook and return the updated webhook.
+        """
+        return self.patch("/api/2.0/mlflow/registry-webhooks/update", {"id": webhook_id, **changes})["webhook"]
+
+    ###---------Repos----------###
+    def create_repo(self, url: str, path: str, provider: str = "gitHub") -> Dict[str, Any]:
+        """
+        Create a Databricks repo and return the created repo.
+        """
+        return self.post("/api/2.0/repos", {"url": url, "provider": provider, "path": path})
@@ -0,0 +1,204 @@
+"""
+Import-time benchmark of the action entrypoints.
+
+Every entrypoint is started with ``python -X importtime <entrypoint> --help``: argparse exits
+before any work is done, so the run measures only what the script imports at startup. The
+``-X importtime`` report is parsed and the cumulative time of the modules the script imports
+itself (modules already loaded by interpreter startup are left out) is compared with the
+startup budget of the action.
+
+Budgets, in milliseconds of import time (ENTRYPOINT_BUDGETS_MS):
+
+- 250 for the scripts built on dbx_client, which imports requests (about 100 ms on its own).
+- 60 for dbx-sql/run-sql.py, the Databricks SQL connector is imported when the first
+  connection is opened.
+- 60 for the scripts using only the standard library.
+
+The budgets leave headroom over a cold start on a GitHub hosted runner. An entrypoint going
+over budget usually means a heavy dependency (pandas, pyarrow, the SQL connector) is imported
+at module level; import it inside the function that needs it instead.
+
+Usage: python dbx_import_time.py [--repeat 3] [entrypoint ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Optional
+
+ACTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Milliseconds of import time, see the module docstring
+CLIENT_BUDGET_MS = 250
+STDLIB_BUDGET_MS = 60
+
+ENTRYPOINT_BUDGETS_MS = {
+    "dbx-cluster-policy/entrypoint.py": CLIENT_BUDGET_MS,
+    "dbx-get-policy-id/get_policy.py": STDLIB_BUDGET_MS,
+    "dbx-get-run-job-task-job-id/get_run_job_task_job_id.py": CLIENT_BUDGET_MS,
+    "dbx-job-check-for-timeout/check_for_timeout.py": STDLIB_BUDGET_MS,
+    "dbx-job-permissions/job-permissions.py": CLIENT_BUDGET_MS,
+    "dbx-jobs/dbx-delete-job/delete_dbx_job.py": CLIENT_BUDGET_MS,
+    "dbx-jobs/dbx-deploy-job/deploy_dbx_job.py": CLIENT_BUDGET_MS,
+    "dbx-jobs/dbx-jobs-runs-submit/dbx-submit-onetime-job.py": CLIENT_BUDGET_MS,
+    "dbx-jobs/dbx-jobs-runs-submit-composite/dbx-submit-onetime-job.py": CLIENT_BUDGET_MS,
+    "dbx-jobs/dbx-run-job-composite/dbx_run_now.py": CLIENT_BUDGET_MS,
+    "dbx-jobs/dbx-validate-job/validate_dbx_job.py": CLIENT_BUDGET_MS,
+    "dbx-model-registry-webhook/entrypoint.py": CLIENT_BUDGET_MS,
+    "dbx-repos/dbx-create-repo/dbx-create-repo.py": CLIENT_BUDGET_MS,
+    "dbx-resolve-job-ids/resolve_job_ids.py": CLIENT_BUDGET_MS,
+    "dbx-sql/run-sql.py": STDLIB_BUDGET_MS,
+    "prepend-explain-to-query/prepend_explain.py": STDLIB_BUDGET_MS,
+}
+
+DEFAULT_REPEAT = 3
+
+
+class ImportRecord(NamedTuple):
+    """
+    One line of a ``-X importtime`` report.
+
+    Args:
+        module (str): Name of the imported module.
+        self_us (int): Microseconds spent importing the module itself.
+        cumulative_us (int): Microseconds including the modules it imported.
+        depth (int): Nesting level, 0 for modules imported by the script or interpreter directly.
+    """
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+class ImportTime(NamedTuple):
+    """
+    Import time of one entrypoint.
+
+    Args:
+        entrypoint (str): Path of the entrypoint, relative to the actions directory.
+        total_ms (float): Cumulative import time of the modules the entrypoint imported.
+        budget_ms (float, optional): Startup budget of the entrypoint, None if it has none.
+        heaviest (list): Top level imports of the entrypoint, slowest first.
+    """
+
+    entrypoint: str
+    total_ms: float
+    budget_ms: Optional[float]
+    heaviest: List[ImportRecord]
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget_ms is not None and self.total_ms > self.budget_ms
+
+
+def parse_import_time(report: str) -> List[ImportRecord]:
+    """
+    Parse the ``-X importtime`` lines of a stderr capture, ignoring any other output.
+
+    Args:
+        report (str): stderr of a ``python -X importtime`` run.
+    Returns:
+        list: ImportRecord of every import, in report order (a module is listed after its own imports).
+    """
+    records = []
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # the header line, "self [us] | cumulative | imported package"
+            continue
+        name = fields[2][1:]
+        module = name.lstrip(" ")
+        records.append(
+            ImportRecord(module, int(fields[0]), int(fields[1]), (len(name) - len(module)) // 2)
+        )
+    return records
+
+
+def top_level_imports(records: List[ImportRecord], preloaded: frozenset = frozenset()) -> List[ImportRecord]:
+    """
+    Return the top level imports of a report, leaving out the modules in preloaded.
+    """
+    return [record for record in records if record.depth == 0 and record.module not in preloaded]
+
+
+def _run_importtime(args: List[str]) -> List[ImportRecord]:
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        cwd=ACTIONS_DIR,
+        check=True,
+    )
+    return parse_import_time(process.stderr)
+
+
+def interpreter_modules() -> frozenset:
+    """
+    Return the modules imported by interpreter startup, before any script runs.
+    """
+    return frozenset(record.module for record in _run_importtime(["-c", "pass"]))
+
+
+def measure_entrypoint(
+    entrypoint: str, repeat: int = DEFAULT_REPEAT, preloaded: Optional[frozenset] = None
+) -> ImportTime:
+    """
+    Measure the import time of an entrypoint, keeping the fastest of repeat runs to leave out
+    noise from the machine.
+
+    Args:
+        entrypoint (str): Path of the entrypoint, relative to the actions directory.
+        repeat (int): Number of runs.
+        preloaded (frozenset, optional): Modules imported by interpreter startup, measured when not given.
+    Returns:
+        ImportTime: Import time and budget of the entrypoint.
+    """
+    if preloaded is None:
+        preloaded = interpreter_modules()
+    fastest = None
+    for _ in range(repeat):
+        imports = top_level_imports(_run_importtime([entrypoint, "--help"]), preloaded)
+        total_us = sum(record.cumulative_us for record in imports)
+        if fastest is None or total_us < fastest[0]:
+            fastest = (total_us, imports)
+    total_us, imports = fastest
+    heaviest = sorted(imports, key=lambda record: record.cumulative_us, reverse=True)
+    return ImportTime(entrypoint, total_us / 1000, ENTRYPOINT_BUDGETS_MS.get(entrypoint), heaviest)
+
+
+def measure_entrypoints(entrypoints: List[str], repeat: int = DEFAULT_REPEAT) -> Dict[str, ImportTime]:
+    preloaded = interpreter_modules()
+    return {entrypoint: measure_entrypoint(entrypoint, repeat, preloaded) for entrypoint in entrypoints}
+
+
+def format_import_times(import_times: List[ImportTime], heaviest: int = 3) -> str:
+    """
+    Format import times as a table with the slowest imports of each entrypoint.
+    """
+    lines = [f"{'entrypoint':<68} {'ms':>7} {'budget':>7}  slowest imports"]
+    for import_time in import_times:
+        budget = "-" if import_time.budget_ms is None else f"{import_time.budget_ms:.0f}"
+        slowest = ", ".join(
+            f"{record.module} {record.cumulative_us / 1000:.1f}" for record in import_time.heaviest[:heaviest]
+        )
+        flag = "  OVER BUDGET" if import_time.over_budget else ""
+        lines.append(f"{import_time.entrypoint:<68} {import_time.total_ms:>7.1f} {budget:>7}  {slowest}{flag}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of the action entrypoints")
+    parser.add_argument(
+        "entrypoints", nargs="*", help="Entrypoints relative to the actions directory, all budgeted ones by default"
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Runs per entrypoint, the fastest is kept")
+    args = parser.parse_args()
+
+    import_times = measure_entrypoints(args.entrypoints or sorted(ENTRYPOINT_BUDGETS_MS), args.repeat)
+    print(format_import_times(list(import_times.values())))
+    if any(import_time.over_budget for import_time in import_times.values()):
+        sys.exit(1)
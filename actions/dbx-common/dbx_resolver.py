@@ -0,0 +1,254 @@
+"""
+One-pass resolution of the symbolic names used in Databricks job configs into workspace IDs.
+
+Job configs may name the resources they use instead of hard coding workspace specific IDs:
+
+- ``policy_id`` of a ``new_cluster`` (in ``job_clusters`` or on a task) may hold a cluster policy name,
+- ``existing_cluster_id`` of a task may hold a cluster name,
+- ``sql_task.warehouse_id`` may hold a SQL warehouse name,
+- ``run_job_task.job_id`` may hold a job name.
+
+Tasks nested in ``for_each_task`` are walked as well. Every reference of every config is collected
+first, the resource types actually referenced are listed concurrently (once each), and the configs
+are rewritten in memory. References that match neither a name nor an existing ID are returned
+together so callers can report them in one go.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from dbx_client import DatabricksClient
+from dbx_snapshot import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+POLICY = "policy"
+CLUSTER = "cluster"
+WAREHOUSE = "warehouse"
+JOB = "job"
+RESOURCE_KINDS = (POLICY, CLUSTER, WAREHOUSE, JOB)
+
+
+class Reference(NamedTuple):
+    """
+    A field of a job config that refers to a workspace resource.
+
+    Args:
+        kind (str): Resource type, one of RESOURCE_KINDS.
+        value (Any): Current value of the field, a name or an ID. None if the field is missing.
+        container (dict): Object holding the field, updated in place when the reference is resolved.
+        key (str): Name of the field in the container.
+        location (str): Human readable path of the field in the job config.
+    """
+
+    kind: str
+    value: Any
+    container: Dict[str, Any]
+    key: str
+    location: str
+
+
+class ResourceIndex(NamedTuple):
+    """
+    The resources of one type in the workspace.
+
+    Args:
+        ids_by_name (dict): ID of each resource keyed by name. The first resource listed wins for duplicate names.
+        ids (set): Every resource ID, as strings, used to recognise values that already are IDs.
+    """
+
+    ids_by_name: Dict[str, Any]
+    ids: Set[str]
+
+
+# Yields the (name, id) pairs of every resource of a type
+RESOURCE_LISTINGS: Dict[str, Callable[[DatabricksClient], Iterable[Tuple[str, Any]]]] = {
+    POLICY: lambda client: ((policy["name"], policy["policy_id"]) for policy in client.list_cluster_policies()),
+    CLUSTER: lambda client: ((cluster["cluster_name"], cluster["cluster_id"]) for cluster in client.iter_clusters()),
+    WAREHOUSE: lambda client: ((warehouse["name"], warehouse["id"]) for warehouse in client.list_warehouses()),
+    JOB: lambda client: ((job["settings"]["name"], job["job_id"]) for job in client.iter_jobs()),
+}
+
+
+def _iter_new_cluster_references(container: Dict[str, Any], location: str) -> Iterator[Reference]:
+    new_cluster = container.get("new_cluster")
+    if isinstance(new_cluster, dict) and "policy_id" in new_cluster:
+        yield Reference(POLICY, new_cluster["policy_id"], new_cluster, "policy_id", f"{location}.new_cluster.policy_id")
+
+
+def _iter_task_references(task: Dict[str, Any], location: str) -> Iterator[Reference]:
+    if "existing_cluster_id" in task:
+        yield Reference(
+            CLUSTER, task["existing_cluster_id"], task, "existing_cluster_id", f"{location}.existing_cluster_id"
+        )
+    sql_task = task.get("sql_task")
+    if isinstance(sql_task, dict) and "warehouse_id" in sql_task:
+        yield Reference(
+            WAREHOUSE, sql_task["warehouse_id"], sql_task, "warehouse_id", f"{location}.sql_task.warehouse_id"
+        )
+    run_job_task = task.get("run_job_task")
+    if isinstance(run_job_task, dict):
+        # a run job task without a job is reported as unresolved
+        yield Reference(JOB, run_job_task.get("job_id"), run_job_task, "job_id", f"{location}.run_job_task.job_id")
+    yield from _iter_new_cluster_references(task, location)
+    for_each_task = task.get("for_each_task")
+    if isinstance(for_each_task, dict) and isinstance(for_each_task.get("task"), dict):
+        yield from _iter_task_references(for_each_task["task"], f"{location}.for_each_task.task")
+
+
+def collect_references(job_config: Dict[str, Any]) -> List[Reference]:
+    """
+    Walk a job config once and collect every field that refers to a workspace resource.
+
+    Args:
+        job_config (dict): Databricks job config.
+    Returns:
+        list: The references of the job config, in document order.
+    """
+    references = []
+    for job_cluster in job_config.get("job_clusters", []):
+        location = f"job_clusters[{job_cluster.get('job_cluster_key')}]"
+        references.extend(_iter_new_cluster_references(job_cluster, location))
+    for task in job_config.get("tasks", []):
+        references.extend(_iter_task_references(task, f"tasks[{task.get('task_key')}]"))
+    return references
+
+
+def _needs_lookup(reference: Reference) -> bool:
+    # job IDs are integers, a job given by ID needs no listing
+    return reference.value is not None and not (reference.kind == JOB and isinstance(reference.value, int))
+
+
+def referenced_kinds(references: Iterable[Reference]) -> Set[str]:
+    """
+    Return the resource types that must be listed to resolve the given references.
+    """
+    return {reference.kind for reference in references if _needs_lookup(reference)}
+
+
+def build_resource_index(resources: Iterable[Tuple[str, Any]], kind: str) -> ResourceIndex:
+    """
+    Index the (name, id) pairs of one resource type.
+
+    Args:
+        resources (Iterable): (name, id) pairs of the resources.
+        kind (str): Resource type, used in log messages.
+    Returns:
+        ResourceIndex: The resources keyed by name, and their IDs.
+    """
+    ids_by_name = {}
+    ids = set()
+    for name, resource_id in resources:
+        ids.add(str(resource_id))
+        if name in ids_by_name:
+            if ids_by_name[name] != resource_id:
+                logger.warning(f"Multiple {kind}s are named {name}, using {ids_by_name[name]}")
+            continue
+        ids_by_name[name] = resource_id
+    logger.info(f"Indexed {len(ids_by_name)} {kind} names in the workspace")
+    return ResourceIndex(ids_by_name, ids)
+
+
+def list_resources(
+    client: DatabricksClient, kind: str, snapshot_store: Optional[SnapshotStore] = None
+) -> List[Tuple[str, Any]]:
+    """
+    Return the (name, id) pairs of every resource of a type, from the snapshot store when it holds a valid snapshot.
+
+    Args:
+        client (DatabricksClient): Client for the workspace.
+        kind (str): Resource type to list.
+        snapshot_store (SnapshotStore, optional): Snapshots of the workspace, None always lists the workspace.
+    Returns:
+        list: (name, id) pairs of the resources.
+    """
+    if snapshot_store is None:
+        return list(RESOURCE_LISTINGS[kind](client))
+    return snapshot_store.get_or_fetch(kind, lambda: RESOURCE_LISTINGS[kind](client))
+
+
+def fetch_resource_indexes(
+    client: DatabricksClient,
+    kinds: Iterable[str],
+    max_workers: Optional[int] = None,
+    snapshot_store: Optional[SnapshotStore] = None,
+) -> Dict[str, ResourceIndex]:
+    """
+    List the given resource types concurrently, one paginated listing per type.
+
+    Args:
+        client (DatabricksClient): Client for the workspace.
+        kinds (Iterable): Resource types to list.
+        max_workers (int, optional): Number of concurrent listings, defaults to one per type.
+        snapshot_store (SnapshotStore, optional): Snapshots of the workspace to read and refresh.
+    Returns:
+        dict: ResourceIndex of each type.
+    """
+    kinds = sorted(set(kinds))
+    if not kinds:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(kinds)) as executor:
+        futures = {
+            kind: executor.submit(
+                lambda kind: build_resource_index(list_resources(client, kind, snapshot_store), kind), kind
+            )
+            for kind in kinds
+        }
+        return {kind: future.result() for kind, future in futures.items()}
+
+
+def resolve_references(references: List[Reference], indexes: Dict[str, ResourceIndex]) -> List[Reference]:
+    """
+    Rewrite every reference given by name to the ID of the resource, in place.
+
+    Args:
+        references (list): References to resolve.
+        indexes (dict): ResourceIndex of every type needing a lookup.
+    Returns:
+        list: References matching neither a resource name nor an existing ID.
+    """
+    unresolved = []
+    for reference in references:
+        if reference.value is None:
+            unresolved.append(reference)
+            continue
+        if not _needs_lookup(reference):
+            continue
+        index = indexes[reference.kind]
+        if reference.value in index.ids_by_name:
+            resource_id = index.ids_by_name[reference.value]
+            logger.info(f"Resolved {reference.kind} {reference.value} at {reference.location} to {resource_id}")
+            reference.container[reference.key] = resource_id
+        elif str(reference.value) not in index.ids:
+            unresolved.append(reference)
+    return unresolved
+
+
+def resolve_job_configs(
+    client: DatabricksClient,
+    job_configs: Iterable[Dict[str, Any]],
+    kinds: Iterable[str] = RESOURCE_KINDS,
+    max_workers: Optional[int] = None,
+    snapshot_store: Optional[SnapshotStore] = None,
+) -> List[List[Reference]]:
+    """
+    Resolve the names used in job configs into IDs, in place. Each referenced resource type is listed
+    once for all configs, and types that are not referenced by name are not listed at all.
+
+    Args:
+        client (DatabricksClient): Client for the workspace.
+        job_configs (Iterable): Databricks job configs, rewritten in place.
+        kinds (Iterable): Resource types to resolve, references of other types are left untouched.
+        max_workers (int, optional): Number of concurrent listings.
+        snapshot_store (SnapshotStore, optional): Snapshots of the workspace to read and refresh.
+    Returns:
+        list: The unresolved references of each job config, in the order of job_configs.
+    """
+    kinds = set(kinds)
+    references = [
+        [reference for reference in collect_references(job_config) if reference.kind in kinds]
+        for job_config in job_configs
+    ]
+    kinds_to_list = referenced_kinds(reference for config_references in references for reference in config_references)
+    indexes = fetch_resource_indexes(client, kinds_to_list, max_workers, snapshot_store)
+    return [resolve_references(config_references, indexes) for config_references in references]
@@ -0,0 +1,176 @@
+"""
+One-time runs of a job config, once per parameter set of a batch file.
+
+A batch file holds a list of parameter sets such as
+``{"run_name": "us", "task_parameters": {"<task_key>": {"<parameter>": "<value>"}}}``, run_name
+being optional. Every run config is built before anything is submitted, so a batch file naming an
+unknown task fails before any run starts. Runs are then submitted and waited for with at most
+``max_concurrent_runs`` in flight, and every run ends up in the results table, including runs that
+could not be submitted or polled.
+"""
+import copy
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from dbx_client import DatabricksClient
+from dbx_run_poller import RunPoller, result_state
+
+logger = logging.getLogger(__name__)
+
+# Number of batch runs submitted and waited for at the same time
+DEFAULT_MAX_CONCURRENT_RUNS = 8
+# Statuses of runs that did not fail
+PASSING_STATUSES = ("SUCCESS", "SUBMITTED")
+
+
+class BatchRunResult(NamedTuple):
+    """
+    Outcome of one run of a batch.
+
+    Args:
+        run_name (str): Name of the run.
+        run_id (int, optional): ID of the run, None if it could not be submitted.
+        status (str): Result state of the run, SUBMITTED when not polled, SUBMIT_FAILED, POLL_FAILED or TIMEDOUT.
+        polls (int): Number of times the run was polled.
+        seconds (float): Time from submission until the run was seen finished.
+    """
+
+    run_name: str
+    run_id: Optional[int]
+    status: str
+    polls: int
+    seconds: float
+
+    @property
+    def failed(self) -> bool:
+        return self.status not in PASSING_STATUSES
+
+
+def update_notebook_task(task: Dict[str, Any], base_parameters: Dict[str, Any], notebook_path: str) -> None:
+    """
+    Override the notebook path and add base parameters to the notebook task of a job task, in place.
+    """
+    notebook_task = task.setdefault("notebook_task", {})
+    if notebook_path != "":
+        notebook_task["notebook_path"] = notebook_path
+    if base_parameters:
+        notebook_task["base_parameters"] = {**notebook_task.get("base_parameters", {}), **base_parameters}
+
+
+def apply_task_parameters(config_json: Dict[str, Any], task_parameters: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Add base parameters to the notebook tasks of a run config, in place, from a task_key -> parameters mapping.
+
+    Raises:
+        ValueError: If a task key is not in the run config.
+    """
+    tasks_by_key = {task["task_key"]: task for task in config_json["tasks"]}
+    unknown_task_keys = sorted(set(task_parameters) - set(tasks_by_key))
+    if unknown_task_keys:
+        raise ValueError(f"Task keys {', '.join(unknown_task_keys)} are not in the job run config")
+    for task_key, base_parameters in task_parameters.items():
+        update_notebook_task(tasks_by_key[task_key], base_parameters, "")
+
+
+def build_batch_runs(
+    parameter_sets: List[Dict[str, Any]], config_json: Dict[str, Any]
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Build the run config of every parameter set.
+
+    Args:
+        parameter_sets (list): Parameter sets of the batch.
+        config_json (dict): Run config the parameters are applied to, left untouched.
+    Returns:
+        list: (run name, run config) of every parameter set, in order.
+    """
+    base_run_name = config_json.get("run_name", "one-time run")
+    runs = []
+    for index, parameter_set in enumerate(parameter_sets):
+        run_config = copy.deepcopy(config_json)
+        apply_task_parameters(run_config, parameter_set.get("task_parameters", {}))
+        run_config["run_name"] = parameter_set.get("run_name", f"{base_run_name} #{index + 1}")
+        runs.append((run_config["run_name"], run_config))
+    return runs
+
+
+def load_batch_runs(batch_params_path: str, config_json: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Build the run config of every parameter set of a batch file, before anything is submitted.
+    """
+    with open(batch_params_path, "r") as batch_file:
+        return build_batch_runs(json.load(batch_file), config_json)
+
+
+def submit_and_wait(
+    client: DatabricksClient,
+    run_name: str,
+    run_config: Dict[str, Any],
+    poll_for_completion: bool,
+    timeout_seconds: Optional[float],
+) -> BatchRunResult:
+    """
+    Submit one run of a batch and wait for it. A run that cannot be submitted is reported as
+    SUBMIT_FAILED, and one whose state cannot be fetched as POLL_FAILED.
+    """
+    started = time.monotonic()
+    try:
+        # one token per run so throttled retries of the submission cannot start the run twice
+        run_id = client.submit_run(run_config, idempotency_token=uuid.uuid4().hex)
+    except Exception as e:
+        logger.error(f"Failed to submit run {run_name}: {e}")
+        return BatchRunResult(run_name, None, "SUBMIT_FAILED", 0, 0.0)
+    logger.info(f"Submitted run {run_name} with run ID {run_id}")
+    if not poll_for_completion:
+        return BatchRunResult(run_name, run_id, "SUBMITTED", 0, 0.0)
+
+    try:
+        run, stats = RunPoller(client).wait(run_id, timeout_seconds)
+    except Exception as e:
+        logger.error(f"Failed to poll run {run_name} with run ID {run_id}: {e}")
+        return BatchRunResult(run_name, run_id, "POLL_FAILED", 0, time.monotonic() - started)
+    status = "TIMEDOUT" if stats.timed_out else result_state(run)
+    return BatchRunResult(run_name, run_id, status, stats.polls, time.monotonic() - started)
+
+
+def run_batch(
+    client: DatabricksClient,
+    runs: List[Tuple[str, Dict[str, Any]]],
+    poll_for_completion: bool,
+    timeout_seconds: Optional[float] = None,
+    max_concurrent_runs: int = DEFAULT_MAX_CONCURRENT_RUNS,
+) -> List[BatchRunResult]:
+    """
+    Submit the runs of a batch and wait for them, keeping at most max_concurrent_runs in flight.
+
+    Returns:
+        list: BatchRunResult of every run, in the order of runs.
+    """
+    with ThreadPoolExecutor(max_workers=max_concurrent_runs) as executor:
+        return list(
+            executor.map(
+                lambda run: submit_and_wait(client, run[0], run[1], poll_for_completion, timeout_seconds), runs
+            )
+        )
+
+
+def format_results_table(results: List[BatchRunResult]) -> str:
+    """
+    Format the results of a batch as a markdown table, readable in logs and in the job summary.
+    """
+    lines = [
+        "| Run | Run ID | Status | Polls | Minutes |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for result in results:
+        lines.append(
+            f"| {result.run_name} | {result.run_id or '-'} | {result.status} "
+            f"| {result.polls} | {result.seconds / 60:.1f} |"
+        )
+    lines.append("")
+    lines.append(f"{sum(result.failed for result in results)} of {len(results)} runs failed")
+    return "\n".join(lines)
@@ -0,0 +1,179 @@
+"""
+Polling of job runs until they finish, paced by the state of the run.
+
+A run is polled every ``fast_interval`` seconds while it is queued or pending, during the first
+``fast_running_seconds`` of running (short runs are detected quickly), and again once its tasks
+show it is finishing. In between, the delay grows exponentially up to ``max_interval`` with
+jitter, so multi-hour runs cost a few requests per hour instead of one every few seconds.
+
+An optional timeout cancels the run. The number of polls and the detection latency, the time
+between the run ending and the poller noticing, are reported for each run.
+"""
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from dbx_client import DatabricksClient
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_LIFE_CYCLE_STATES = ("TERMINATED", "SKIPPED", "INTERNAL_ERROR")
+WAITING_LIFE_CYCLE_STATES = ("PENDING", "QUEUED", "BLOCKED", "WAITING_FOR_RETRY")
+
+DEFAULT_FAST_INTERVAL = 2.0
+DEFAULT_FAST_RUNNING_SECONDS = 60.0
+DEFAULT_MAX_INTERVAL = 120.0
+DEFAULT_BACKOFF_FACTOR = 2.0
+
+
+class PollStats(NamedTuple):
+    """
+    How a run was waited for.
+
+    Args:
+        polls (int): Number of runs/get requests made.
+        detection_latency (float, optional): Seconds between the end of the run and the poll that saw it,
+            None if the run did not report an end time.
+        timed_out (bool): Whether the run was cancelled because the timeout passed.
+    """
+
+    polls: int
+    detection_latency: Optional[float]
+    timed_out: bool
+
+
+def life_cycle_state(run: Dict[str, Any]) -> str:
+    return run.get("state", {}).get("life_cycle_state", "")
+
+
+def result_state(run: Dict[str, Any]) -> str:
+    """
+    Return the result state of a finished run, falling back to its life cycle state for skipped or failed runs.
+    """
+    state = run.get("state", {})
+    return state.get("result_state", state.get("life_cycle_state", ""))
+
+
+def run_is_finishing(run: Dict[str, Any]) -> bool:
+    """
+    Whether a running run is about to finish: the run is terminating, or none of its tasks is still waiting or running.
+    """
+    if life_cycle_state(run) == "TERMINATING":
+        return True
+    tasks = run.get("tasks", [])
+    return bool(tasks) and all(
+        life_cycle_state(task) in TERMINAL_LIFE_CYCLE_STATES + ("TERMINATING",) for task in tasks
+    )
+
+
+class RunPoller:
+    """
+    Waits for job runs to finish, polling fast at the start and end of a run and backing off in between.
+
+    Args:
+        client (DatabricksClient): Client for the workspace.
+        fast_interval (float): Seconds between polls while the run is waiting, starting or finishing.
+        fast_running_seconds (float): Seconds of running polled at the fast interval before backing off.
+        max_interval (float): Upper bound of the backed off delay.
+        backoff_factor (float): Growth of the delay between consecutive slow polls.
+        clock (Callable): Monotonic clock in seconds.
+        wall_clock (Callable): Seconds since the epoch, compared with the end time reported by the run.
+        sleep (Callable): Sleeps for the given number of seconds.
+        rng (Callable): Returns a random float in [0, 1), used for jitter.
+    """
+
+    def __init__(
+        self,
+        client: DatabricksClient,
+        fast_interval: float = DEFAULT_FAST_INTERVAL,
+        fast_running_seconds: float = DEFAULT_FAST_RUNNING_SECONDS,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.client = client
+        self.fast_interval = fast_interval
+        self.fast_running_seconds = fast_running_seconds
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._sleep = sleep
+        self._rng = rng
+
+    def next_delay(self, run: Dict[str, Any], running_seconds: float, slow_polls: int) -> float:
+        """
+        Return the delay before the next poll of a run that has not finished.
+
+        Args:
+            run (dict): Last state of the run, as returned by runs/get.
+            running_seconds (float): Seconds since the run was first seen running, 0 if it has not started.
+            slow_polls (int): Number of consecutive backed off polls before this one.
+        Returns:
+            float: Seconds to wait.
+        """
+        if (
+            life_cycle_state(run) in WAITING_LIFE_CYCLE_STATES
+            or running_seconds < self.fast_running_seconds
+            or run_is_finishing(run)
+        ):
+            return self.fast_interval
+        delay = min(self.max_interval, self.fast_interval * self.backoff_factor ** (slow_polls + 1))
+        # equal jitter: spread polls of concurrent runs while keeping the delay growing
+        return delay / 2 + self._rng() * delay / 2
+
+    def wait(self, run_id: int, timeout_seconds: Optional[float] = None) -> Tuple[Dict[str, Any], PollStats]:
+        """
+        Poll a run until it reaches a terminal state, cancelling it if the timeout passes first.
+
+        Args:
+            run_id (int): ID of the run.
+            timeout_seconds (float, optional): Seconds to wait before cancelling the run, None waits indefinitely.
+        Returns:
+            tuple: The last state of the run and the PollStats of the wait.
+        """
+        started = self._clock()
+        deadline = started + timeout_seconds if timeout_seconds else None
+        running_since = None
+        slow_polls = 0
+        polls = 0
+        while True:
+            run = self.client.get_run(run_id)
+            polls += 1
+            state = life_cycle_state(run)
+            if state in TERMINAL_LIFE_CYCLE_STATES:
+                stats = PollStats(polls, self._detection_latency(run), False)
+                detection = ""
+                if stats.detection_latency is not None:
+                    detection = f", detected {stats.detection_latency:.1f}s after it ended"
+                logger.info(f"Run {run_id} finished with {result_state(run)} after {polls} polls{detection}")
+                return run, stats
+
+            now = self._clock()
+            if deadline is not None and now >= deadline:
+                logger.error(f"Run {run_id} did not finish within {timeout_seconds:.0f}s, cancelling it")
+                self.client.cancel_run(run_id)
+                return run, PollStats(polls, None, True)
+
+            if state not in WAITING_LIFE_CYCLE_STATES and running_since is None:
+                running_since = now
+            running_seconds = now - running_since if running_since is not None else 0.0
+            delay = self.next_delay(run, running_seconds, slow_polls)
+            slow_polls = slow_polls + 1 if delay > self.fast_interval else 0
+            if deadline is not None:
+                # poll one last time at the deadline before cancelling
+                delay = min(delay, deadline - now)
+
+            logger.info(f"Run {run_id} is {state}, next check in {delay:.0f}s")
+            self._sleep(delay)
+
+    def _detection_latency(self, run: Dict[str, Any]) -> Optional[float]:
+        # end_time is in milliseconds since the epoch, and 0 for runs that never started
+        end_time = run.get("end_time")
+        if not end_time:
+            return None
+        return max(0.0, self._wall_clock() - end_time / 1000)
@@ -0,0 +1,166 @@
+"""
+Workspace metadata snapshots shared by the steps of a workflow job.
+
+The name -> ID pairs of a resource type (jobs, clusters, cluster policies, SQL warehouses) are
+stored as compact JSON files under ``$DBX_SNAPSHOT_DIR/<workspace host>/<type>.json``. Actions set
+``DBX_SNAPSHOT_DIR`` to a directory under the runner temp dir, so a listing done by one step is
+reused by the next steps of the same job instead of listing the workspace again. Without
+``DBX_SNAPSHOT_DIR`` snapshots are disabled and every lookup lists the workspace.
+
+Snapshots expire after ``DBX_SNAPSHOT_TTL_SECONDS`` (default 600, 0 disables snapshots) and must be
+invalidated by any action that creates or deletes a resource of the type. Hits and misses are
+logged at exit.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from dbx_client import normalize_host
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 600.0
+
+Entries = List[Tuple[str, Any]]
+
+_stores: Dict[str, "SnapshotStore"] = {}
+_stores_lock = threading.Lock()
+
+
+class SnapshotStore:
+    """
+    Snapshots of the resources of one workspace.
+
+    Args:
+        host (str): Databricks workspace URL or hostname.
+        directory (str, optional): Root directory of the snapshots, None disables them.
+        ttl (float): Seconds a snapshot stays valid, 0 disables them.
+        clock (Callable): Returns the current time in seconds since the epoch.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        directory: Optional[str],
+        ttl: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.base_url = normalize_host(host)
+        self.enabled = bool(directory) and ttl > 0
+        # one directory per workspace, named after its hostname
+        hostname = self.base_url.split("://", 1)[1]
+        self.directory = os.path.join(directory, re.sub(r"[^\w.-]", "_", hostname)) if self.enabled else None
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str) -> str:
+        return os.path.join(self.directory, f"{kind}.json")
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, kind: str) -> Optional[Entries]:
+        """
+        Return the stored (name, id) pairs of a resource type, or None if there is no valid snapshot.
+        """
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(kind), "r") as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+        age = self._clock() - snapshot.get("fetched_at", 0)
+        if not 0 <= age <= self.ttl:
+            logger.info(f"Snapshot of {kind}s for {self.base_url} expired {age - self.ttl:.0f}s ago")
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        return [(name, resource_id) for name, resource_id in snapshot["entries"]]
+
+    def put(self, kind: str, entries: Iterable[Tuple[str, Any]]) -> Entries:
+        """
+        Store the (name, id) pairs of a resource type and return them as a list.
+        The file is replaced atomically so a concurrent reader never sees a partial snapshot.
+        """
+        entries = [(name, resource_id) for name, resource_id in entries]
+        if not self.enabled:
+            return entries
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot = {"host": self.base_url, "kind": kind, "fetched_at": self._clock(), "entries": entries}
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(",", ":"))
+        os.replace(temp_path, self._path(kind))
+        return entries
+
+    def invalidate(self, kind: str) -> None:
+        """
+        Drop the snapshot of a resource type, to be called after creating or deleting a resource of the type.
+        """
+        if not self.enabled:
+            return
+        try:
+            os.remove(self._path(kind))
+            logger.info(f"Invalidated snapshot of {kind}s for {self.base_url}")
+        except FileNotFoundError:
+            pass
+
+    def get_or_fetch(self, kind: str, fetch: Callable[[], Iterable[Tuple[str, Any]]]) -> Entries:
+        """
+        Return the (name, id) pairs of a resource type from its snapshot, listing the workspace with
+        fetch and storing the result when there is no valid snapshot.
+        """
+        entries = self.get(kind)
+        if entries is not None:
+            logger.info(f"Using snapshot of {len(entries)} {kind}s for {self.base_url}")
+            return entries
+        return self.put(kind, fetch())
+
+
+def get_snapshot_store(host: str) -> SnapshotStore:
+    """
+    Return the process-wide snapshot store of a Databricks workspace, configured from
+    ``DBX_SNAPSHOT_DIR`` and ``DBX_SNAPSHOT_TTL_SECONDS``.
+
+    Args:
+        host (str): Databricks workspace URL or hostname.
+    Returns:
+        SnapshotStore: Store shared by every caller targeting the same host.
+    """
+    base_url = normalize_host(host)
+    with _stores_lock:
+        store = _stores.get(base_url)
+        if store is None:
+            ttl = float(os.environ.get("DBX_SNAPSHOT_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+            store = SnapshotStore(base_url, os.environ.get("DBX_SNAPSHOT_DIR"), ttl)
+            _stores[base_url] = store
+    return store
+
+
+def log_snapshot_stats() -> None:
+    """
+    Log how many workspace listings the snapshots saved. Registered to run at interpreter exit.
+    """
+    for base_url, store in _stores.items():
+        if store.hits or store.misses:
+            logger.info(
+                f"Workspace snapshots for {base_url}: {store.hits} hits (listings saved), {store.misses} misses"
+            )
+
+
+atexit.register(log_snapshot_stats)
@@ -0,0 +1,20 @@
+"""
+Test doubles shared by the test suites of the actions.
+"""
+
+
+class ManualClock:
+    """
+    Manual clock whose sleep advances time instead of blocking, recording every sleep.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
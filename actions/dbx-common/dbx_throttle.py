@@ -0,0 +1,334 @@
+"""
+Client-side throttling for Databricks REST calls.
+
+``Throttle.call`` wraps a single HTTP request with:
+
+- a token bucket per endpoint, so bursts from worker pools are spread out before the
+  workspace starts rejecting them,
+- an adaptive concurrency limit shared by every endpoint of a host, halved whenever the
+  workspace answers 429/503 and raised again one slot at a time as calls succeed,
+- retries of 429/503 responses that honour ``Retry-After`` (capped at ``max_delay``) and
+  otherwise back off exponentially with full jitter.
+
+A 429 means the request was rejected before it was processed, so it is always retried. A 503
+may come back after the workspace acted on the request, so it is only retried for requests
+that are safe to repeat: GET/PUT/DELETE, POSTs to reset/edit/update/delete style endpoints,
+and calls carrying an ``idempotency_token`` (see ``is_idempotent``).
+
+Time spent waiting on each of these is recorded in ``ThrottleStats``.
+"""
+import email.utils
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = (429, 503)
+# Status codes that may be returned after the request was processed
+UNSAFE_RETRY_STATUS_CODES = (503,)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE")
+# Last path segment of POST/PATCH endpoints that overwrite, remove or read a resource
+IDEMPOTENT_ACTIONS = ("get", "list", "reset", "edit", "update", "delete", "cancel")
+
+DEFAULT_RATE_PER_SECOND = 25.0
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+
+def endpoint_key(method: str, endpoint: str) -> str:
+    """
+    Group requests by endpoint, ignoring the IDs embedded in the path.
+    ``/api/2.0/permissions/jobs/123`` and ``/api/2.0/permissions/jobs/456`` share a key.
+
+    Args:
+        method (str): HTTP method.
+        endpoint (str): API path.
+    Returns:
+        str: Key identifying the endpoint.
+    """
+    segments = endpoint.split("?")[0].strip("/").split("/")
+    # keep "api/<version>" and mask every later segment that carries an id
+    segments = segments[:2] + ["*" if re.search(r"\d", segment) else segment for segment in segments[2:]]
+    return f"{method.upper()} /" + "/".join(segments)
+
+
+def is_idempotent(method: str, endpoint: str) -> bool:
+    """
+    Whether repeating a request has the same effect as sending it once.
+    ``POST /api/2.1/jobs/reset`` is, ``POST /api/2.1/jobs/create`` is not.
+
+    Args:
+        method (str): HTTP method.
+        endpoint (str): API path.
+    Returns:
+        bool: True if the request can be retried after it may have been processed.
+    """
+    if method.upper() in IDEMPOTENT_METHODS:
+        return True
+    return endpoint.split("?")[0].rstrip("/").rsplit("/", 1)[-1] in IDEMPOTENT_ACTIONS
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Parse a ``Retry-After`` header given either in seconds or as an HTTP date.
+
+    Args:
+        value (str, optional): Header value.
+        now (datetime, optional): Current time, used for HTTP dates.
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing ``rate`` calls per second with bursts of up to ``capacity``.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take one token, blocking until one is available.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Semaphore whose limit follows additive-increase / multiplicative-decrease.
+
+    The limit is halved (down to ``minimum``) when the workspace throttles a call and
+    grows by one slot after every ``limit`` consecutive successful calls, up to ``maximum``.
+    """
+
+    def __init__(self, maximum: int = DEFAULT_MAX_CONCURRENCY, minimum: int = 1, clock=time.monotonic):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = maximum
+        self._in_flight = 0
+        self._successes = 0
+        self._clock = clock
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """
+        Block until a slot is free under the current limit.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        start = self._clock()
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        return self._clock() - start
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self) -> None:
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+    def on_throttle(self) -> None:
+        with self._condition:
+            self.limit = max(self.minimum, self.limit // 2)
+            self._successes = 0
+
+
+class ThrottleStats:
+    """
+    Counters describing how much a process was slowed down by throttling.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.throttled_responses = 0
+        self.retries = 0
+        self.rate_limit_wait = 0.0
+        self.concurrency_wait = 0.0
+        self.backoff_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, **increments: float) -> None:
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def total_wait(self) -> float:
+        return self.rate_limit_wait + self.concurrency_wait + self.backoff_wait
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} requests, {self.throttled_responses} throttled responses, {self.retries} retries, "
+            f"{self.total_wait:.2f}s waiting on throttling (rate limit {self.rate_limit_wait:.2f}s, "
+            f"concurrency {self.concurrency_wait:.2f}s, backoff {self.backoff_wait:.2f}s)"
+        )
+
+
+class Throttle:
+    """
+    Rate limiting, adaptive concurrency and retries for the requests sent to one workspace.
+
+    Args:
+        rate_per_second (float): Token bucket rate applied to each endpoint.
+        max_concurrency (int): Upper bound of the adaptive concurrency limit.
+        max_retries (int): Retries of a 429/503 response before it is returned to the caller.
+        base_delay (float): Backoff delay of the first retry, doubled on each retry.
+        max_delay (float): Cap of the exponential backoff delay.
+        endpoint_rates (dict, optional): Rate overrides keyed by ``endpoint_key``.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        endpoint_rates: Optional[Dict[str, float]] = None,
+        sleep=time.sleep,
+        clock=time.monotonic,
+    ):
+        self.rate_per_second = rate_per_second
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.endpoint_rates = endpoint_rates or {}
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency, clock=clock)
+        self.stats = ThrottleStats()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self._sleep = sleep
+        self._clock = clock
+
+    def _bucket(self, key: str) -> TokenBucket:
+        with self._buckets_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate = self.endpoint_rates.get(key, self.rate_per_second)
+                bucket = TokenBucket(rate, clock=self._clock, sleep=self._sleep)
+                self._buckets[key] = bucket
+        return bucket
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Delay before retry number ``attempt`` (starting at 0). ``Retry-After`` is honoured as a
+        minimum up to ``max_delay``, so a bad header cannot stall the caller for hours. Otherwise
+        the delay is drawn uniformly up to the capped exponential backoff.
+        """
+        retry_after_seconds = parse_retry_after(retry_after)
+        if retry_after_seconds is not None:
+            return min(self.max_delay, retry_after_seconds + random.uniform(0, self.base_delay))
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(
+        self,
+        method: str,
+        endpoint: str,
+        send: Callable[[], requests.Response],
+        idempotent: Optional[bool] = None,
+    ) -> requests.Response:
+        """
+        Send a request through the throttle, retrying 429 responses, and 503 responses of idempotent requests.
+
+        Args:
+            method (str): HTTP method, used to pick the endpoint bucket.
+            endpoint (str): API path, used to pick the endpoint bucket.
+            send (Callable): Sends the request and returns the response.
+            idempotent (bool, optional): Whether the request is safe to repeat, by default ``is_idempotent``.
+        Returns:
+            requests.Response: The first non-retryable response, or the last response once
+            retries are exhausted.
+        """
+        bucket = self._bucket(endpoint_key(method, endpoint))
+        if idempotent is None:
+            idempotent = is_idempotent(method, endpoint)
+        attempt = 0
+        while True:
+            rate_limit_wait = bucket.acquire()
+            concurrency_wait = self.limiter.acquire()
+            try:
+                response = send()
+            finally:
+                self.limiter.release()
+            self.stats.record(requests=1, rate_limit_wait=rate_limit_wait, concurrency_wait=concurrency_wait)
+
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                self.limiter.on_success()
+                return response
+
+            self.limiter.on_throttle()
+            self.stats.record(throttled_responses=1)
+            if response.status_code in UNSAFE_RETRY_STATUS_CODES and not idempotent:
+                logger.warning(
+                    f"{method} {endpoint} returned {response.status_code}, not retried as it may have been applied"
+                )
+                return response
+            if attempt >= self.max_retries:
+                logger.warning(f"{method} {endpoint} still throttled after {attempt} retries")
+                return response
+
+            delay = self.backoff_delay(attempt, response.headers.get("Retry-After"))
+            logger.info(
+                f"{method} {endpoint} returned {response.status_code}, retrying in {delay:.2f}s "
+                f"(concurrency limit {self.limiter.limit})"
+            )
+            self.stats.record(retries=1, backoff_wait=delay)
+            self._sleep(delay)
+            attempt += 1
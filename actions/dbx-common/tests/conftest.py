@@ -0,0 +1,8 @@
+import pytest
+
+from dbx_testing import ManualClock
+
+
+@pytest.fixture
+def clock():
+    return ManualClock()
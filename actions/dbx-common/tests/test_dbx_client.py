@@ -0,0 +1,121 @@
+import pytest
+import requests
+
+from dbx_client import (
+    DatabricksAPIError,
+    DatabricksClient,
+    _encode_params,
+    parse_response,
+    get_session,
+    normalize_host,
+)
+
+
+def make_response(status_code, content):
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = "Reason"
+    response._content = content.encode("utf-8")
+    return response
+
+
+@pytest.mark.parametrize(
+    "host",
+    [
+        "adb-123.7.azuredatabricks.net",
+        "adb-123.7.azuredatabricks.net/",
+        "http://adb-123.7.azuredatabricks.net",
+        "https://adb-123.7.azuredatabricks.net/",
+        "https://adb-123.7.azuredatabricks.net/?o=123",
+        " https://adb-123.7.azuredatabricks.net ",
+    ],
+)
+def test_normalize_host(host):
+    """
+    This test asserts that every accepted host format is normalized to the same base URL.
+    """
+    assert normalize_host(host) == "https://adb-123.7.azuredatabricks.net"
+
+
+def test_normalize_host_invalid():
+    with pytest.raises(ValueError):
+        normalize_host("https://")
+
+
+def test_session_shared_per_host():
+    """
+    This test asserts that clients for the same workspace share one pooled session.
+    """
+    first = DatabricksClient("adb-1.7.azuredatabricks.net", "token-a")
+    second = DatabricksClient("https://adb-1.7.azuredatabricks.net/", "token-b")
+    other = DatabricksClient("adb-2.7.azuredatabricks.net", "token-a")
+
+    assert first.session is second.session
+    assert first.session is get_session("adb-1.7.azuredatabricks.net")
+    assert first.session is not other.session
+    assert first.hostname == "adb-1.7.azuredatabricks.net"
+
+
+def test_encode_params():
+    assert _encode_params(None) is None
+    assert _encode_params({"completed_only": True, "name": None, "limit": 100}) == {
+        "completed_only": "true",
+        "limit": 100,
+    }
+
+
+def test_parse_response():
+    assert parse_response(make_response(200, '{"job_id": 1}')) == {"job_id": 1}
+    assert parse_response(make_response(200, "")) == {}
+
+    with pytest.raises(DatabricksAPIError) as error:
+        parse_response(make_response(400, '{"error_code": "INVALID_PARAMETER_VALUE", "message": "bad"}'))
+    assert error.value.status_code == 400
+    assert str(error.value) == "INVALID_PARAMETER_VALUE :: bad"
+
+    with pytest.raises(DatabricksAPIError) as error:
+        parse_response(make_response(502, "<html>Bad Gateway</html>"))
+    assert error.value.error_code == "Reason"
+
+
+def test_iter_jobs_follows_page_token(monkeypatch):
+    """
+    This test asserts that iter_jobs pages with next_page_token and the maximum page size.
+    """
+    pages = {
+        None: {"jobs": [{"job_id": 1}, {"job_id": 2}], "has_more": True, "next_page_token": "page-2"},
+        "page-2": {"jobs": [{"job_id": 3}], "has_more": False},
+    }
+    calls = []
+
+    def fake_list_jobs(**params):
+        calls.append(dict(params))
+        return pages[params.get("page_token")]
+
+    client = DatabricksClient("adb-1.7.azuredatabricks.net", "token")
+    monkeypatch.setattr(client, "list_jobs", fake_list_jobs)
+
+    assert [job["job_id"] for job in client.iter_jobs()] == [1, 2, 3]
+    assert calls == [{"limit": 100}, {"limit": 100, "page_token": "page-2"}]
+
+
+def test_iter_runs_stops_when_consumer_stops(monkeypatch):
+    """
+    This test asserts that iter_runs pages with next_page_token and only fetches the pages that are consumed.
+    """
+    pages = {
+        None: {"runs": [{"run_id": 1}], "has_more": True, "next_page_token": "page-2"},
+        "page-2": {"runs": [{"run_id": 2}], "has_more": False},
+    }
+    calls = []
+
+    def fake_list_runs(**params):
+        calls.append(dict(params))
+        return pages[params.get("page_token")]
+
+    client = DatabricksClient("adb-1.7.azuredatabricks.net", "token")
+    monkeypatch.setattr(client, "list_runs", fake_list_runs)
+
+    assert next(client.iter_runs(job_id=7))["run_id"] == 1
+    assert calls == [{"limit": 25, "job_id": 7}]
+    assert [run["run_id"] for run in client.iter_runs(job_id=7)] == [1, 2]
@@ -0,0 +1,48 @@
+from dbx_import_time import (
+    ENTRYPOINT_BUDGETS_MS,
+    format_import_times,
+    measure_entrypoints,
+    parse_import_time,
+    top_level_imports,
+)
+
+REPORT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _json
+import time:       300 |        420 | json
+import time:        80 |         80 |     urllib3.util
+import time:       500 |        580 |   urllib3
+import time:      1000 |       1580 | requests
+usage: script.py [-h]
+"""
+
+
+def test_parse_import_time():
+    """
+    This test asserts that import time reports are parsed with the nesting of every import,
+    and that only the top level imports not loaded by the interpreter are kept.
+    """
+    records = parse_import_time(REPORT)
+
+    assert [(record.module, record.depth) for record in records] == [
+        ("_json", 1),
+        ("json", 0),
+        ("urllib3.util", 2),
+        ("urllib3", 1),
+        ("requests", 0),
+    ]
+    assert records[-1].self_us == 1000 and records[-1].cumulative_us == 1580
+    assert [record.module for record in top_level_imports(records, frozenset({"json"}))] == ["requests"]
+
+
+def test_entrypoints_within_import_budget():
+    """
+    This test asserts that every action entrypoint starts within its import time budget, and that
+    no entrypoint loads pandas or the Databricks SQL connector at startup.
+    """
+    import_times = measure_entrypoints(sorted(ENTRYPOINT_BUDGETS_MS))
+
+    over_budget = [import_time for import_time in import_times.values() if import_time.over_budget]
+    assert not over_budget, format_import_times(over_budget)
+    for import_time in import_times.values():
+        modules = {record.module.split(".")[0] for record in import_time.heaviest}
+        assert not modules & {"pandas", "pyarrow", "databricks"}, import_time.entrypoint
@@ -0,0 +1,97 @@
+import threading
+
+from dbx_resolver import CLUSTER, JOB, POLICY, WAREHOUSE, collect_references, resolve_job_configs
+
+
+class FakeClient:
+    def __init__(self):
+        self.listed = []
+        self._lock = threading.Lock()
+
+    def _record(self, kind):
+        with self._lock:
+            self.listed.append(kind)
+
+    def list_cluster_policies(self):
+        self._record(POLICY)
+        return [{"name": "small", "policy_id": "P1"}]
+
+    def iter_clusters(self):
+        self._record(CLUSTER)
+        yield {"cluster_name": "shared", "cluster_id": "0101-abc"}
+
+    def list_warehouses(self):
+        self._record(WAREHOUSE)
+        return [{"name": "reporting", "id": "wh1"}]
+
+    def iter_jobs(self):
+        self._record(JOB)
+        yield {"job_id": 42, "settings": {"name": "upstream"}}
+
+
+def job_config():
+    return {
+        "name": "job",
+        "job_clusters": [{"job_cluster_key": "main", "new_cluster": {"policy_id": "small"}}],
+        "tasks": [
+            {"task_key": "a", "existing_cluster_id": "shared", "sql_task": {"warehouse_id": "reporting"}},
+            {"task_key": "b", "run_job_task": {"job_id": "upstream"}},
+            {
+                "task_key": "loop",
+                "for_each_task": {
+                    "inputs": "[1, 2]",
+                    "task": {
+                        "task_key": "inner",
+                        "existing_cluster_id": "0101-abc",
+                        "sql_task": {"warehouse_id": "missing"},
+                    },
+                },
+            },
+        ],
+    }
+
+
+def test_collect_references():
+    """
+    This test asserts that references in job clusters, tasks and nested for each tasks are collected in one walk.
+    """
+    references = collect_references(job_config())
+    assert [(reference.kind, reference.value, reference.location) for reference in references] == [
+        (POLICY, "small", "job_clusters[main].new_cluster.policy_id"),
+        (CLUSTER, "shared", "tasks[a].existing_cluster_id"),
+        (WAREHOUSE, "reporting", "tasks[a].sql_task.warehouse_id"),
+        (JOB, "upstream", "tasks[b].run_job_task.job_id"),
+        (CLUSTER, "0101-abc", "tasks[loop].for_each_task.task.existing_cluster_id"),
+        (WAREHOUSE, "missing", "tasks[loop].for_each_task.task.sql_task.warehouse_id"),
+    ]
+
+
+def test_resolve_job_configs():
+    """
+    This test asserts that names are rewritten to IDs, existing IDs are kept and unresolved names are returned together.
+    """
+    client = FakeClient()
+    config = job_config()
+    unresolved = resolve_job_configs(client, [config])
+
+    assert sorted(client.listed) == sorted([POLICY, CLUSTER, WAREHOUSE, JOB])
+    assert config["job_clusters"][0]["new_cluster"]["policy_id"] == "P1"
+    assert config["tasks"][0]["existing_cluster_id"] == "0101-abc"
+    assert config["tasks"][0]["sql_task"]["warehouse_id"] == "wh1"
+    assert config["tasks"][1]["run_job_task"]["job_id"] == 42
+    assert config["tasks"][2]["for_each_task"]["task"]["existing_cluster_id"] == "0101-abc"
+    assert [(reference.kind, reference.value) for reference in unresolved[0]] == [(WAREHOUSE, "missing")]
+
+
+def test_resolve_job_configs_lists_only_referenced_kinds():
+    """
+    This test asserts that only the resource types referenced by name in the selected kinds are listed.
+    """
+    client = FakeClient()
+    config = {
+        "name": "job",
+        "tasks": [{"task_key": "a", "run_job_task": {"job_id": 7}, "existing_cluster_id": "shared"}],
+    }
+    assert resolve_job_configs(client, [config], kinds=[JOB, POLICY]) == [[]]
+    assert client.listed == []
+    assert config["tasks"][0]["existing_cluster_id"] == "shared"
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+from dbx_run_batch import BatchRunResult, build_batch_runs, format_results_table, run_batch
+
+CONFIG = {
+    "run_name": "scoring",
+    "tasks": [
+        {"task_key": "extract", "notebook_task": {"notebook_path": "/extract", "base_parameters": {"env": "dev"}}},
+        {"task_key": "score", "notebook_task": {"notebook_path": "/score"}},
+    ],
+}
+
+
+class FakeClient:
+    """
+    Submits runs that finish immediately, recording the largest number of submissions in flight.
+    Runs named in fail_polls cannot be polled.
+    """
+
+    def __init__(self, fail_polls=()):
+        self.fail_polls = fail_polls
+        self.run_names = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def submit_run(self, settings, idempotency_token=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            run_id = len(self.run_names) + 1
+            self.run_names[run_id] = settings["run_name"]
+        # give the other workers time to submit while this one is in flight
+        threading.Event().wait(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        return run_id
+
+    def get_run(self, run_id):
+        if self.run_names[run_id] in self.fail_polls:
+            raise ConnectionError("connection reset")
+        return {"state": {"life_cycle_state": "TERMINATED", "result_state": "SUCCESS"}}
+
+
+def test_build_batch_runs():
+    """
+    This test asserts that task parameters are merged into the notebook task of each task key,
+    leaving the base config untouched, and that runs are named from the parameter set or their position.
+    """
+    runs = build_batch_runs(
+        [
+            {"run_name": "us", "task_parameters": {"extract": {"region": "us"}, "score": {"model": "v2"}}},
+            {"task_parameters": {"extract": {"region": "eu"}}},
+        ],
+        CONFIG,
+    )
+
+    assert [run_name for run_name, _ in runs] == ["us", "scoring #2"]
+    us_tasks = runs[0][1]["tasks"]
+    assert us_tasks[0]["notebook_task"]["base_parameters"] == {"env": "dev", "region": "us"}
+    assert us_tasks[1]["notebook_task"]["base_parameters"] == {"model": "v2"}
+    assert "base_parameters" not in runs[1][1]["tasks"][1]["notebook_task"]
+    assert CONFIG["tasks"][0]["notebook_task"]["base_parameters"] == {"env": "dev"}
+
+
+def test_build_batch_runs_unknown_task_key():
+    """
+    This test asserts that a parameter set naming a task missing from the config is rejected.
+    """
+    with pytest.raises(ValueError, match="missing"):
+        build_batch_runs([{"task_parameters": {"missing": {}}}], CONFIG)
+
+
+def test_run_batch_caps_concurrency_and_reports_poll_failures():
+    """
+    This test asserts that at most max_concurrent_runs runs are in flight, and that a run that
+    cannot be polled is reported as failed without stopping the batch.
+    """
+    client = FakeClient(fail_polls=("run 3",))
+    runs = [(f"run {i}", {**CONFIG, "run_name": f"run {i}"}) for i in range(8)]
+
+    results = run_batch(client, runs, poll_for_completion=True, max_concurrent_runs=2)
+
+    assert client.max_in_flight == 2
+    assert [result.run_name for result in results] == [run_name for run_name, _ in runs]
+    assert [result.status for result in results if result.failed] == ["POLL_FAILED"]
+    assert results[3].run_id is not None
+
+
+def test_format_results_table():
+    """
+    This test asserts that every run is listed and the failed runs are counted.
+    """
+    table = format_results_table(
+        [
+            BatchRunResult("us", 1, "SUCCESS", 3, 90.0),
+            BatchRunResult("eu", None, "SUBMIT_FAILED", 0, 0.0),
+            BatchRunResult("apac", 3, "SUBMITTED", 0, 0.0),
+        ]
+    )
+
+    assert table.splitlines()[2] == "| us | 1 | SUCCESS | 3 | 1.5 |"
+    assert table.splitlines()[3] == "| eu | - | SUBMIT_FAILED | 0 | 0.0 |"
+    assert table.splitlines()[-1] == "1 of 3 runs failed"
@@ -0,0 +1,85 @@
+from dbx_run_poller import RunPoller
+
+
+class FakeClient:
+    """
+    Serves a scripted timeline of run states, each holding until the given time.
+    """
+
+    def __init__(self, clock, timeline, end_time=None):
+        self.clock = clock
+        self.timeline = timeline
+        self.end_time = end_time
+        self.cancelled = []
+
+    def get_run(self, run_id):
+        for until, run in self.timeline:
+            if self.clock.now < until:
+                return run
+        return {
+            "state": {"life_cycle_state": "TERMINATED", "result_state": "SUCCESS"},
+            "end_time": self.end_time,
+        }
+
+    def cancel_run(self, run_id):
+        self.cancelled.append(run_id)
+
+
+def running(*task_states):
+    return {
+        "state": {"life_cycle_state": "RUNNING"},
+        "tasks": [{"state": {"life_cycle_state": state}} for state in task_states],
+    }
+
+
+def make_poller(client, clock):
+    return RunPoller(client, clock=clock, wall_clock=lambda: 10_000 + clock.now, sleep=clock.sleep, rng=lambda: 1.0)
+
+
+def test_short_run_is_detected_quickly(clock):
+    """
+    This test asserts that a queued then short run is polled at the fast interval and its detection latency reported.
+    """
+    client = FakeClient(
+        clock,
+        [(4, {"state": {"life_cycle_state": "QUEUED"}}), (9, running("RUNNING"))],
+        end_time=(10_000 + 9) * 1000,
+    )
+
+    run, stats = make_poller(client, clock).wait(1)
+
+    assert run["state"]["result_state"] == "SUCCESS"
+    assert set(clock.sleeps) == {2.0}
+    assert stats.polls == 6
+    assert stats.detection_latency == 1.0
+    assert not stats.timed_out
+
+
+def test_long_run_backs_off_and_speeds_up_when_finishing(clock):
+    """
+    This test asserts that polls back off exponentially up to the cap during a long run
+    and return to the fast interval once every task is terminating.
+    """
+    client = FakeClient(clock, [(1200, running("RUNNING", "TERMINATED")), (1500, running("TERMINATING", "TERMINATED"))])
+
+    _, stats = make_poller(client, clock).wait(1)
+
+    slow = [seconds for seconds in clock.sleeps if seconds > 2.0]
+    assert slow[:6] == [4.0, 8.0, 16.0, 32.0, 64.0, 120.0]
+    assert max(slow) == 120.0
+    assert clock.sleeps[-1] == 2.0
+    assert len(slow) < 20
+    assert stats.polls == len(clock.sleeps) + 1
+
+
+def test_timeout_cancels_run(clock):
+    """
+    This test asserts that a run still going at the timeout is polled at the deadline, then cancelled.
+    """
+    client = FakeClient(clock, [(10_000, running("RUNNING"))])
+
+    _, stats = make_poller(client, clock).wait(7, timeout_seconds=300)
+
+    assert stats.timed_out
+    assert client.cancelled == [7]
+    assert clock.now == 300
@@ -0,0 +1,60 @@
+from dbx_resolver import JOB, fetch_resource_indexes
+from dbx_snapshot import SnapshotStore
+
+
+def test_snapshot_store_ttl_and_invalidation(clock, tmp_path):
+    """
+    This test asserts that snapshots are reused within their TTL, refetched once expired or invalidated, and counted.
+    """
+    store = SnapshotStore("https://adb-1.7.azuredatabricks.net/?o=1", str(tmp_path), ttl=60, clock=clock)
+    fetches = []
+
+    def fetch():
+        fetches.append(clock.now)
+        return [("job_a", 1), ("job_b", 2)]
+
+    assert store.get_or_fetch(JOB, fetch) == [("job_a", 1), ("job_b", 2)]
+    assert (tmp_path / "adb-1.7.azuredatabricks.net" / "job.json").exists()
+    # a new store for the same host, as in a later workflow step, reads the snapshot
+    later_step = SnapshotStore("adb-1.7.azuredatabricks.net", str(tmp_path), ttl=60, clock=clock)
+    assert later_step.get_or_fetch(JOB, fetch) == [("job_a", 1), ("job_b", 2)]
+    assert len(fetches) == 1
+
+    clock.now += 61
+    later_step.get_or_fetch(JOB, fetch)
+    assert len(fetches) == 2
+
+    later_step.invalidate(JOB)
+    later_step.get_or_fetch(JOB, fetch)
+    assert len(fetches) == 3
+    assert (store.hits, store.misses) == (0, 1)
+    assert (later_step.hits, later_step.misses) == (1, 2)
+
+
+def test_snapshot_store_disabled():
+    """
+    This test asserts that without a snapshot directory every lookup lists the workspace.
+    """
+    store = SnapshotStore("adb-1.7.azuredatabricks.net", None)
+    assert store.get_or_fetch(JOB, lambda: [("job_a", 1)]) == [("job_a", 1)]
+    assert store.get(JOB) is None
+    store.invalidate(JOB)
+
+
+def test_fetch_resource_indexes_uses_snapshot(tmp_path):
+    """
+    This test asserts that the resolver reads resource listings from the snapshot store.
+    """
+
+    class FakeClient:
+        listings = 0
+
+        def iter_jobs(self):
+            FakeClient.listings += 1
+            yield {"job_id": 42, "settings": {"name": "upstream"}}
+
+    store = SnapshotStore("adb-1.7.azuredatabricks.net", str(tmp_path))
+    for _ in range(2):
+        indexes = fetch_resource_indexes(FakeClient(), [JOB], snapshot_store=store)
+        assert indexes[JOB].ids_by_name == {"upstream": 42}
+    assert FakeClient.listings == 1
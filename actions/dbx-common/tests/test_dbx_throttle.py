@@ -0,0 +1,136 @@
+from datetime import datetime, timezone
+
+import requests
+
+from dbx_throttle import (
+    AdaptiveConcurrencyLimiter,
+    Throttle,
+    TokenBucket,
+    endpoint_key,
+    is_idempotent,
+    parse_retry_after,
+)
+
+
+def make_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    return response
+
+
+def test_endpoint_key():
+    assert endpoint_key("get", "/api/2.1/jobs/list") == "GET /api/2.1/jobs/list"
+    assert endpoint_key("PUT", "/api/2.0/permissions/jobs/123") == endpoint_key("PUT", "/api/2.0/permissions/jobs/456")
+    assert endpoint_key("PATCH", "/api/2.0/permissions/cluster-policies/E06216CAA0000360") == (
+        "PATCH /api/2.0/permissions/cluster-policies/*"
+    )
+
+
+def test_parse_retry_after():
+    now = datetime(2024, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("Mon, 01 Jan 2024 00:00:30 GMT", now=now) == 30.0
+    assert parse_retry_after("not a date") is None
+
+
+def test_token_bucket_spreads_bursts(clock):
+    """
+    This test asserts that a burst beyond the bucket capacity waits for tokens to refill.
+    """
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2:] == [0.5, 0.5]
+    assert clock.now == 1.0
+
+
+def test_concurrency_limiter_aimd():
+    """
+    This test asserts that the limit is halved on throttling and grows back by one slot per window of successes.
+    """
+    limiter = AdaptiveConcurrencyLimiter(maximum=8)
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    limiter.on_throttle()
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 1
+
+    for _ in range(1 + 2 + 3):
+        limiter.on_success()
+    assert limiter.limit == 4
+
+
+def test_throttle_retries_throttled_responses(clock):
+    """
+    This test asserts that 429/503 responses are retried, honouring Retry-After, and that the wait is reported.
+    """
+    throttle = Throttle(rate_per_second=1000, base_delay=0, sleep=clock.sleep, clock=clock)
+    responses = iter([make_response(429, {"Retry-After": "3"}), make_response(503), make_response(200)])
+
+    response = throttle.call("GET", "/api/2.1/jobs/list", lambda: next(responses))
+
+    assert response.status_code == 200
+    assert clock.sleeps == [3.0, 0.0]
+    assert throttle.stats.requests == 3
+    assert throttle.stats.retries == 2
+    assert throttle.stats.throttled_responses == 2
+    assert throttle.stats.backoff_wait == 3.0
+    assert throttle.limiter.limit == 8
+
+
+def test_throttle_gives_up_after_max_retries(clock):
+    throttle = Throttle(max_retries=2, sleep=clock.sleep, clock=clock)
+
+    response = throttle.call("POST", "/api/2.1/jobs/create", lambda: make_response(429))
+
+    assert response.status_code == 429
+    assert throttle.stats.requests == 3
+    assert throttle.stats.retries == 2
+
+
+def test_throttle_does_not_retry_client_errors():
+    throttle = Throttle()
+    calls = []
+
+    def send():
+        calls.append(1)
+        return make_response(400)
+
+    assert throttle.call("GET", "/api/2.1/jobs/get", send).status_code == 400
+    assert len(calls) == 1
+
+
+def test_throttle_only_retries_unavailable_idempotent_requests(clock):
+    """
+    This test asserts that a 503 is only retried for requests that are safe to repeat, while a 429 always is.
+    """
+    assert is_idempotent("PUT", "/api/2.0/permissions/jobs/1")
+    assert is_idempotent("POST", "/api/2.1/jobs/reset")
+    assert not is_idempotent("POST", "/api/2.1/jobs/create")
+    assert not is_idempotent("POST", "/api/2.1/jobs/run-now")
+
+    throttle = Throttle(rate_per_second=1000, base_delay=0, sleep=clock.sleep, clock=clock)
+    responses = iter([make_response(429), make_response(503), make_response(200)])
+    assert throttle.call("POST", "/api/2.1/jobs/create", lambda: next(responses)).status_code == 503
+    assert throttle.stats.requests == 2
+
+    responses = iter([make_response(503), make_response(200)])
+    response = throttle.call("POST", "/api/2.1/jobs/run-now", lambda: next(responses), idempotent=True)
+    assert response.status_code == 200
+
+
+def test_throttle_caps_retry_after(clock):
+    """
+    This test asserts that a Retry-After longer than max_delay is capped.
+    """
+    throttle = Throttle(rate_per_second=1000, max_delay=30, sleep=clock.sleep, clock=clock)
+    responses = iter([make_response(429, {"Retry-After": "7200"}), make_response(200)])
+
+    assert throttle.call("GET", "/api/2.1/jobs/list", lambda: next(responses)).status_code == 200
+    assert clock.sleeps == [30]
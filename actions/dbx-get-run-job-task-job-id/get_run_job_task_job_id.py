@@ -1,11 +1,36 @@
 import argparse
 import json
 import logging
-import requests
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dbx-common"))
+from dbx_client import DatabricksClient
+from dbx_resolver import JOB
+from dbx_snapshot import get_snapshot_store
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Up to this many referenced job names are looked up one by one with jobs/list?name=,
+# more are found with a single scan of the workspace jobs
+TARGETED_LOOKUP_MAX_NAMES = 4
+# Number of concurrent targeted lookups
+DEFAULT_MAX_WORKERS = 4
+
+
+def get_referenced_job_names(job_configs: list) -> set:
+    """
+    Returns the job names referenced by the run job tasks of the given job configs.
+    """
+    return {
+        task["run_job_task"]["job_id"]
+        for job_config in job_configs
+        for task in job_config["tasks"]
+        if isinstance(task.get("run_job_task", {}).get("job_id"), str)
+    }
+
 def get_job_id(job_config: dict, jobs_in_workspace: list) -> dict:
     """
     This method is used to override the job ID in the run_job_task field of a run job task. It takes the job_config
@@ -60,17 +85,72 @@ def get_job_id(job_config: dict, jobs_in_workspace: list) -> dict:
     return job_config
 
 class Databricks:
-    def __init__(self, instance_url, token):
-        self.instance_url = instance_url.rstrip('/')
-        self.headers = {
-            "Authorization": f"Bearer {token}"
-        }
+    def __init__(self, instance_url, token, max_workers=DEFAULT_MAX_WORKERS):
+        self.client = DatabricksClient(instance_url, token)
+        # name -> job_id snapshot written by earlier steps of the workflow job, if any
+        self.snapshot_store = get_snapshot_store(instance_url)
+        self.max_workers = max_workers
 
     def list_jobs(self):
-        url = f"{self.instance_url}/api/2.1/jobs/list"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return [response.json()]
+        """
+        Returns every job in the workspace as a single page
+        """
+        return [{"jobs": list(self.client.iter_jobs())}]
+
+    def find_jobs(self, job_names):
+        """
+        Returns the workspace jobs named in job_names, in the page format of list_jobs.
+        The lookup strategy depends on the number of names: a few names are looked up in parallel with
+        jobs/list?name=, more are found by one scan of the workspace jobs that stops once every name is found.
+        Names found in a valid workspace snapshot are not looked up again. The snapshot may predate jobs
+        created since, so names missing from it are looked up in the workspace.
+        """
+        job_names = set(job_names)
+        if not job_names:
+            return []
+
+        jobs = []
+        snapshot = self.snapshot_store.get(JOB)
+        if snapshot is not None:
+            logger.info(f"Looking up {len(job_names)} job names in the workspace snapshot")
+            jobs = [
+                {"job_id": job_id, "settings": {"name": job_name}}
+                for job_name, job_id in snapshot
+                if job_name in job_names
+            ]
+            job_names -= {job["settings"]["name"] for job in jobs}
+            if job_names:
+                logger.info(f"{len(job_names)} job names are not in the workspace snapshot")
+        if len(job_names) > TARGETED_LOOKUP_MAX_NAMES:
+            jobs.extend(self._scan_jobs(job_names))
+        elif job_names:
+            jobs.extend(self._lookup_jobs_by_name(job_names))
+        return [{"jobs": jobs}]
+
+    def _lookup_jobs_by_name(self, job_names):
+        logger.info(f"Looking up {len(job_names)} job names with targeted jobs/list requests")
+
+        def lookup(job_name):
+            # the name filter is case insensitive, keep exact matches only
+            return [job for job in self.client.iter_jobs(name=job_name) if job["settings"]["name"] == job_name]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return [job for jobs in executor.map(lookup, sorted(job_names)) for job in jobs]
+
+    def _scan_jobs(self, job_names):
+        logger.info(f"Scanning workspace jobs for {len(job_names)} job names")
+        remaining_names = set(job_names)
+        jobs = []
+        scanned = 0
+        for job in self.client.iter_jobs():
+            scanned += 1
+            if job["settings"]["name"] in remaining_names:
+                jobs.append(job)
+                remaining_names.discard(job["settings"]["name"])
+                if not remaining_names:
+                    logger.info(f"Found every referenced job after scanning {scanned} jobs")
+                    break
+        return jobs
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -87,21 +167,24 @@ if __name__ == "__main__":
         help="Personal access token for the databricks instance",
     )
     parser.add_argument(
-        "-j", "--job-path", required=True, help="Path to the job JSON file."
+        "-j", "--job-path", required=True, nargs="+", help="Paths to the job JSON files."
     )
 
     args = parser.parse_args()
 
-    # Load job JSON file
-    with open(args.job_path) as f:
-        job = json.load(f)
+    # Load job JSON files
+    job_configs = []
+    for job_path in args.job_path:
+        with open(job_path) as f:
+            job_configs.append(json.load(f))
 
-    # fetch jobs in the DBX workspace
+    # fetch the referenced jobs in the DBX workspace
     db_conn = Databricks(args.dbx_instance_url, args.dbx_token)
-    jobs_in_workspace = db_conn.list_jobs()
+    jobs_in_workspace = db_conn.find_jobs(get_referenced_job_names(job_configs))
 
-    job = get_job_id(job, jobs_in_workspace)
+    job_configs = [get_job_id(job, jobs_in_workspace) for job in job_configs]
 
-    # Save the updated job back to the JSON file
-    with open(args.job_path, "w") as f:
-        json.dump(job, f)
+    # Save the updated jobs back to the JSON files
+    for job_path, job in zip(args.job_path, job_configs):
+        with open(job_path, "w") as f:
+            json.dump(job, f)
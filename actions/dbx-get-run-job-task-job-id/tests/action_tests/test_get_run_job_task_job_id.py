@@ -1,4 +1,6 @@
-from get_run_job_task_job_id import get_job_id
+from get_run_job_task_job_id import Databricks, get_job_id, get_referenced_job_names
+from dbx_resolver import JOB
+from dbx_snapshot import SnapshotStore
 import pytest
 import json
 
@@ -93,3 +95,95 @@ def test_get_job_id_missing_job_id(jobs_in_workspace):
 
     with pytest.raises(SystemExit):
         get_job_id(job, jobs_in_workspace)
+
+
+class FakeJobsClient:
+    """
+    Serves the jobs/list pages of a workspace and records the jobs returned.
+    """
+
+    def __init__(self, job_names):
+        self.jobs = [{"job_id": index, "settings": {"name": name}} for index, name in enumerate(job_names)]
+        self.name_filters = []
+        self.jobs_returned = 0
+
+    def iter_jobs(self, name=None):
+        self.name_filters.append(name)
+        for job in self.jobs:
+            if name is None or job["settings"]["name"].lower() == name.lower():
+                self.jobs_returned += 1
+                yield job
+
+
+def get_db_conn(client):
+    db_conn = Databricks("https://adb-1.azuredatabricks.net", "token")
+    db_conn.client = client
+    return db_conn
+
+
+def test_find_jobs_targeted_lookup():
+    """
+    This test asserts that a few job names are looked up with name filtered requests and exact name matches only.
+    """
+    client = FakeJobsClient(["brand_test", "BRAND_TEST", "run_job_task_test", "other"])
+
+    jobs_in_workspace = get_db_conn(client).find_jobs({"brand_test", "run_job_task_test"})
+
+    assert sorted(client.name_filters) == ["brand_test", "run_job_task_test"]
+    assert sorted(job["job_id"] for job in jobs_in_workspace[0]["jobs"]) == [0, 2]
+
+
+def test_find_jobs_scan_stops_early():
+    """
+    This test asserts that many job names are found with one unfiltered scan that stops once every name is found.
+    """
+    client = FakeJobsClient([f"job_{index}" for index in range(1000)])
+    job_names = {f"job_{index}" for index in range(10)}
+
+    jobs_in_workspace = get_db_conn(client).find_jobs(job_names)
+
+    assert client.name_filters == [None]
+    assert client.jobs_returned == 10
+    assert {job["settings"]["name"] for job in jobs_in_workspace[0]["jobs"]} == job_names
+
+
+def test_find_jobs_looks_up_names_missing_from_snapshot(tmp_path):
+    """
+    This test asserts that names found in the workspace snapshot are not looked up again, and that a job
+    created after the snapshot was written is still found in the workspace.
+    """
+    client = FakeJobsClient(["brand_test", "new_job"])
+    db_conn = get_db_conn(client)
+    db_conn.snapshot_store = SnapshotStore("https://adb-1.azuredatabricks.net", str(tmp_path))
+    db_conn.snapshot_store.put(JOB, [("brand_test", 7)])
+
+    jobs_in_workspace = db_conn.find_jobs({"brand_test", "new_job"})
+
+    assert client.name_filters == ["new_job"]
+    assert sorted((job["settings"]["name"], job["job_id"]) for job in jobs_in_workspace[0]["jobs"]) == [
+        ("brand_test", 7),
+        ("new_job", 1),
+    ]
+
+
+def test_get_referenced_job_names(jobs_in_workspace):
+    """
+    This test asserts that the job names referenced by several job configs are collected once and resolved.
+    """
+    jobs = [
+        {"name": "first", "tasks": [{"task_key": "a", "run_job_task": {"job_id": "brand_test"}}]},
+        {
+            "name": "second",
+            "tasks": [
+                {"task_key": "b", "run_job_task": {"job_id": "brand_test"}},
+                {"task_key": "c", "run_job_task": {"job_id": "run_job_task_test"}},
+                {"task_key": "d", "notebook_task": {"notebook_path": "/x"}},
+            ],
+        },
+    ]
+
+    assert get_referenced_job_names(jobs) == {"brand_test", "run_job_task_test"}
+    assert [task["run_job_task"]["job_id"] for task in get_job_id(jobs[1], jobs_in_workspace)["tasks"][:2]] == [
+        5678,
+        1234,
+    ]
@@ -1,8 +1,18 @@
 import json
+import os
+import queue
 import sys
-import requests
+import threading
 import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dbx-common"))
+from dbx_client import DatabricksClient
+
+# Keys identifying the principal of an access control list entry
+PRINCIPAL_KEYS = ("user_name", "group_name", "service_principal_name")
+# Number of concurrent permission update workers
+DEFAULT_MAX_WORKERS = 8
+
 
 def convert_ud_permissions_to_dbx_json(ud_permission_json):
     """
@@ -54,86 +64,170 @@ def update_job_permissions(job_id, access_control_list, databricks_url, databric
         dry_run (bool, optional): Whether to perform a dry run. Defaults to False.
 
     Raises:
-        Exception: If the HTTP response code is not 200.
+        DatabricksAPIError: If the HTTP response code is not 200.
     """
-    # Remove the last slash if it exists from the URL using rstrip
-    databricks_url = databricks_url.rstrip("/")
-    headers = {
-        'Authorization': f'Bearer {databricks_token}',
-        'Content-Type': 'application/json'
-    }
-
-    if databricks_url.startswith("https://"):
-        dbx_api_url = f"{databricks_url}/api/2.0/permissions/jobs/{job_id}"
-    elif databricks_url.startswith("http://"):
-        dbx_api_url = f"{databricks_url.replace('http://', 'https://')}/api/2.0/permissions/jobs/{job_id}"
-    else:
-        dbx_api_url = f"https://{databricks_url}/api/2.0/permissions/jobs/{job_id}"
-
     print(f"Updating permissions for Job ID: {job_id}")
     # This PUT request overrides the existing permissions
     if dry_run:
         print(f"DRY RUN DETECTED: Not updating permissions for Job ID: {job_id}")
         return
 
-    response = requests.put(dbx_api_url, headers=headers, data=access_control_list)
-
-    if response.status_code != 200:
-        raise Exception(f"{response.json()['error_code']} :: {response.json()['message']}")
+    client = DatabricksClient(databricks_url, databricks_token)
+    client.set_job_permissions(job_id, json.loads(access_control_list)["access_control_list"])
 
     print("SUCCESS")
 
 
-def get_all_job_ids(databricks_url, databricks_token):
+def normalize_access_control_list(access_control_list):
     """
-    Get all job IDs from a provided Databricks workspace.
+    Normalize an access control list so two lists can be compared regardless of entry order.
+
+    Accepts both the request format (entries with a permission_level) and the permissions API
+    response format (entries with all_permissions). Inherited permissions are ignored since they
+    cannot be set on the job itself.
+
+    Args:
+        access_control_list (list): Access control list entries.
+
+    Returns:
+        frozenset: Set of (principal type, principal, permission level) tuples.
+    """
+    normalized_entries = set()
+    for entry in access_control_list:
+        principal_key = next((key for key in PRINCIPAL_KEYS if key in entry), None)
+        if principal_key is None:
+            continue
+        if "permission_level" in entry:
+            permission_levels = [entry["permission_level"]]
+        else:
+            permission_levels = [
+                permission["permission_level"]
+                for permission in entry.get("all_permissions", [])
+                if not permission.get("inherited", False)
+            ]
+        for permission_level in permission_levels:
+            normalized_entries.add((principal_key, entry[principal_key], permission_level.upper()))
+    return frozenset(normalized_entries)
+
+
+def job_permissions_differ(job_id, access_control_list, databricks_url, databricks_token):
+    """
+    Check whether the current permissions of a job differ from the desired access control list.
 
     Args:
+        job_id (str): Job ID to check.
+        access_control_list (str): Databricks Jobs API JSON representation of access control list.
         databricks_url (str): Databricks URL.
-        databricks_token (str): Databricks Access Token.
+        databricks_token (str): Databricks access token.
 
     Returns:
-        list: List of all job IDs in the Databricks workspace.
+        bool: True if the job's effective access control list differs from the desired one.
 
     Raises:
-        Exception: If the HTTP response code is not 200.
+        DatabricksAPIError: If the HTTP response code is not 200.
     """
-    job_ids = []
-
-    # Sanitize Databricks URL
-    databricks_url = databricks_url.rstrip("/")
-    headers = {
-        'Authorization': f'Bearer {databricks_token}',
-        'Content-Type': 'application/json'
-    }
-
-    # Create the Databricks API URL
-    if databricks_url.startswith("https://"):
-        dbx_api_url = f"{databricks_url}/api/2.1/jobs/list"
-    elif databricks_url.startswith("http://"):
-        dbx_api_url = f"{databricks_url.replace('http://', 'https://')}/api/2.1/jobs/list"
-    else:
-        dbx_api_url = f"https://{databricks_url}/api/2.1/jobs/list"
-
-    job_response_limit = 25
-    params = {"limit": job_response_limit}
-    print("Getting all Job IDs from Databricks...")
-    while True:
-        response = requests.get(dbx_api_url, headers=headers, params=params)
+    client = DatabricksClient(databricks_url, databricks_token)
+    current_acl = client.get_job_permissions(job_id).get("access_control_list", [])
+    desired_acl = json.loads(access_control_list)["access_control_list"]
+    return normalize_access_control_list(current_acl) != normalize_access_control_list(desired_acl)
+
+
+def apply_job_permissions(
+    job_ids,
+    access_control_list,
+    databricks_url,
+    databricks_token,
+    dry_run=False,
+    reconcile=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+):
+    """
+    Update the permissions of every job through a pool of workers, continuing past jobs that fail.
+
+    Job IDs are consumed from the iterable through a bounded queue, so updates start as soon as the
+    first IDs are produced and memory stays flat however many jobs the iterable yields.
+
+    Args:
+        job_ids (iterable): Job IDs to update permissions for, e.g. the get_all_job_ids generator.
+        access_control_list (str): Databricks Jobs API JSON representation of access control list.
+        databricks_url (str): Databricks URL.
+        databricks_token (str): Databricks access token.
+        dry_run (bool, optional): Whether to perform a dry run. Defaults to False.
+        reconcile (bool, optional): Only update jobs whose current permissions differ. Defaults to False.
+        max_workers (int, optional): Number of concurrent workers. Defaults to DEFAULT_MAX_WORKERS.
 
-        if response.status_code != 200:
-            raise Exception(f"{response.json()['error_code']} :: {response.json()['message']}")
+    Returns:
+        dict: Number of jobs that were unchanged, updated and failed.
 
-        for job in response.json().get("jobs", []):
-            job_ids.append(job["job_id"])
+    Raises:
+        DatabricksAPIError: If producing the job IDs fails.
+    """
+    summary = {"unchanged": 0, "updated": 0, "failed": 0}
+    summary_lock = threading.Lock()
+    job_id_queue = queue.Queue(maxsize=max_workers * 2)
+    # Marks the end of the job IDs for a worker
+    stop = object()
+
+    def apply(job_id):
+        try:
+            if reconcile and not job_permissions_differ(job_id, access_control_list, databricks_url, databricks_token):
+                print(f"Permissions already up to date for Job ID: {job_id}")
+                return "unchanged"
+            update_job_permissions(job_id, access_control_list, databricks_url, databricks_token, dry_run)
+            return "updated"
+        except Exception as e:
+            print(f"ERROR: Failed to update permissions for Job ID {job_id}: {str(e)}")
+            return "failed"
+
+    def worker():
+        while True:
+            job_id = job_id_queue.get()
+            if job_id is stop:
+                return
+            result = apply(job_id)
+            with summary_lock:
+                summary[result] += 1
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(max_workers)]
+    for thread in workers:
+        thread.start()
+    try:
+        for job_id in job_ids:
+            job_id_queue.put(job_id)
+    finally:
+        for _ in workers:
+            job_id_queue.put(stop)
+        for thread in workers:
+            thread.join()
+    return summary
 
-        if not response.json().get("has_more"):
-            break
-        print(f"Retrieved {len(job_ids)} Job IDs so far. More jobs exist. Getting more...")
-        params["offset"] = params.get("offset", 0) + job_response_limit
 
-    print("SUCCESS")
-    return job_ids
+def get_all_job_ids(databricks_url, databricks_token):
+    """
+    Get all job IDs from a provided Databricks workspace.
+
+    Pages through the workspace with token pagination and the largest page size, yielding
+    each page's IDs as soon as it arrives.
+
+    Args:
+        databricks_url (str): Databricks URL.
+        databricks_token (str): Databricks Access Token.
+
+    Yields:
+        int: Job IDs in the Databricks workspace.
+
+    Raises:
+        DatabricksAPIError: If the HTTP response code is not 200.
+    """
+    client = DatabricksClient(databricks_url, databricks_token)
+
+    print("Getting all Job IDs from Databricks...")
+    job_count = 0
+    for job in client.iter_jobs():
+        job_count += 1
+        yield job["job_id"]
+
+    print(f"Retrieved {job_count} Job IDs")
 
 
 def main():
@@ -146,6 +240,8 @@ def main():
     parser.add_argument('-u', '--databricks-url', type=str, help='Databricks URL containing the jobs')
     parser.add_argument('-p', '--jobs-permissions-json', type=str, help='Path to JSON file containing job permissions')
     parser.add_argument('--dry-run', action='store_true', help='Dry run, do not apply changes')
+    parser.add_argument('--reconcile', action='store_true', help='Only update jobs whose current permissions differ')
+    parser.add_argument('-w', '--max-workers', type=int, default=DEFAULT_MAX_WORKERS, help='Number of concurrent permission update workers')
     # --all-jobs and --job-id cannot be used together
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('-a', '--all-jobs', action='store_true', help='Add permissions to all jobs')
@@ -157,15 +253,29 @@ def main():
             ud_json = json.load(file)
         access_control_list = convert_ud_permissions_to_dbx_json(ud_json)
         if args.job_id:
-            update_job_permissions(args.job_id, access_control_list, args.databricks_url, args.databricks_token, args.dry_run)
+            job_ids = [args.job_id]
         else:
-            job_id_list = get_all_job_ids(args.databricks_url, args.databricks_token)
-            if len(job_id_list) == 0:
-                print("No jobs found to update. Exiting...")
-                sys.exit(0)
-            print(f"Found {len(job_id_list)} jobs. Updating permissions for all jobs...")
-            for job_id in job_id_list:
-                update_job_permissions(job_id, access_control_list, args.databricks_url, args.databricks_token, args.dry_run)
+            print("Updating permissions for all jobs as they are listed...")
+            job_ids = get_all_job_ids(args.databricks_url, args.databricks_token)
+
+        summary = apply_job_permissions(
+            job_ids,
+            access_control_list,
+            args.databricks_url,
+            args.databricks_token,
+            args.dry_run,
+            args.reconcile,
+            args.max_workers,
+        )
+        if sum(summary.values()) == 0:
+            print("No jobs found to update. Exiting...")
+            sys.exit(0)
+        print(
+            f"SUMMARY: {summary['unchanged']} unchanged, {summary['updated']} updated, {summary['failed']} failed"
+            + (" (dry run)" if args.dry_run else "")
+        )
+        if summary["failed"]:
+            sys.exit(1)
 
     except FileNotFoundError:
         print(f"ERROR: Jobs permissions JSON file not found: {args.jobs_permissions_json}")
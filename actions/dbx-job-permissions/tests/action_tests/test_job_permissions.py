@@ -0,0 +1,147 @@
+import importlib.util
+import json
+import os
+import threading
+import time
+
+import pytest
+
+# job-permissions.py is not importable by name because of the hyphen
+spec = importlib.util.spec_from_file_location(
+    "job_permissions", os.path.join(os.path.dirname(__file__), "..", "..", "job-permissions.py")
+)
+job_permissions = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(job_permissions)
+
+
+@pytest.fixture
+def access_control_list():
+    with open("./tests/job-permission.json", "r") as file:
+        return job_permissions.convert_ud_permissions_to_dbx_json(json.load(file))
+
+
+@pytest.fixture
+def current_acl():
+    """
+    Permissions API response matching tests/job-permission.json, in a different order and with inherited entries.
+    """
+    return [
+        {
+            "user_name": "sureshbabu.elumalai@tredence.co",
+            "all_permissions": [{"permission_level": "IS_OWNER", "inherited": False}],
+        },
+        {
+            "group_name": "admins",
+            "all_permissions": [
+                {"permission_level": "CAN_MANAGE", "inherited": True, "inherited_from_object": ["/jobs/"]},
+                {"permission_level": "CAN_MANAGE_RUN", "inherited": False},
+            ],
+        },
+        {"group_name": "users", "all_permissions": [{"permission_level": "CAN_VIEW", "inherited": False}]},
+        {
+            "user_name": "sureshbabu.elumalai@tredence.com",
+            "all_permissions": [{"permission_level": "CAN_MANAGE", "inherited": False}],
+        },
+    ]
+
+
+def test_normalize_access_control_list(access_control_list, current_acl):
+    """
+    This test asserts that the desired and current ACLs compare equal when only order and inherited entries differ.
+    """
+    desired_acl = json.loads(access_control_list)["access_control_list"]
+
+    assert job_permissions.normalize_access_control_list(desired_acl) == (
+        job_permissions.normalize_access_control_list(current_acl)
+    )
+
+    current_acl[2]["all_permissions"][0]["permission_level"] = "CAN_MANAGE_RUN"
+    assert job_permissions.normalize_access_control_list(desired_acl) != (
+        job_permissions.normalize_access_control_list(current_acl)
+    )
+
+
+def test_apply_job_permissions_reconcile(monkeypatch, access_control_list):
+    """
+    This test asserts that reconcile mode only writes to jobs whose permissions differ and counts failures.
+    """
+    differs = {1: False, 2: True, 3: Exception("PERMISSION_DENIED :: denied")}
+    updated = []
+
+    def fake_job_permissions_differ(job_id, *args):
+        if isinstance(differs[job_id], Exception):
+            raise differs[job_id]
+        return differs[job_id]
+
+    monkeypatch.setattr(job_permissions, "job_permissions_differ", fake_job_permissions_differ)
+    monkeypatch.setattr(job_permissions, "update_job_permissions", lambda job_id, *args: updated.append(job_id))
+
+    summary = job_permissions.apply_job_permissions(
+        [1, 2, 3], access_control_list, "adb-1.7.azuredatabricks.net", "token", reconcile=True
+    )
+
+    assert summary == {"unchanged": 1, "updated": 1, "failed": 1}
+    assert updated == [2]
+
+
+def test_apply_job_permissions_streams_job_ids(monkeypatch, access_control_list):
+    """
+    This test asserts that workers start updating before the job ID generator is exhausted and that the
+    producer never runs more than the queue bound ahead of the workers.
+    """
+    first_update = threading.Event()
+    updated = []
+    updated_lock = threading.Lock()
+    # largest number of job IDs produced but not yet picked up for an update
+    gaps = []
+
+    def fake_update_job_permissions(job_id, *args):
+        with updated_lock:
+            updated.append(job_id)
+        first_update.set()
+        # slow workers let the producer run as far ahead as the queue allows
+        time.sleep(0.001)
+
+    def job_id_generator():
+        for job_id in range(50):
+            if job_id == 25:
+                # the second half of the IDs is only produced once a worker has started updating
+                assert first_update.wait(timeout=5)
+            with updated_lock:
+                gaps.append(job_id - len(updated))
+            yield job_id
+
+    monkeypatch.setattr(job_permissions, "update_job_permissions", fake_update_job_permissions)
+
+    max_workers = 4
+    summary = job_permissions.apply_job_permissions(
+        job_id_generator(), access_control_list, "adb-1.7.azuredatabricks.net", "token", max_workers=max_workers
+    )
+
+    assert summary == {"unchanged": 0, "updated": 50, "failed": 0}
+    assert sorted(updated) == list(range(50))
+    # at most a full queue of max_workers * 2 IDs, plus one ID taken by each worker
+    assert max(gaps) <= max_workers * 2 + max_workers
+
+
+def test_get_all_job_ids_is_lazy(monkeypatch):
+    """
+    This test asserts that get_all_job_ids yields job IDs from the paginated listing without collecting them first.
+    """
+    listed = []
+
+    class FakeClient:
+        def __init__(self, *args):
+            pass
+
+        def iter_jobs(self):
+            for job_id in range(3):
+                listed.append(job_id)
+                yield {"job_id": job_id}
+
+    monkeypatch.setattr(job_permissions, "DatabricksClient", FakeClient)
+
+    job_ids = job_permissions.get_all_job_ids("adb-1.7.azuredatabricks.net", "token")
+    assert next(job_ids) == 0
+    assert listed == [0]
+    assert list(job_ids) == [1, 2]
@@ -1,9 +1,119 @@
-
 import argparse
 import json
+import logging
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dbx-common"))
+from dbx_client import DatabricksAPIError, DatabricksClient
+from dbx_resolver import JOB, list_resources
+from dbx_snapshot import get_snapshot_store
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Number of jobs deleted concurrently
+DEFAULT_MAX_WORKERS = 8
+
+
+class DeletionReport(NamedTuple):
+    """
+    Outcome of deleting the jobs named in the job configs
+    Args:
+        deleted (dict): job_ids deleted (or that would be deleted in a dry run) per job name
+        missing (list): Job names not found in the workspace
+        failed (dict): Error per job name that could not be deleted, including names shared by several jobs
+    """
+
+    deleted: Dict[str, List[int]]
+    missing: List[str]
+    failed: Dict[str, str]
+
+
+def get_job_name(job_config, env):
+    """
+    Returns the name of the job described by a job config, using the env specific job when the config maps one
+    """
+    if "dbx_job" in job_config:
+        job_config = job_config["dbx_job"][env] if env in job_config["dbx_job"] else job_config["dbx_job"]
+    return job_config["name"]
+
+
+def get_job_ids_by_name(job_pairs):
+    """
+    Returns a name -> job_ids index of the (name, job_id) pairs of a workspace listing
+    """
+    job_ids_by_name = {}
+    for job_name, job_id in job_pairs:
+        job_ids_by_name.setdefault(job_name, []).append(job_id)
+    return job_ids_by_name
+
+
+def delete_jobs(
+    client, job_names, job_ids_by_name, delete_duplicates=False, dry_run=False, max_workers=DEFAULT_MAX_WORKERS
+):
+    """
+    Deletes the jobs with the given names from a single index of the workspace jobs, concurrently.
+    A name used by more than one job is only deleted when delete_duplicates is set, otherwise it is reported as failed.
+    A job already gone when it is deleted is reported as missing.
+
+    Returns:
+        DeletionReport: Deleted, missing and failed job names
+    """
+    deleted = {}
+    missing = []
+    failed = {}
+    to_delete = {}
+    for job_name in dict.fromkeys(job_names):
+        job_ids = job_ids_by_name.get(job_name, [])
+        if not job_ids:
+            logger.warning(f"job name: {job_name} does not exist")
+            missing.append(job_name)
+        elif len(job_ids) > 1 and not delete_duplicates:
+            logger.error(f"Job name {job_name} matches multiple jobs {job_ids}, set delete_duplicates to delete all")
+            failed[job_name] = f"matches multiple jobs {job_ids}"
+        else:
+            to_delete[job_name] = job_ids
+
+    if dry_run:
+        for job_name, job_ids in to_delete.items():
+            logger.info(f"Dry run specified, not deleting job {job_name} with job_ids {job_ids}")
+        return DeletionReport(to_delete, missing, failed)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            (job_name, job_id): executor.submit(client.delete_job, job_id)
+            for job_name, job_ids in to_delete.items()
+            for job_id in job_ids
+        }
+        for (job_name, job_id), future in futures.items():
+            try:
+                future.result()
+                logger.info(f"Deleted job {job_name} with job_id {job_id}")
+                deleted.setdefault(job_name, []).append(job_id)
+            except DatabricksAPIError as e:
+                if e.error_code == "RESOURCE_DOES_NOT_EXIST":
+                    logger.warning(f"Job {job_name} with job_id {job_id} was already deleted")
+                    if job_name not in missing:
+                        missing.append(job_name)
+                else:
+                    logger.error(f"Failed to delete job {job_name} with job_id {job_id}: {e}")
+                    failed[job_name] = str(e)
+    return DeletionReport(deleted, missing, failed)
+
+
+def format_report(report):
+    """
+    Returns the deletion report as one line per deleted, missing and failed job
+    """
+    lines = [f"Deleted {job_name}: {', '.join(map(str, job_ids))}" for job_name, job_ids in report.deleted.items()]
+    lines += [f"Missing {job_name}" for job_name in report.missing]
+    lines += [f"Failed {job_name}: {error}" for job_name, error in report.failed.items()]
+    lines.append(f"{len(report.deleted)} deleted, {len(report.missing)} missing, {len(report.failed)} failed")
+    return "\n".join(lines)
 
-logger = LM.get_logger(__name__)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -11,24 +121,32 @@ if __name__ == "__main__":
     parser.add_argument("-t", "--dbx_token", required=True, help="Personal access token for the databricks instance")
     parser.add_argument("-j", "--job_configs", required=True, help="Space seperated string of config file paths")
     parser.add_argument("-e", "--env", nargs="?", default="", help="Target environment mapped in the config file")
-    parser.add_argument("--dry_run", action='store_true', help="To run as normal without deploying, required for action testing")
-    
+    parser.add_argument(
+        "--dry_run", action='store_true', help="To run as normal without deleting, required for action testing"
+    )
+    parser.add_argument(
+        "--delete_duplicates", action="store_true", help="Delete every job of a name used by several jobs"
+    )
+    parser.add_argument("--max_workers", type=int, default=DEFAULT_MAX_WORKERS, help="Number of concurrent deletes")
+
     args = parser.parse_args()
 
-    db_conn = Databricks(args.dbx_instance_url, args.dbx_token)
-    
-    for job_config_path in args.job_configs.strip().split(' '):
+    job_names = []
+    for job_config_path in args.job_configs.split():
         logger.info(f"Deleting job in {job_config_path}")
         with open(job_config_path, 'r') as job_config_info:
             job_config = json.loads(job_config_info.read())
-        job_name = job_config['name']
-        try:
-            db_conn.delete_job(job_name = job_name)
-        except KeyError:
-            logger.warning(f"job name: {job_name} does not exist")
-        except Exception as e:
-            logger.error(e)
-            raise e
+        job_names.append(get_job_name(job_config, args.env))
 
+    client = DatabricksClient(args.dbx_instance_url, args.dbx_token)
+    snapshot_store = get_snapshot_store(args.dbx_instance_url)
+    # deletes are destructive, so the job ids come from a fresh listing rather than a cached snapshot
+    job_ids_by_name = get_job_ids_by_name(list_resources(client, JOB))
 
+    report = delete_jobs(client, job_names, job_ids_by_name, args.delete_duplicates, args.dry_run, args.max_workers)
+    if report.deleted and not args.dry_run:
+        snapshot_store.invalidate(JOB)
+    print(format_report(report))
 
+    if report.failed:
+        sys.exit(1)
@@ -0,0 +1,70 @@
+import threading
+
+from delete_dbx_job import DatabricksAPIError, delete_jobs, get_job_ids_by_name, get_job_name
+
+
+class FakeClient:
+    """
+    Stands in for DatabricksClient, recording the jobs deleted.
+    """
+
+    def __init__(self, gone=(), failing=()):
+        self.gone = set(gone)
+        self.failing = set(failing)
+        self.deleted = []
+        self.lock = threading.Lock()
+
+    def delete_job(self, job_id):
+        if job_id in self.gone:
+            raise DatabricksAPIError(400, "RESOURCE_DOES_NOT_EXIST", f"Job {job_id} does not exist.")
+        if job_id in self.failing:
+            raise DatabricksAPIError(403, "PERMISSION_DENIED", "User cannot delete the job.")
+        with self.lock:
+            self.deleted.append(job_id)
+
+
+JOB_IDS_BY_NAME = get_job_ids_by_name(
+    [("feature_a", 1), ("feature_b", 2), ("shared", 3), ("shared", 4), ("gone", 5), ("locked", 6)]
+)
+
+
+def test_get_job_name_uses_env_job():
+    """
+    This test asserts that the job name is read from the env specific job of the config when there is one.
+    """
+    job_config = {"dbx_job": {"dev": {"name": "job_dev"}, "prod": {"name": "job_prod"}}}
+
+    assert get_job_name(job_config, "prod") == "job_prod"
+    assert get_job_name({"name": "plain_job"}, "prod") == "plain_job"
+
+
+def test_delete_jobs_reports_deleted_missing_and_failed():
+    """
+    This test asserts that jobs are deleted from one index, names shared by several jobs are not deleted,
+    and deleted, missing and failed jobs are reported separately.
+    """
+    client = FakeClient(gone=[5], failing=[6])
+
+    report = delete_jobs(
+        client, ["feature_a", "feature_b", "feature_a", "shared", "unknown", "gone", "locked"], JOB_IDS_BY_NAME
+    )
+
+    assert sorted(client.deleted) == [1, 2]
+    assert report.deleted == {"feature_a": [1], "feature_b": [2]}
+    assert report.missing == ["unknown", "gone"]
+    assert sorted(report.failed) == ["locked", "shared"]
+
+
+def test_delete_jobs_duplicates_and_dry_run():
+    """
+    This test asserts that every job of a duplicated name is deleted when requested, and none in a dry run.
+    """
+    client = FakeClient()
+
+    dry_run_report = delete_jobs(client, ["shared"], JOB_IDS_BY_NAME, delete_duplicates=True, dry_run=True)
+    assert client.deleted == []
+    assert dry_run_report.deleted == {"shared": [3, 4]}
+
+    report = delete_jobs(client, ["shared"], JOB_IDS_BY_NAME, delete_duplicates=True)
+    assert sorted(client.deleted) == [3, 4]
+    assert report.failed == {}
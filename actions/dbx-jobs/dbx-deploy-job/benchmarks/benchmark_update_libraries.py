@@ -0,0 +1,96 @@
+"""
+Microbenchmark for merging default libraries into the tasks of a large generated job.
+
+Builds a job of many tasks, most of them sharing the same library list, and times adding the
+default libraries to every task with update_libraries against the previous list scan merge,
+which compared whole library dicts and rebuilt the task list for every default library.
+
+Usage: python benchmarks/benchmark_update_libraries.py [--tasks 500] [--default-libraries 50]
+"""
+import argparse
+import copy
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from deploy_dbx_job import TransformContext, add_default_libraries
+
+
+def scan_update_libraries(dbx_job_config, default_libraries_config):
+    """
+    The list scan merge update_libraries replaced, kept as the baseline.
+    """
+    if "libraries" not in dbx_job_config:
+        dbx_job_config["libraries"] = default_libraries_config["libraries"]
+    else:
+        for library in reversed(default_libraries_config["libraries"]):
+            if library not in dbx_job_config["libraries"]:
+                dbx_job_config["libraries"] = [library] + dbx_job_config["libraries"]
+
+
+def generate_job(tasks, default_libraries, task_library_sets=4):
+    """
+    Build a job config of tasks tasks, cycling through task_library_sets library lists that each
+    repeat half of the default libraries, and the default libraries config.
+    """
+    defaults = [{"pypi": {"package": f"default-lib-{i}==1.0.{i}"}} for i in range(default_libraries)]
+    defaults.append({"maven": {"coordinates": "com.example:lib:1.0", "exclusions": ["org.slf4j:slf4j-api"]}})
+    library_sets = [
+        defaults[i % 2::2] + [{"whl": f"dbfs:/libs/task_lib_{i}_{j}.whl"} for j in range(5)]
+        for i in range(task_library_sets)
+    ]
+    job_config = {
+        "include_default_libraries": True,
+        "name": "generated_job",
+        "tasks": [
+            {"task_key": f"task_{i}", "libraries": copy.deepcopy(library_sets[i % task_library_sets])}
+            for i in range(tasks)
+        ],
+    }
+    return job_config, {"libraries": defaults}
+
+
+def time_merge(merge, job_config, default_libraries_config, repeat):
+    """
+    Return the best of repeat timings of merging the default libraries into a copy of the job,
+    and the merged job.
+    """
+    best = float("inf")
+    merged_job = None
+    for _ in range(repeat):
+        merged_job = copy.deepcopy(job_config)
+        start = time.perf_counter()
+        merge(merged_job, default_libraries_config)
+        best = min(best, time.perf_counter() - start)
+    return best, merged_job
+
+
+def scan_merge(job_config, default_libraries_config):
+    for task in job_config["tasks"]:
+        scan_update_libraries(task, default_libraries_config)
+
+
+def indexed_merge(job_config, default_libraries_config):
+    add_default_libraries(job_config, job_config, TransformContext("", default_libraries_config))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark merging default libraries into job tasks")
+    parser.add_argument("--tasks", type=int, default=500, help="Number of tasks of the job")
+    parser.add_argument("--default-libraries", type=int, default=50, help="Number of default libraries")
+    parser.add_argument("--repeat", type=int, default=5, help="Timings per merge, the best is reported")
+    args = parser.parse_args()
+    # leave the per task log lines out of the timings
+    logging.getLogger("deploy_dbx_job").setLevel(logging.WARNING)
+
+    job_config, default_libraries_config = generate_job(args.tasks, args.default_libraries)
+    scan_seconds, scan_job = time_merge(scan_merge, job_config, default_libraries_config, args.repeat)
+    indexed_seconds, indexed_job = time_merge(indexed_merge, job_config, default_libraries_config, args.repeat)
+    assert scan_job == indexed_job, "the merges disagree"
+
+    print(f"{'merge':>8} {'tasks':>6} {'defaults':>9} {'ms':>9}")
+    print(f"{'scan':>8} {args.tasks:>6} {args.default_libraries:>9} {scan_seconds * 1000:>9.2f}")
+    print(f"{'indexed':>8} {args.tasks:>6} {args.default_libraries:>9} {indexed_seconds * 1000:>9.2f}")
+    print(f"speedup {scan_seconds / indexed_seconds:.1f}x")
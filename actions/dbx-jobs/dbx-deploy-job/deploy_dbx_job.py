@@ -1,102 +1,423 @@
 import os
+import sys
 import argparse
 import json
 import logging
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dbx-common"))
+from dbx_client import DatabricksClient
+from dbx_resolver import (
+    JOB,
+    collect_references,
+    fetch_resource_indexes,
+    list_resources,
+    referenced_kinds,
+    resolve_references,
+)
+from dbx_snapshot import get_snapshot_store
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-def update_libraries(dbx_job_config, default_libraries_config):
+# Number of job configs prepared and deployed concurrently
+DEFAULT_MAX_WORKERS = 8
+
+def library_key(library):
+    """
+    Returns a hashable key identifying a library spec: its type, coordinate and repo
+    e.g. {"pypi": {"package": "x==1", "repo": "r"}} -> ("pypi", "x==1", "r")
+    and {"whl": "dbfs:/x.whl"} -> ("whl", "dbfs:/x.whl", None)
+    Specs with other fields, such as maven exclusions, are keyed by their whole canonical JSON
+    """
+    if len(library) == 1:
+        ((library_type, spec),) = library.items()
+        if isinstance(spec, str):
+            return (library_type, spec, None)
+        if isinstance(spec, dict) and set(spec) <= {"package", "coordinates", "repo"}:
+            return (library_type, spec.get("package", spec.get("coordinates")), spec.get("repo"))
+    return ("", json.dumps(library, sort_keys=True), None)
+
+
+class LibraryMerger:
+    """
+    Merges default libraries into the library lists of jobs and tasks
+    Default libraries missing from a list are put before it, in default library order.
+    Lists holding the same libraries are merged once, as generated jobs repeat the same libraries
+    on hundreds of tasks, and every caller gets its own copy of the merged list
+    """
+
+    def __init__(self, default_libraries):
+        default_keys = {}
+        for library in default_libraries:
+            default_keys.setdefault(library_key(library), library)
+        self.default_libraries = list(default_keys.items())
+        # tuple of library keys -> merged library list
+        self._merged_libraries = {}
+
+    def merge(self, libraries):
+        """
+        Returns the default libraries missing from libraries followed by libraries, in a single pass
+        """
+        keys = tuple(library_key(library) for library in libraries)
+        merged_libraries = self._merged_libraries.get(keys)
+        if merged_libraries is None:
+            present_keys = set(keys)
+            merged_libraries = [library for key, library in self.default_libraries if key not in present_keys]
+            merged_libraries.extend(libraries)
+            self._merged_libraries[keys] = merged_libraries
+        return list(merged_libraries)
+
+
+def update_libraries(dbx_job_config, default_libraries_config, library_merger=None):
     """
     Given a databricks job configuration, adds on default libraries
     If libraries already exist, it adds on default libraries that do not exist
+    Pass the same library_merger for every task of a deploy to reuse merged lists across tasks
     """
-    if "libraries" not in dbx_job_config:
-        dbx_job_config["libraries"] = default_libraries_config["libraries"]
-    else:
-        # ensure that default libraries get installed before feature specific libraries
-        for library in reversed(default_libraries_config["libraries"]):
-            if library not in dbx_job_config["libraries"]:
-                dbx_job_config["libraries"] = [library] + dbx_job_config["libraries"]
+    if library_merger is None:
+        library_merger = LibraryMerger(default_libraries_config["libraries"])
+    # ensure that default libraries get installed before feature specific libraries
+    dbx_job_config["libraries"] = library_merger.merge(dbx_job_config.get("libraries", []))
 
 
-def create_job_config(job_config, default_libraries_config, env):
+class TransformContext:
     """
-    Used to modify the databricks job config to prepare it for deployment
-    Should hold all needed modifications.
-    Current modifications consist of adding default libraries
-    """
-    if "dbx_job" in job_config:
-        dbx_job_config = (
-            job_config["dbx_job"]
-            if env not in job_config["dbx_job"]
-            else job_config["dbx_job"][env]
+    Settings of the transform stages and the state they share across the job configs of a deploy
+    Args:
+        env (str): Target environment mapped in the config files
+        default_libraries_config (dict): Default libraries config, {"libraries": [...]}
+        run_as_user (str): User the jobs run as, used by the run_as stage
+        client (DatabricksClient): Client for the workspace, used by the resolve_names stage
+        snapshot_store (SnapshotStore): Snapshots of the workspace, used by the resolve_names stage
+    """
+
+    def __init__(self, env="", default_libraries_config=None, run_as_user="", client=None, snapshot_store=None):
+        self.env = env
+        self.default_libraries_config = default_libraries_config or {"libraries": []}
+        self.run_as_user = run_as_user
+        self.client = client
+        self.snapshot_store = snapshot_store
+        self.library_merger = LibraryMerger(self.default_libraries_config["libraries"])
+        # stage name -> (seconds, configs) summed over every config transformed
+        self.stage_times = {}
+        self._resource_indexes = {}
+        self._lock = threading.Lock()
+
+    def get_resource_indexes(self, kinds):
+        """
+        Returns the ResourceIndex of each kind, listing every kind once for all the configs of the deploy
+        """
+        with self._lock:
+            missing_kinds = set(kinds) - set(self._resource_indexes)
+            if missing_kinds:
+                self._resource_indexes.update(
+                    fetch_resource_indexes(self.client, missing_kinds, snapshot_store=self.snapshot_store)
+                )
+            return self._resource_indexes
+
+    def record_stage_time(self, stage, seconds):
+        with self._lock:
+            total, configs = self.stage_times.get(stage, (0.0, 0))
+            self.stage_times[stage] = (total + seconds, configs + 1)
+
+
+def select_env(dbx_job_config, job_config, context):
+    """
+    Returns the env specific job of a config mapping jobs per env under dbx_job
+    """
+    if "dbx_job" in dbx_job_config:
+        return (
+            dbx_job_config["dbx_job"]
+            if context.env not in dbx_job_config["dbx_job"]
+            else dbx_job_config["dbx_job"][context.env]
         )
-    else:
-        dbx_job_config = job_config
+    return dbx_job_config
+
+
+def set_run_as(dbx_job_config, job_config, context):
+    """
+    Sets the user of the run_as object of the job, adding run_as when the job has none or sets it to null
+    """
+    logger.info(f"Updating run_as of job {dbx_job_config.get('name')} to {context.run_as_user}")
+    if not dbx_job_config.get("run_as"):
+        dbx_job_config["run_as"] = {}
+    dbx_job_config["run_as"]["user_name"] = context.run_as_user
+    return dbx_job_config
 
-    if (
-        "include_default_libraries" in job_config
-        and job_config["include_default_libraries"]
-    ):
+
+def add_default_libraries(dbx_job_config, job_config, context):
+    """
+    Adds the default libraries to every task, or to the job itself, when the config sets include_default_libraries
+    """
+    if job_config.get("include_default_libraries"):
         if "tasks" in dbx_job_config:
             for job_task in dbx_job_config["tasks"]:
                 logger.info(f"Adding libraries to task {job_task['task_key']}")
-                update_libraries(job_task, default_libraries_config)
+                update_libraries(job_task, context.default_libraries_config, context.library_merger)
         else:
             logger.info(f"Updating libraries for job {dbx_job_config['name']}")
-            update_libraries(dbx_job_config, default_libraries_config)
+            update_libraries(dbx_job_config, context.default_libraries_config, context.library_merger)
+    return dbx_job_config
+
+
+def resolve_names(dbx_job_config, job_config, context):
+    """
+    Resolves the cluster policy, cluster, SQL warehouse and job names used in the job into IDs
+
+    Raises:
+        ValueError: If a name matches no resource in the workspace
+    """
+    references = collect_references(dbx_job_config)
+    indexes = context.get_resource_indexes(referenced_kinds(references))
+    unresolved = resolve_references(references, indexes)
+    if unresolved:
+        raise ValueError(
+            "Not found in workspace: "
+            + ", ".join(f"{reference.kind} {reference.value} at {reference.location}" for reference in unresolved)
+        )
+    return dbx_job_config
+
+
+def check_timeout(dbx_job_config, job_config, context):
+    """
+    Checks that a timeout is configured for the job, a timeout_seconds of 0 means no timeout
 
+    Raises:
+        ValueError: If the timeout is not configured
+    """
+    if dbx_job_config.get("timeout_seconds", 0) <= 0:
+        raise ValueError(
+            f"Timeout is not configured on job {dbx_job_config.get('name')}, set timeout_seconds larger than 0"
+        )
+    return dbx_job_config
+
+
+# Transform stages applied to a job config before deployment, in the order they run
+TRANSFORM_STAGES = {
+    "env": select_env,
+    "run_as": set_run_as,
+    "default_libraries": add_default_libraries,
+    "resolve_names": resolve_names,
+    "timeout_check": check_timeout,
+}
+DEFAULT_STAGES = ("env", "default_libraries")
+
+
+def create_job_config(job_config, context, stages=DEFAULT_STAGES):
+    """
+    Used to modify the databricks job config to prepare it for deployment
+    Applies the selected transform stages to the parsed config in TRANSFORM_STAGES order,
+    timing each stage, and returns the databricks job config to deploy
+
+    Raises:
+        ValueError: If the config maps jobs per env under dbx_job and the env stage is not selected
+    """
+    if "dbx_job" in job_config and "env" not in stages:
+        raise ValueError("The config maps jobs per env under dbx_job, the env stage is required to deploy it")
+    dbx_job_config = job_config
+    for stage in TRANSFORM_STAGES:
+        if stage not in stages:
+            continue
+        started = time.perf_counter()
+        dbx_job_config = TRANSFORM_STAGES[stage](dbx_job_config, job_config, context)
+        context.record_stage_time(stage, time.perf_counter() - started)
     return dbx_job_config
-    
+
+
+def format_stage_times(stage_times):
+    """
+    Returns the time spent in each transform stage, one line per stage
+    """
+    return "\n".join(
+        f"Stage {stage}: {seconds * 1000:.1f} ms over {configs} job config(s)"
+        for stage, (seconds, configs) in stage_times.items()
+    )
+
+
 class Databricks:
     def __init__(self, instance_url, token):
-        self.instance_url = instance_url.rstrip('/')
-        self.headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        self.client = DatabricksClient(instance_url, token)
+        # snapshots shared with the other steps of the workflow job, used to resolve names in job configs
+        # and invalidated after creates. The job index itself always comes from a fresh listing
+        self.snapshot_store = get_snapshot_store(instance_url)
+        # name -> job_id index of the workspace, built on first use
+        self._job_index = None
+        # name -> job_ids for names shared by more than one job
+        self.duplicate_job_names = {}
+        self._index_lock = threading.Lock()
+        # per job name locks so concurrent deploys of the same name cannot both create it
+        self._name_locks = {}
 
     def list_jobs(self):
-        url = f"{self.instance_url}/api/2.1/jobs/list"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return [response.json()]
+        """
+        Returns every job in the workspace, paging through /api/2.1/jobs/list
+        """
+        return list(self.client.iter_jobs())
+
+    def get_job_index(self):
+        """
+        Returns a name -> job_id index of the workspace jobs. The listing is done once per
+        process and the index is kept up to date as jobs are created.
+        Names used by more than one job are logged and recorded in duplicate_job_names.
+        """
+        with self._index_lock:
+            if self._job_index is None:
+                self._build_job_index()
+        return self._job_index
+
+    def _build_job_index(self):
+        job_index = {}
+        duplicate_job_names = {}
+        # whether a job is created or reset is decided from a fresh listing, as a cached snapshot could miss
+        # jobs created by other workflow runs since and lead to duplicates
+        for job_name, job_id in list_resources(self.client, JOB):
+            if job_name in job_index:
+                duplicate_job_names.setdefault(job_name, [job_index[job_name]]).append(job_id)
+            else:
+                job_index[job_name] = job_id
 
-    def deploy_job(self, job_config):
+        for job_name, job_ids in duplicate_job_names.items():
+            logger.warning(f"Job name {job_name} is used by multiple jobs in the workspace: {job_ids}")
+        logger.info(f"Indexed {len(job_index)} job names in the workspace")
+
+        self.duplicate_job_names = duplicate_job_names
+        self._job_index = job_index
+
+    def _get_name_lock(self, job_name):
+        with self._index_lock:
+            return self._name_locks.setdefault(job_name, threading.Lock())
+
+    def deploy_job(self, job_config, job_id=None):
+        """
+        Creates the job or overwrites the settings of the existing job with the same name.
+        If job_id is given the name lookup is skipped and that job is updated.
+
+        Raises:
+            ValueError: If the job name matches more than one job in the workspace.
+        """
         job_name = job_config.get("name")
-        existing_jobs = self.list_jobs()
-
-        # Check if job already exists
-        job_id = None
-        for jobs_group in existing_jobs:
-            for job in jobs_group.get("jobs", []):
-                if job["settings"]["name"] == job_name:
-                    job_id = job["job_id"]
-                    break
-
-        if job_id:
-            # Update existing job
-            url = f"{self.instance_url}/api/2.1/jobs/update"
-            payload = {
-                "job_id": job_id,
-                **job_config
-            }
-            response = requests.post(url, headers=self.headers, data=json.dumps(payload))
-            response.raise_for_status()
-            logging.info(f"Updated job: {job_name} with job_id: {job_id}")
-        else:
+
+        if job_id is not None:
+            return self._update_job(job_id, job_config)
+
+        with self._get_name_lock(job_name):
+            job_index = self.get_job_index()
+            if job_name in self.duplicate_job_names:
+                raise ValueError(
+                    f"Job name {job_name} matches multiple jobs {self.duplicate_job_names[job_name]}, "
+                    "set dbx_job_id in the job config to choose the job to update"
+                )
+            if job_name in job_index:
+                return self._update_job(job_index[job_name], job_config)
+
             # Create new job
-            url = f"{self.instance_url}/api/2.1/jobs/create"
-            response = requests.post(url, headers=self.headers, data=json.dumps(job_config))
-            response.raise_for_status()
-            job_id = response.json().get("job_id")
+            job_id = self.client.create_job(job_config)
+            job_index[job_name] = job_id
+            self.snapshot_store.invalidate(JOB)
             logging.info(f"Created job: {job_name} with job_id: {job_id}")
+            return job_id
 
+    def _update_job(self, job_id, job_config):
+        self.client.reset_job(job_id, job_config)
+        logging.info(f"Updated job: {job_config.get('name')} with job_id: {job_id}")
         return job_id
 
 
+def prepare_job_config(job_config_path, context, stages=DEFAULT_STAGES):
+    """
+    Reads a job config file and returns it along with the databricks job config to deploy
+    The file is parsed once and every stage transforms the config in memory
+    """
+    logger.info(f"Starting deployment process for {job_config_path}")
+    with open(job_config_path, "r") as job_config_info:
+        job_config = json.loads(job_config_info.read())
+
+    return job_config, create_job_config(job_config, context, stages)
+
+
+def deploy_job_configs(
+    db_conn,
+    job_config_paths,
+    default_libraries_config,
+    env,
+    dry_run=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    stages=DEFAULT_STAGES,
+    run_as_user="",
+):
+    """
+    Prepares and deploys job configs through a bounded worker pool.
+    A config that fails to load, transform or deploy is logged and reported without stopping the others.
+    Dry run job ids are handed out in the order of job_config_paths so they do not depend on scheduling.
+    The time spent in each transform stage is logged once every config is prepared.
+
+    Returns:
+        tuple: (job_config_path -> job_id mapping in the order of job_config_paths,
+                job_config_path -> exception for the configs that failed)
+    """
+    job_id_mapping = {}
+    failures = {}
+    context = TransformContext(env, default_libraries_config, run_as_user, db_conn.client, db_conn.snapshot_store)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        prepare_futures = [
+            executor.submit(prepare_job_config, job_config_path, context, stages)
+            for job_config_path in job_config_paths
+        ]
+        prepared_configs = {}
+        for job_config_path, future in zip(job_config_paths, prepare_futures):
+            try:
+                prepared_configs[job_config_path] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to load {job_config_path}: {e}")
+                failures[job_config_path] = e
+        for line in format_stage_times(context.stage_times).splitlines():
+            logger.info(line)
+
+        if dry_run:
+            logger.info(f"Dry run specified, not deploying jobs")
+
+        # Need this for action integration testing
+        fake_job_id = 0
+        deploy_futures = {}
+        for job_config_path, (job_config, dbx_job_config) in prepared_configs.items():
+            # If there aready are dbx job ids from a previous deployment and the env exists
+            existing_job_id = None
+            if "dbx_job_id" in job_config and env in job_config["dbx_job_id"]:
+                existing_job_id = job_config["dbx_job_id"][env]
+
+            # dry run setting is needed to do action tests
+            if dry_run:
+                if existing_job_id is not None:
+                    job_id_mapping[job_config_path] = existing_job_id
+                else:
+                    job_id_mapping[job_config_path] = fake_job_id
+                    fake_job_id += 1
+            else:
+                # Utilize Job name when no job id exists
+                deploy_futures[job_config_path] = executor.submit(
+                    db_conn.deploy_job,
+                    dbx_job_config,
+                    job_id=None if existing_job_id is None else int(existing_job_id),
+                )
+
+        for job_config_path, future in deploy_futures.items():
+            try:
+                job_id_mapping[job_config_path] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to deploy {job_config_path}: {e}")
+                failures[job_config_path] = e
+
+    ordered_job_id_mapping = {
+        job_config_path: job_id_mapping[job_config_path]
+        for job_config_path in job_config_paths
+        if job_config_path in job_id_mapping
+    }
+    return ordered_job_id_mapping, failures
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -135,8 +456,31 @@ if __name__ == "__main__":
         action="store_true",
         help="To run as normal without deploying, required for action testing",
     )
+    parser.add_argument(
+        "-w",
+        "--max_workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Number of job configs to prepare and deploy concurrently",
+    )
+    parser.add_argument(
+        "-s",
+        "--stages",
+        nargs="*",
+        choices=list(TRANSFORM_STAGES),
+        default=list(DEFAULT_STAGES),
+        help="Transform stages applied to each job config before it is deployed",
+    )
+    parser.add_argument(
+        "-r",
+        "--run_as_user",
+        default="",
+        help="User the jobs run as, required by the run_as stage",
+    )
 
     args = parser.parse_args()
+    if "run_as" in args.stages and args.run_as_user == "":
+        parser.error("the run_as stage requires --run_as_user")
 
     # Default if a library config wasn't provided, will ensure the job won't fail
     default_libraries_config = {"libraries": []}
@@ -144,40 +488,17 @@ if __name__ == "__main__":
         with open(args.default_libraries, "r") as default_libs:
             default_libraries_config = json.loads(default_libs.read())
 
-    job_id_mapping = {}
     db_conn = Databricks(args.dbx_instance_url, args.dbx_token)
-
-    # Need this for action integration testing
-    fake_job_id = 0
-    for job_config_path in args.job_configs.strip().split(" "):
-        logger.info(f"Starting deployment process for {job_config_path}")
-        with open(job_config_path, "r") as job_config_info:
-            job_config = json.loads(job_config_info.read())
-
-        dbx_job_config = create_job_config(
-            job_config, default_libraries_config, args.env
-        )
-
-        if args.dry_run:
-            logger.info(f"Dry run specified, not deploying jobs")
-        # If there aready are dbx job ids from a previous deployment and the env exists
-        if "dbx_job_id" in job_config and args.env in job_config["dbx_job_id"]:
-            # dry run setting is needed to do action tests
-            job_id = (
-                job_config["dbx_job_id"][args.env]
-                if args.dry_run
-                else db_conn.deploy_job(
-                    dbx_job_config, job_id=int(job_config["dbx_job_id"][args.env])
-                )
-            )
-        else:
-            if args.dry_run:
-                job_id = fake_job_id
-                fake_job_id += 1
-            else:
-                # Utilize Job name instead
-                job_id = db_conn.deploy_job(dbx_job_config)
-        job_id_mapping[job_config_path] = job_id
+    job_id_mapping, failures = deploy_job_configs(
+        db_conn,
+        args.job_configs.split(),
+        default_libraries_config,
+        args.env,
+        dry_run=args.dry_run,
+        max_workers=args.max_workers,
+        stages=args.stages,
+        run_as_user=args.run_as_user,
+    )
 
     with open(os.environ["GITHUB_OUTPUT"], "a") as github_output:
         job_id_mapping_string = " ".join(
@@ -187,3 +508,7 @@ if __name__ == "__main__":
             ]
         )
         print(f"job_ids={job_id_mapping_string}", file=github_output)
+
+    if failures:
+        logger.error(f"Failed to deploy {len(failures)} job config(s): {' '.join(failures)}")
+        sys.exit(1)
@@ -0,0 +1,256 @@
+from deploy_dbx_job import (
+    Databricks,
+    LibraryMerger,
+    TransformContext,
+    create_job_config,
+    deploy_job_configs,
+    update_libraries,
+)
+from dbx_resolver import JOB
+from dbx_snapshot import SnapshotStore
+import json
+import threading
+import pytest
+
+
+class FakeClient:
+    """
+    Stands in for DatabricksClient, recording the calls made by Databricks.deploy_job.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.list_calls = 0
+        self.reset_calls = []
+        self.created = []
+        self.lock = threading.Lock()
+
+    def iter_jobs(self):
+        self.list_calls += 1
+        yield from self.jobs
+
+    def reset_job(self, job_id, new_settings):
+        if new_settings["name"] == "failing_job":
+            raise Exception("INVALID_PARAMETER_VALUE :: failing_job")
+        self.reset_calls.append(job_id)
+
+    def create_job(self, settings):
+        with self.lock:
+            job_id = 1000 + len(self.created)
+            self.created.append(settings["name"])
+        return job_id
+
+
+@pytest.fixture
+def db_conn():
+    conn = Databricks("adb-123.7.azuredatabricks.net", "token")
+    conn.client = FakeClient(
+        [
+            {"job_id": 1, "settings": {"name": "existing_job"}},
+            {"job_id": 2, "settings": {"name": "duplicate_job"}},
+            {"job_id": 3, "settings": {"name": "duplicate_job"}},
+        ]
+    )
+    return conn
+
+
+def test_deploy_job_lists_workspace_once(db_conn):
+    """
+    This test asserts that deploying several configs only lists the workspace jobs once.
+    """
+    assert db_conn.deploy_job({"name": "existing_job"}) == 1
+    assert db_conn.deploy_job({"name": "new_job"}) == 1000
+    assert db_conn.deploy_job({"name": "existing_job"}) == 1
+
+    assert db_conn.client.list_calls == 1
+    assert db_conn.client.reset_calls == [1, 1]
+
+
+def test_deploy_job_updates_index_after_create(db_conn):
+    """
+    This test asserts that a job created earlier in the run is updated rather than created again.
+    """
+    job_id = db_conn.deploy_job({"name": "new_job"})
+
+    assert db_conn.deploy_job({"name": "new_job"}) == job_id
+    assert db_conn.client.created == ["new_job"]
+    assert db_conn.client.reset_calls == [job_id]
+
+
+def test_deploy_job_ignores_stale_snapshot(db_conn, tmp_path):
+    """
+    This test asserts that the create or reset decision comes from a fresh listing rather than a cached
+    snapshot, and that the snapshot is invalidated once a job is created.
+    """
+    db_conn.snapshot_store = SnapshotStore("adb-123.7.azuredatabricks.net", str(tmp_path))
+    db_conn.snapshot_store.put(JOB, [("deleted_job", 9)])
+
+    assert db_conn.deploy_job({"name": "existing_job"}) == 1
+    assert db_conn.deploy_job({"name": "deleted_job"}) == 1000
+
+    assert db_conn.client.reset_calls == [1]
+    assert db_conn.snapshot_store.get(JOB) is None
+
+
+def test_deploy_job_duplicate_name(db_conn):
+    """
+    This test asserts that a name matching multiple jobs is reported instead of guessing which job to update.
+    """
+    with pytest.raises(ValueError):
+        db_conn.deploy_job({"name": "duplicate_job"})
+
+    assert db_conn.duplicate_job_names == {"duplicate_job": [2, 3]}
+    assert db_conn.deploy_job({"name": "duplicate_job"}, job_id=3) == 3
+
+
+def test_deploy_job_with_job_id_skips_listing(db_conn):
+    assert db_conn.deploy_job({"name": "existing_job"}, job_id=42) == 42
+    assert db_conn.client.list_calls == 0
+
+
+@pytest.fixture
+def job_config_paths(tmp_path):
+    configs = {
+        "a.json": {"name": "new_job_a"},
+        "b.json": {"name": "existing_job", "dbx_job_id": {"dev": 77}},
+        "c.json": {"name": "new_job_c"},
+        "d.json": {"name": "failing_job", "dbx_job_id": {"dev": 5}},
+        "e.json": {"name": "new_job_a"},
+    }
+    paths = []
+    for file_name, config in configs.items():
+        path = tmp_path / file_name
+        path.write_text(json.dumps(config))
+        paths.append(str(path))
+    paths.append(str(tmp_path / "missing.json"))
+    return paths
+
+
+def test_deploy_job_configs_dry_run_is_deterministic(db_conn, job_config_paths):
+    """
+    This test asserts that dry run fake job ids follow the input order regardless of the worker count.
+    """
+    for max_workers in [1, 4]:
+        job_id_mapping, failures = deploy_job_configs(
+            db_conn, job_config_paths, {"libraries": []}, "dev", dry_run=True, max_workers=max_workers
+        )
+        assert list(job_id_mapping.values()) == [0, 77, 1, 5, 2]
+        assert list(job_id_mapping) == job_config_paths[:5]
+        assert list(failures) == [job_config_paths[5]]
+
+
+def test_deploy_job_configs_isolates_failures(db_conn, job_config_paths):
+    """
+    This test asserts that failing configs are reported without stopping the others and that the
+    output mapping keeps the input order.
+    """
+    job_id_mapping, failures = deploy_job_configs(
+        db_conn, job_config_paths, {"libraries": []}, "dev", max_workers=4
+    )
+
+    assert list(job_id_mapping) == [job_config_paths[i] for i in [0, 1, 2, 4]]
+    assert job_id_mapping[job_config_paths[1]] == 77
+    # both configs named new_job_a deploy to the same job, created only once
+    assert job_id_mapping[job_config_paths[0]] == job_id_mapping[job_config_paths[4]]
+    assert sorted(db_conn.client.created) == ["new_job_a", "new_job_c"]
+    assert set(failures) == {job_config_paths[3], job_config_paths[5]}
+
+
+def test_create_job_config_applies_selected_stages():
+    """
+    This test asserts that the selected stages transform the config in one pass, in pipeline order,
+    and that the time of every stage applied is recorded.
+    """
+    job_config = {
+        "include_default_libraries": True,
+        "dbx_job": {
+            "dev": {
+                "name": "job",
+                "run_as": {"user_name": "someone@example.com"},
+                "tasks": [{"task_key": "a", "libraries": [{"pypi": {"package": "b"}}]}],
+            }
+        },
+    }
+    context = TransformContext("dev", {"libraries": [{"pypi": {"package": "a"}}]}, "service@example.com")
+
+    dbx_job_config = create_job_config(job_config, context, ["default_libraries", "run_as", "env"])
+
+    assert dbx_job_config["run_as"] == {"user_name": "service@example.com"}
+    assert dbx_job_config["tasks"][0]["libraries"] == [{"pypi": {"package": "a"}}, {"pypi": {"package": "b"}}]
+    assert list(context.stage_times) == ["env", "run_as", "default_libraries"]
+    assert all(configs == 1 for _, configs in context.stage_times.values())
+
+
+def test_create_job_config_run_as_and_env_stage():
+    """
+    This test asserts that the run_as stage adds run_as to jobs setting it to null or leaving it out,
+    and that a config mapping jobs per env is rejected when the env stage is not selected.
+    """
+    context = TransformContext("dev", {"libraries": []}, "service@example.com")
+
+    for job_config in [{"name": "job", "run_as": None}, {"name": "job"}]:
+        dbx_job_config = create_job_config(job_config, context, ["run_as"])
+        assert dbx_job_config["run_as"] == {"user_name": "service@example.com"}
+    with pytest.raises(ValueError, match="env stage is required"):
+        create_job_config({"dbx_job": {"dev": {"name": "job"}}}, context, ["run_as"])
+
+
+def test_deploy_job_configs_runs_resolve_and_timeout_stages(db_conn, tmp_path):
+    """
+    This test asserts that job names are resolved with a single workspace listing for every config,
+    and that a config failing the timeout check is reported without stopping the others.
+    """
+    run_job_tasks = [{"task_key": "t", "run_job_task": {"job_id": "existing_job"}}]
+    configs = {
+        "a.json": {"name": "a", "timeout_seconds": 60, "tasks": run_job_tasks},
+        "b.json": {"name": "b", "timeout_seconds": 60, "tasks": run_job_tasks},
+        "c.json": {"name": "c", "tasks": []},
+    }
+    paths = []
+    for file_name, config in configs.items():
+        path = tmp_path / file_name
+        path.write_text(json.dumps(config))
+        paths.append(str(path))
+
+    job_id_mapping, failures = deploy_job_configs(
+        db_conn, paths, {"libraries": []}, "dev", dry_run=True, stages=["env", "resolve_names", "timeout_check"]
+    )
+
+    assert list(job_id_mapping) == paths[:2]
+    assert list(failures) == [paths[2]]
+    assert "Timeout is not configured" in str(failures[paths[2]])
+    assert db_conn.client.list_calls == 1
+
+
+def test_update_libraries_merges_by_library_key():
+    """
+    This test asserts that default libraries missing from a task are put first in default order,
+    that libraries are matched on type, coordinate and repo, and that tasks holding the same
+    libraries get their own copy of the merged list.
+    """
+    defaults = [
+        {"pypi": {"package": "a"}},
+        {"maven": {"coordinates": "g:b:1", "exclusions": ["g:x"]}},
+        {"whl": "dbfs:/c.whl"},
+        {"pypi": {"package": "a"}},
+    ]
+    merger = LibraryMerger(defaults)
+    tasks = [
+        {"libraries": [{"whl": "dbfs:/c.whl"}, {"maven": {"coordinates": "g:b:1"}}]},
+        {"libraries": [{"whl": "dbfs:/c.whl"}, {"maven": {"coordinates": "g:b:1"}}]},
+        {},
+    ]
+    for task in tasks:
+        update_libraries(task, {"libraries": defaults}, merger)
+
+    assert tasks[0]["libraries"] == [
+        {"pypi": {"package": "a"}},
+        {"maven": {"coordinates": "g:b:1", "exclusions": ["g:x"]}},
+        {"whl": "dbfs:/c.whl"},
+        {"maven": {"coordinates": "g:b:1"}},
+    ]
+    assert tasks[1]["libraries"] == tasks[0]["libraries"]
+    tasks[0]["libraries"].append({"whl": "dbfs:/d.whl"})
+    assert len(tasks[1]["libraries"]) == 4
+    assert len(merger.merge(tasks[1]["libraries"][2:])) == 4
+    assert tasks[2]["libraries"] == defaults[:3]
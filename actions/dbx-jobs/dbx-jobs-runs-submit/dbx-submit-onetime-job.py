@@ -2,8 +2,25 @@
 
 import argparse
 import json
+import logging
+import os
+import sys
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dbx-common"))
+from dbx_client import DatabricksClient
+from dbx_run_batch import (
+    DEFAULT_MAX_CONCURRENT_RUNS,
+    format_results_table,
+    load_batch_runs,
+    run_batch,
+    update_notebook_task,
+)
+from dbx_run_poller import RunPoller, result_state
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
 
-logger = LM.get_logger(__name__)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -15,7 +32,18 @@ if __name__ == "__main__":
         "-p", "--notebook_base_params", nargs="?", default="", help="Notebook base parameters for running the notebook"
     )
     parser.add_argument("-n", "--notebook_path", nargs="?", default="", help="Path to a Databricks notebook to run")
-    parser.add_argument("-c", "--poll_for_completion", nargs="?", default="true", help="Whether to poll for job completion")
+    parser.add_argument(
+        "-c", "--poll_for_completion", nargs="?", default="true", help="Whether to poll for job completion"
+    )
+    parser.add_argument(
+        "-b", "--batch_params_path", nargs="?", default="", help="JSON file of parameter sets, one run per set"
+    )
+    parser.add_argument(
+        "-m", "--max_concurrent_runs", type=int, default=DEFAULT_MAX_CONCURRENT_RUNS, help="Batch runs in flight"
+    )
+    parser.add_argument(
+        "-o", "--timeout_seconds", nargs="?", default="", help="Seconds before the run is cancelled"
+    )
 
     args = parser.parse_args()
 
@@ -32,22 +60,46 @@ if __name__ == "__main__":
     if args.env != "":
         config_json = config_json[args.env]
 
-    dbx_conn = Databricks(args.dbx_instance_url, args.dbx_token)
-    # This action is designed for simple jobs that only have one task in the list of tasks.
-    # Additional tasks would require a mapping between the tasks and parameters.
+    client = DatabricksClient(args.dbx_instance_url, args.dbx_token)
+    poll_for_completion = args.poll_for_completion.lower() == "true"
+    timeout_seconds = float(args.timeout_seconds) if args.timeout_seconds else None
+
+    # The notebook path and parameters inputs apply to the first task only,
+    # the batch file maps parameters to any task by task key.
     if args.notebook_base_params != "" or args.notebook_path != "":
-        dbx_conn.update_notebook_tasks(
+        update_notebook_task(
             config_json["tasks"][0],
             {} if args.notebook_base_params == "" else json.loads(args.notebook_base_params),
             args.notebook_path,
         )
 
-    job_id = dbx_conn.submit_onetime_run(config_json)
-    if args.poll_for_completion.lower() == "true":
-        logger.info(f"Polling for job completion. Job ID: {job_id}")
-        resp = dbx_conn.poll_run_for_completion(job_id, wait_between_polls_sec=10)
-        status, _ = dbx_conn.parse_job_run_state(resp)
+    if args.batch_params_path != "":
+        # Batch mode: one run per parameter set of the batch file
+        runs = load_batch_runs(args.batch_params_path, config_json)
+        logger.info(f"Submitting {len(runs)} runs, at most {args.max_concurrent_runs} at a time")
+        results = run_batch(client, runs, poll_for_completion, timeout_seconds, args.max_concurrent_runs)
+        results_table = format_results_table(results)
+        print(results_table)
+        if os.environ.get("GITHUB_STEP_SUMMARY"):
+            with open(os.environ["GITHUB_STEP_SUMMARY"], "a") as summary:
+                print(results_table, file=summary)
+        if any(result.failed for result in results):
+            sys.exit(1)
+        sys.exit(0)
+
+    run_id = client.submit_run(config_json, idempotency_token=uuid.uuid4().hex)
+    if poll_for_completion:
+        logger.info(f"Polling for job completion. Run ID: {run_id}")
+        run, stats = RunPoller(client).wait(run_id, timeout_seconds)
+        status = "TIMEDOUT" if stats.timed_out else result_state(run)
         logger.info(f"Final job run status: {status}")
-        assert status == "SUCCESS"
+        if stats.detection_latency is None:
+            logger.info(f"Polled {stats.polls} times")
+        else:
+            logger.info(
+                f"Polled {stats.polls} times, completion detected {stats.detection_latency:.1f}s after the run ended"
+            )
+        if status != "SUCCESS":
+            sys.exit(1)
     else:
-        logger.info(f"Job submitted. Job ID: {job_id}. Not polling for completion.")
+        logger.info(f"Job submitted. Run ID: {run_id}. Not polling for completion.")
@@ -1,33 +1,225 @@
-
 import argparse
+import hashlib
+import logging
 import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dbx-common"))
+from dbx_client import DatabricksClient
+from dbx_run_poller import TERMINAL_LIFE_CYCLE_STATES, life_cycle_state, result_state
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Number of jobs triggered, and of runs polled, concurrently
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_POLL_INTERVAL_SECONDS = 30.0
+DEFAULT_TIMEOUT_SECONDS = 3600.0
+FAILED_RUN_ID = "Failed"
+
+
+class RunResult(NamedTuple):
+    """
+    Final state of a triggered run.
+
+    Args:
+        job_id (str): ID of the job the run belongs to.
+        run_id (str): ID of the run.
+        life_cycle_state (str): Last life cycle state seen, e.g. TERMINATED.
+        result_state (str): SUCCESS, FAILED... or TIMEDOUT when the deadline passed before the run finished.
+        run_page_url (str): Link to the run in the workspace.
+    """
+
+    job_id: str
+    run_id: str
+    life_cycle_state: str
+    result_state: str
+    run_page_url: str
+
+    @property
+    def succeeded(self) -> bool:
+        return self.result_state == "SUCCESS"
+
+
+def idempotency_token(job_id: str) -> str:
+    """
+    Token identifying the trigger of a job by this workflow step, so a retried run-now request
+    returns the run already started instead of starting a second one. Re-running the workflow
+    (a new run attempt) triggers new runs. Outside of GitHub Actions the token is random.
+    """
+    if "GITHUB_RUN_ID" not in os.environ:
+        return uuid.uuid4().hex
+    trigger = ":".join(
+        [
+            os.environ["GITHUB_RUN_ID"],
+            os.environ.get("GITHUB_RUN_ATTEMPT", "1"),
+            os.environ.get("GITHUB_ACTION", ""),
+            job_id,
+        ]
+    )
+    # the API accepts tokens of up to 64 characters
+    return hashlib.sha256(trigger.encode()).hexdigest()
+
+
+def trigger_job(client: DatabricksClient, job_id: str) -> str:
+    """
+    Trigger a run of a job, returning its run ID or FAILED_RUN_ID if the job could not be triggered.
+    """
+    try:
+        run_id = str(client.run_now(int(job_id), idempotency_token=idempotency_token(job_id)))
+        logger.info(f"Job {job_id} running with run_id {run_id}")
+    except Exception as e:
+        logger.warning(f"Ran into an error {e} running job {job_id}")
+        run_id = FAILED_RUN_ID
+    return run_id
+
+
+def trigger_jobs(
+    client: DatabricksClient, job_ids: List[str], max_workers: int = DEFAULT_MAX_WORKERS
+) -> Dict[str, str]:
+    """
+    Trigger a run of every job concurrently.
+
+    Args:
+        client (DatabricksClient): Client for the workspace.
+        job_ids (list): IDs of the jobs to run. A job listed twice is triggered once.
+        max_workers (int): Number of jobs triggered concurrently.
+    Returns:
+        dict: Run ID, or FAILED_RUN_ID, of each job in the order of job_ids.
+    """
+    job_ids = list(dict.fromkeys(job_ids))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(job_ids, executor.map(lambda job_id: trigger_job(client, job_id), job_ids)))
+
+
+def format_run_ids(job_to_run_ids: Dict[str, str]) -> str:
+    return ", ".join([f"{job_id}:{run_id}" for job_id, run_id in job_to_run_ids.items()])
+
+
+def fetch_run(client: DatabricksClient, run_id: str) -> Optional[dict]:
+    """
+    Fetch the state of a run, returning None if it could not be fetched.
+    """
+    try:
+        return client.get_run(int(run_id))
+    except Exception as e:
+        logger.warning(f"Could not get the state of run {run_id}: {e}")
+        return None
+
+
+def wait_for_runs(
+    client: DatabricksClient,
+    job_to_run_ids: Dict[str, str],
+    timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+    poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> List[RunResult]:
+    """
+    Wait for the triggered runs with a single polling loop. Every round fetches the state of all
+    outstanding runs concurrently, and each run is reported as soon as it reaches a terminal state.
+    A run whose state cannot be fetched stays outstanding for the next round. Runs still going, or
+    still failing to be fetched, when the deadline passes are reported as TIMEDOUT and left running.
+
+    Args:
+        client (DatabricksClient): Client for the workspace.
+        job_to_run_ids (dict): Run ID of each job, jobs that failed to trigger are skipped.
+        timeout_seconds (float): Overall deadline for every run to finish.
+        poll_interval (float): Seconds between polling rounds.
+        max_workers (int): Number of runs polled concurrently.
+        clock (Callable): Monotonic clock in seconds.
+        sleep (Callable): Sleeps for the given number of seconds.
+    Returns:
+        list: RunResult of every triggered run, in the order the runs finished.
+    """
+    outstanding = {run_id: job_id for job_id, run_id in job_to_run_ids.items() if run_id != FAILED_RUN_ID}
+    deadline = clock() + timeout_seconds
+    results = []
+    last_states: Dict[str, dict] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while outstanding:
+            run_ids = list(outstanding)
+            for run_id, run in zip(run_ids, executor.map(lambda run_id: fetch_run(client, run_id), run_ids)):
+                if run is None:
+                    # checked again next round, and reported as TIMEDOUT if it never answers
+                    continue
+                last_states[run_id] = run
+                if life_cycle_state(run) in TERMINAL_LIFE_CYCLE_STATES:
+                    result = RunResult(
+                        outstanding.pop(run_id),
+                        run_id,
+                        life_cycle_state(run),
+                        result_state(run),
+                        run.get("run_page_url", ""),
+                    )
+                    log = logger.info if result.succeeded else logger.error
+                    log(
+                        f"Run {run_id} of job {result.job_id} finished with {result.result_state} "
+                        f"{result.run_page_url}"
+                    )
+                    results.append(result)
+            if not outstanding:
+                break
+            remaining = deadline - clock()
+            if remaining <= 0:
+                break
+            logger.info(f"Waiting on {len(outstanding)} runs")
+            sleep(min(poll_interval, remaining))
+
+    for run_id, job_id in outstanding.items():
+        run = last_states.get(run_id, {})
+        logger.error(f"Run {run_id} of job {job_id} did not finish within {timeout_seconds:.0f}s")
+        results.append(
+            RunResult(
+                job_id,
+                run_id,
+                life_cycle_state(run),
+                "TIMEDOUT",
+                run.get("run_page_url", ""),
+            )
+        )
+    return results
 
-logger = LM.get_logger(__name__)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--dbx_instance_url", required=True, help="URL for the databricks instance")
     parser.add_argument("-t", "--dbx_token", required=True, help="Personal access token for the databricks instance")
     parser.add_argument("-j", "--job_ids", required=True, help="Comma seperated string of job ids to run")
+    parser.add_argument(
+        "-w", "--wait", action="store_true", help="Wait for the runs to finish and fail if any run fails"
+    )
+    parser.add_argument(
+        "--timeout_seconds", type=float, default=DEFAULT_TIMEOUT_SECONDS, help="Deadline for every run to finish"
+    )
+    parser.add_argument(
+        "--poll_interval", type=float, default=DEFAULT_POLL_INTERVAL_SECONDS, help="Seconds between run state checks"
+    )
+    parser.add_argument(
+        "--max_workers", type=int, default=DEFAULT_MAX_WORKERS, help="Number of concurrent trigger and poll requests"
+    )
 
     args = parser.parse_args()
 
-    db_conn = Databricks(args.dbx_instance_url, args.dbx_token)
+    client = DatabricksClient(args.dbx_instance_url, args.dbx_token)
 
-    job_ids = args.job_ids.strip().split(',')
+    job_ids = [job_id.strip() for job_id in args.job_ids.strip().split(',') if job_id.strip()]
 
-    job_to_run_ids = {}
-    
-    for job_id in job_ids:
-        try:
-            run_id = str(db_conn.run_job(int(job_id.strip())))
-            logger.info(f"Job {job_id} running with run_id {run_id}")
-        except Exception as e:
-            logger.warning(f"Ran into an error {e} running job {job_id}")
-            run_id = 'Failed'
-        
-        job_to_run_ids[job_id] = run_id
+    job_to_run_ids = trigger_jobs(client, job_ids, args.max_workers)
 
+    # the run IDs are output before waiting so later steps get them even if a run fails
     with open(os.environ["GITHUB_OUTPUT"], 'a') as github_output:
-        job_run_id_mapping_string = ', '.join([f"{job_id}:{run_id}" for job_id, run_id in job_to_run_ids.items()])
-        print(f"run_ids={job_run_id_mapping_string}", file=github_output)
+        print(f"run_ids={format_run_ids(job_to_run_ids)}", file=github_output)
+
+    if args.wait:
+        results = wait_for_runs(client, job_to_run_ids, args.timeout_seconds, args.poll_interval, args.max_workers)
+        failed_jobs = [job_id for job_id, run_id in job_to_run_ids.items() if run_id == FAILED_RUN_ID]
+        failed_jobs += [result.job_id for result in results if not result.succeeded]
+        if failed_jobs:
+            logger.error(f"Jobs {', '.join(failed_jobs)} did not run successfully")
+            sys.exit(1)
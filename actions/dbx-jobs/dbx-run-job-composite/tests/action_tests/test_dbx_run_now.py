@@ -0,0 +1,99 @@
+import threading
+
+from dbx_run_now import FAILED_RUN_ID, format_run_ids, trigger_jobs, wait_for_runs
+
+
+class FakeClient:
+    """
+    Stands in for DatabricksClient, starting runs that finish after a given number of polls.
+    The first polls of the runs in failing_polls raise a connection error.
+    """
+
+    def __init__(self, polls_to_finish, result_states=None, failing_polls=None):
+        self.polls_to_finish = polls_to_finish
+        self.result_states = result_states or {}
+        self.failing_polls = failing_polls or {}
+        self.polls = {}
+        self.tokens = []
+        self.lock = threading.Lock()
+
+    def run_now(self, job_id, idempotency_token=None):
+        if job_id == 404:
+            raise Exception("RESOURCE_DOES_NOT_EXIST :: Job 404 does not exist")
+        with self.lock:
+            self.tokens.append(idempotency_token)
+        return job_id * 10
+
+    def get_run(self, run_id):
+        with self.lock:
+            self.polls[run_id] = self.polls.get(run_id, 0) + 1
+            polls = self.polls[run_id]
+        if polls <= self.failing_polls.get(run_id, 0):
+            raise ConnectionError("connection reset by peer")
+        if polls < self.polls_to_finish.get(run_id, 1):
+            return {"run_id": run_id, "state": {"life_cycle_state": "RUNNING"}}
+        return {
+            "run_id": run_id,
+            "state": {"life_cycle_state": "TERMINATED", "result_state": self.result_states.get(run_id, "SUCCESS")},
+        }
+
+
+def test_trigger_jobs_keeps_order_and_output_format():
+    """
+    This test asserts that jobs are triggered once each with distinct idempotency tokens, failures are reported
+    as Failed, and the run_ids output keeps the job_id:run_id format in the order of the inputs.
+    """
+    client = FakeClient({})
+
+    job_to_run_ids = trigger_jobs(client, ["3", "404", "1", "3"])
+
+    assert format_run_ids(job_to_run_ids) == f"3:30, 404:{FAILED_RUN_ID}, 1:10"
+    assert len(set(client.tokens)) == 2
+
+
+def test_wait_for_runs_reports_runs_as_they_finish(clock):
+    """
+    This test asserts that the runs are polled together until each one finishes, in finishing order.
+    """
+    client = FakeClient({10: 3, 20: 1, 30: 2}, {30: "FAILED"})
+
+    results = wait_for_runs(client, {"1": "10", "2": "20", "3": "30"}, 600, 30, clock=clock, sleep=clock.sleep)
+
+    assert [(result.job_id, result.result_state) for result in results] == [
+        ("2", "SUCCESS"),
+        ("3", "FAILED"),
+        ("1", "SUCCESS"),
+    ]
+    assert client.polls == {10: 3, 20: 1, 30: 2}
+    assert clock.now == 60
+
+
+def test_wait_for_runs_enforces_deadline(clock):
+    """
+    This test asserts that runs still going at the deadline are reported as TIMEDOUT and polling stops.
+    """
+    client = FakeClient({10: 100})
+
+    results = wait_for_runs(client, {"1": "10", "2": FAILED_RUN_ID}, 90, 30, clock=clock, sleep=clock.sleep)
+
+    assert [(result.job_id, result.result_state, result.life_cycle_state) for result in results] == [
+        ("1", "TIMEDOUT", "RUNNING")
+    ]
+    assert client.polls == {10: 4}
+
+
+def test_wait_for_runs_survives_failed_polls(clock):
+    """
+    This test asserts that a run whose state cannot be fetched is polled again next round without
+    stopping the wait for the other runs, and is reported as TIMEDOUT if it never answers.
+    """
+    client = FakeClient({10: 1, 20: 1, 30: 1}, failing_polls={10: 2, 30: 100})
+
+    results = wait_for_runs(client, {"1": "10", "2": "20", "3": "30"}, 90, 30, clock=clock, sleep=clock.sleep)
+
+    assert [(result.job_id, result.result_state) for result in results] == [
+        ("2", "SUCCESS"),
+        ("1", "SUCCESS"),
+        ("3", "TIMEDOUT"),
+    ]
+    assert client.polls == {10: 3, 20: 1, 30: 4}
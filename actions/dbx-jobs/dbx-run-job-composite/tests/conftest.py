@@ -0,0 +1,12 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "dbx-common"))
+from dbx_testing import ManualClock
+
+
+@pytest.fixture
+def clock():
+    return ManualClock()
@@ -0,0 +1,116 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from validate_dbx_job import (
+    DatabricksClient,
+    fetch_job_id,
+    fetch_latest_job_run_status,
+    validate_job_configs,
+    write_report,
+)
+
+PULL_REQUEST_TIMESTAMP = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client():
+    return DatabricksClient("adb-1.7.azuredatabricks.net", "token")
+
+
+@pytest.fixture
+def pages(client, monkeypatch):
+    """
+    Serves the pages of a paginated endpoint keyed by page token and records the requests made.
+    """
+    served = {"pages": {}, "requests": []}
+
+    def fake_get(endpoint, params=None):
+        served["requests"].append(dict(params))
+        return served["pages"][params.get("page_token")]
+
+    monkeypatch.setattr(client, "get", fake_get)
+    return served
+
+
+def run(run_id, start_time, end_time, result_state):
+    return {"run_id": run_id, "start_time": start_time, "end_time": end_time, "state": {"result_state": result_state}}
+
+
+def test_fetch_job_id_stops_at_first_job(client, pages):
+    """
+    This test asserts that the first job with the name is returned without fetching further pages.
+    """
+    pages["pages"] = {None: {"jobs": [{"job_id": 11}, {"job_id": 12}], "has_more": True, "next_page_token": "2"}}
+
+    assert fetch_job_id(client, "job") == 11
+    assert len(pages["requests"]) == 1
+
+
+def test_fetch_latest_job_run_status_keeps_latest_end_time(client, pages):
+    """
+    This test asserts that every page is scanned for overlapping runs and the run that ended last is used.
+    """
+    pages["pages"] = {
+        None: {
+            "runs": [run(3, 300, 400, "SUCCESS"), run(2, 200, 250, "FAILED")],
+            "has_more": True,
+            "next_page_token": "2",
+        },
+        "2": {"runs": [run(1, 100, 900, "CANCELED")], "has_more": False},
+    }
+
+    status = fetch_latest_job_run_status(client, 7, PULL_REQUEST_TIMESTAMP)
+
+    assert status == "CANCELED"
+    assert pages["requests"][0]["start_time_from"] == 1714521600000
+
+
+def test_fetch_latest_job_run_status_stops_early_without_overlap(client, pages):
+    """
+    This test asserts that the newest run is returned from the first page when runs of the job cannot overlap.
+    """
+    pages["pages"] = {None: {"runs": [run(3, 300, 400, "SUCCESS")], "has_more": True, "next_page_token": "2"}}
+
+    status = fetch_latest_job_run_status(client, 7, PULL_REQUEST_TIMESTAMP, runs_overlap=False)
+
+    assert status == "SUCCESS"
+    assert len(pages["requests"]) == 1
+
+
+def test_validate_job_configs_reports_every_file(client, tmp_path, monkeypatch):
+    """
+    This test asserts that many configs are validated with one job listing and a consolidated report,
+    skipping files that are not job configs.
+    """
+    for job_name in ["passing_job", "failing_job", "missing_job"]:
+        (tmp_path / f"{job_name}.json").write_text(json.dumps({"name": job_name}))
+    (tmp_path / "README.md").write_text("docs")
+    list_requests = []
+
+    def fake_get(endpoint, params=None):
+        if endpoint == "/api/2.1/jobs/list":
+            list_requests.append(dict(params))
+            jobs = [
+                {"job_id": 1, "settings": {"name": "passing_job"}},
+                {"job_id": 2, "settings": {"name": "failing_job"}},
+            ]
+            return {"jobs": jobs, "has_more": False}
+        result_state = "SUCCESS" if params["job_id"] == 1 else "FAILED"
+        return {"runs": [run(10, 300, 400, result_state)], "has_more": False}
+
+    monkeypatch.setattr(client, "get", fake_get)
+    file_names = ["passing_job.json", "failing_job.json", "missing_job.json", "README.md"]
+    file_paths = [str(tmp_path / file_name) for file_name in file_names]
+
+    results = validate_job_configs(client, file_paths, PULL_REQUEST_TIMESTAMP)
+    write_report(results, str(tmp_path / "report.json"), str(tmp_path / "summary.md"))
+
+    assert [result.status for result in results] == ["PASSED", "FAILED", "FAILED", "SKIPPED"]
+    assert results[1].result_state == "FAILED"
+    assert len(list_requests) == 1
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["passed"] is False
+    assert [result["job_name"] for result in report["results"]] == ["passing_job", "failing_job", "missing_job", ""]
+    assert "| failing_job | FAILED | FAILED |" in (tmp_path / "summary.md").read_text()
@@ -1,16 +1,43 @@
 import argparse
 import json
+import logging
 import os
 import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
 
-import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dbx-common"))
+from dbx_client import DatabricksClient
 
-import requests
+logger = logging.getLogger("Job Validation")
+logging.basicConfig(level=logging.INFO)
 
-logger = LogManager().get_logger("Job Validation")
+# Number of jobs whose runs are fetched concurrently
+DEFAULT_MAX_WORKERS = 8
+
+
+class ValidationResult(NamedTuple):
+    """
+    Outcome of validating one changed file.
+
+    Args:
+        file_path (str): Path of the changed file.
+        job_name (str): Name of the job in the config, empty if the file is not a job config.
+        job_id (Optional[int]): ID of the job in the workspace, None if it does not exist.
+        status (str): PASSED, FAILED or SKIPPED for files that are not job configs.
+        result_state (str): Result state of the latest run since the pull request, empty if there was none.
+        message (str): Explanation of the status.
+    """
+
+    file_path: str
+    job_name: str
+    job_id: Optional[int]
+    status: str
+    result_state: str
+    message: str
 
 def clean_dbx_hostname(hostname: str) -> str:
     """
@@ -45,192 +72,271 @@ def extract_workspace_id(hostname: str) -> str:
     else:
         return None
 
-def fetch_request(base_uri: str, endpoint: str, headers: Dict[str, str], params: Dict[str, Any]) -> requests.Response:
+def fetch_job(client: DatabricksClient, job_name: str) -> Optional[Dict[str, Any]]:
     """
-    Makes a request to the Databricks Jobs API.
-    
+    Fetches the first job with a given name from the Databricks Jobs API, without paging further.
+
     Args:
-        base_uri (str): The base URI of the Databricks workspace.
-        endpoint (str): The endpoint of the Databricks Jobs API.
-        headers (Dict[str, str]): The headers for the request.
-        params (Dict[str, Any]): The parameters for the request.
+        client (DatabricksClient): Client for the Databricks workspace.
+        job_name (str): The name of the job to fetch.
 
     Returns:
-        requests.Response: The response from the Databricks Jobs API.
+        Optional[Dict[str, Any]]: The job, with its settings, if found, otherwise None.
     """
-    return requests.get("https://" + base_uri + endpoint, headers=headers, params=params)
+    return next(client.iter_jobs(name=job_name), None)
+
 
-def fetch_job_id(base_uri: str, api_token: str, job_name: str) -> str:
+def fetch_job_id(client: DatabricksClient, job_name: str) -> str:
     """
     Fetches the job ID for a given job name from the Databricks Jobs API.
 
     Args:
-        base_uri (str): The base URI of the Databricks workspace.
-        api_token (str): The API token for authentication.
+        client (DatabricksClient): Client for the Databricks workspace.
         job_name (str): The name of the job to fetch the ID for.
 
     Returns:
         str: The job ID if found, otherwise an empty string.
     """
-    endpoint = "/api/2.1/jobs/list"
-    headers = {"Authorization": f"Bearer {api_token}"}
+    job = fetch_job(client, job_name)
+    return "" if job is None else job["job_id"]
 
-    all_data = []
 
-    params = {
-        "name": job_name,
-    }
-    while True:
-        response = fetch_request(base_uri, endpoint, headers, params)
-        response_json = response.json()
+def fetch_latest_job_run_status(
+    client: DatabricksClient, job_id: str, pull_request_timestamp: datetime, runs_overlap: bool = True
+) -> str:
+    """
+    Fetches the latest job run status for a given job ID from the Databricks Jobs API.
+    The latest run is the completed run with the greatest end time, tracked as a running maximum of the
+    raw millisecond timestamps while the pages are streamed.
 
-        data = []
+    Runs are listed newest start time first. When the runs of the job cannot overlap (max_concurrent_runs
+    of 1), the first run listed also ended last and paging stops there. Otherwise a run that started earlier
+    may have ended later, so every run since the pull request is scanned.
 
-        if response_json.get("jobs") is None:
-            return ""
+    Args:
+        client (DatabricksClient): Client for the Databricks workspace.
+        job_id (str): The ID of the job to fetch the run status for.
+        pull_request_timestamp (datetime): The timestamp to filter job runs starting from this time.
+        runs_overlap (bool): Whether runs of the job can run concurrently.
 
-        for job in response_json["jobs"]:
-            data.append(
-                {
-                    "job_id": job["job_id"],
-                }
-            )
+    Returns:
+        str: The result state of the latest job run if found, otherwise an empty string.
+    """
+    runs = client.iter_runs(
+        job_id=job_id,
+        completed_only=True,
+        start_time_from=int(pull_request_timestamp.timestamp() * 1000),
+    )
 
-        all_data.extend(data)
-        df = pd.DataFrame(all_data)
+    latest_end_time = None
+    latest_result_state = ""
+    for run in runs:
+        # ties keep the run listed first, the one that started last
+        if latest_end_time is None or run["end_time"] > latest_end_time:
+            latest_end_time = run["end_time"]
+            latest_result_state = run["state"].get("result_state", "")
+        if not runs_overlap:
+            return latest_result_state
+    return latest_result_state
 
-        if response_json.get("has_more") == True:
-            next_page_token = response_json.get("next_page_token")
-            params["page_token"] = next_page_token
-        else:
-            break
 
-    df = pd.DataFrame(all_data)
+def fetch_jobs_by_name(client: DatabricksClient, job_names: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetches the jobs with the given names from a single paginated listing of the workspace jobs,
+    stopping as soon as every name is found.
 
-    if df.empty:
-        return ""
+    Args:
+        client (DatabricksClient): Client for the Databricks workspace.
+        job_names (Iterable[str]): The names of the jobs to fetch.
 
-    return df.iloc[0]["job_id"]
+    Returns:
+        Dict[str, Dict[str, Any]]: The first job listed for each name found.
+    """
+    remaining_names = set(job_names)
+    jobs_by_name = {}
+    if not remaining_names:
+        return jobs_by_name
+    for job in client.iter_jobs():
+        job_name = job["settings"]["name"]
+        if job_name in remaining_names:
+            jobs_by_name[job_name] = job
+            remaining_names.discard(job_name)
+            if not remaining_names:
+                break
+    return jobs_by_name
+
+
+def validate_job(
+    client: DatabricksClient,
+    file_path: str,
+    job_name: str,
+    job: Optional[Dict[str, Any]],
+    pull_request_timestamp: datetime,
+) -> ValidationResult:
+    """
+    Validates that a job has been run successfully since the pull request was opened.
 
+    Args:
+        client (DatabricksClient): Client for the Databricks workspace.
+        file_path (str): Path of the job config.
+        job_name (str): Name of the job.
+        job (Optional[Dict[str, Any]]): The job in the workspace, None if it does not exist.
+        pull_request_timestamp (datetime): The timestamp to filter job runs starting from this time.
 
-def fetch_latest_job_run_status(
-    base_uri: str, api_token: str, job_id: str, pull_request_timestamp: datetime
-) -> str:
+    Returns:
+        ValidationResult: The outcome of the validation.
     """
-    Fetches the latest job run status for a given job ID from the Databricks Jobs API.
+    if job is None:
+        return ValidationResult(file_path, job_name, None, "FAILED", "", "Job does not exist in the dev environment")
+
+    # jobs default to a single concurrent run
+    runs_overlap = job.get("settings", {}).get("max_concurrent_runs", 1) > 1
+    run_status = fetch_latest_job_run_status(client, job["job_id"], pull_request_timestamp, runs_overlap)
+    if run_status == "":
+        message = "Job has not been run in the dev environment since the pull request was opened"
+        return ValidationResult(file_path, job_name, job["job_id"], "FAILED", "", message)
+    if run_status != "SUCCESS":
+        message = "Latest run since the pull request was opened did not succeed"
+        return ValidationResult(file_path, job_name, job["job_id"], "FAILED", run_status, message)
+    message = "Job has been run successfully since the pull request was opened"
+    return ValidationResult(file_path, job_name, job["job_id"], "PASSED", run_status, message)
+
+
+def validate_job_configs(
+    client: DatabricksClient,
+    file_paths: List[str],
+    pull_request_timestamp: datetime,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> List[ValidationResult]:
+    """
+    Validates many changed files at once: the job names are resolved with one listing of the workspace jobs
+    and the runs of every job are fetched concurrently. Files that are not JSON job configs are skipped.
 
     Args:
-        base_uri (str): The base URI of the Databricks workspace.
-        api_token (str): The API token for authentication.
-        job_id (str): The ID of the job to fetch the run status for.
+        client (DatabricksClient): Client for the Databricks workspace.
+        file_paths (List[str]): Paths of the changed files.
         pull_request_timestamp (datetime): The timestamp to filter job runs starting from this time.
+        max_workers (int): Number of jobs whose runs are fetched concurrently.
 
     Returns:
-        str: The result state of the latest job run if found, otherwise an empty string.
+        List[ValidationResult]: The outcome for every file, in the order of file_paths.
     """
-    endpoint = "/api/2.1/jobs/runs/list"
-    headers = {"Authorization": f"Bearer {api_token}"}
-
-    all_data = []
-
-    params = {
-        "job_id": job_id,
-        "completed_only": True,
-        "start_time_from": pull_request_timestamp.timestamp() * 1000,
-    }
-    while True:
-        response = fetch_request(base_uri, endpoint, headers, params)
-        response_json = response.json()
-
-        data = []
-
-        if response_json.get("runs") is None:
-            return ""
-
-        for run in response_json["runs"]:
-            start_time_ms = run["start_time"]
-            start_time_seconds = start_time_ms / 1000
-            start_time_readable = datetime.fromtimestamp(start_time_seconds).strftime("%Y-%m-%d %H:%M:%S")
-            end_time_ms = run["end_time"]
-            end_time_seconds = end_time_ms / 1000
-            end_time_readable = datetime.fromtimestamp(end_time_seconds).strftime("%Y-%m-%d %H:%M:%S")
-            data.append(
-                {
-                    "job_id": run["job_id"],
-                    "run_id": run["run_id"],
-                    "result_state": run["state"].get("result_state"),
-                    "start_time": start_time_readable,
-                    "end_time": end_time_readable,
-                }
+    results = {}
+    job_names = {}
+    for file_path in file_paths:
+        if not file_path.lower().endswith(".json"):
+            logger.info(f"Skipping {file_path}, changed file is not a job config")
+            results[file_path] = ValidationResult(file_path, "", None, "SKIPPED", "", "Not a job config")
+            continue
+        with open(file_path) as json_file:
+            job_name = json.load(json_file).get("name")
+        if not job_name:
+            results[file_path] = ValidationResult(file_path, "", None, "FAILED", "", "Job config has no name")
+            continue
+        job_names[file_path] = job_name
+
+    jobs_by_name = fetch_jobs_by_name(client, job_names.values())
+    logger.info(f"Validating {len(job_names)} jobs. Pull request timestamp: {pull_request_timestamp}.")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            file_path: executor.submit(
+                validate_job,
+                client,
+                file_path,
+                job_name,
+                jobs_by_name.get(job_name),
+                pull_request_timestamp,
             )
+            for file_path, job_name in job_names.items()
+        }
+        for file_path, future in futures.items():
+            results[file_path] = future.result()
 
-        all_data.extend(data)
-        df = pd.DataFrame(all_data)
+    for result in results.values():
+        if result.status == "FAILED":
+            logger.error(f"{result.file_path} ({result.job_name}): {result.message} {result.result_state}".rstrip())
+        elif result.status == "PASSED":
+            logger.info(f"{result.file_path} ({result.job_name}): {result.message}")
+    return [results[file_path] for file_path in dict.fromkeys(file_paths)]
 
-        if response_json.get("has_more") == True:
-            next_page_token = response_json.get("next_page_token")
-            params["page_token"] = next_page_token
-        else:
-            break
 
-    df = pd.DataFrame(all_data)
+def format_report_table(results: List[ValidationResult]) -> str:
+    """
+    Formats the validation results as a markdown table for the job summary.
 
-    if df.empty:
-        return ""
+    Args:
+        results (List[ValidationResult]): The validation results.
 
-    df["start_time"] = pd.to_datetime(df["start_time"])
-    df["end_time"] = pd.to_datetime(df["end_time"])
-    df_sorted = df.sort_values(by="end_time", ascending=False)
-    latest_record = df_sorted.iloc[0]
+    Returns:
+        str: The markdown table.
+    """
+    lines = [
+        "| File | Job | Status | Latest run | Details |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for result in results:
+        lines.append(
+            f"| {result.file_path} | {result.job_name} | {result.status} | {result.result_state or '-'} "
+            f"| {result.message} |"
+        )
+    return "\n".join(lines)
+
+
+def write_report(results: List[ValidationResult], report_path: Optional[str], summary_path: Optional[str]) -> None:
+    """
+    Writes the validation results as a JSON report and appends them to the job summary.
 
-    return latest_record["result_state"]
+    Args:
+        results (List[ValidationResult]): The validation results.
+        report_path (Optional[str]): Path of the JSON report, None to skip it.
+        summary_path (Optional[str]): Path of the GitHub step summary, None to skip it.
+    """
+    if report_path:
+        report = {
+            "passed": all(result.status != "FAILED" for result in results),
+            "results": [result._asdict() for result in results],
+        }
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    if summary_path:
+        with open(summary_path, "a") as summary:
+            print("## Databricks job validation", file=summary)
+            print(format_report_table(results), file=summary)
 
 
 ## Main
-parser = argparse.ArgumentParser(
-    prog="Validate job on Databricks",
-    description="This script takes a json DBX job config file and validates that that the job has been run in the dev environment.",
-)
-parser.add_argument("-n", "--databricks-hostname", required=True, help="The Databricks Hostname to run SQL on")
-parser.add_argument("-t", "--databricks-token", required=True, help="Databricks Token for authentication")
-parser.add_argument("-f", "--file-path", required=True, help="File path to job to be validated")
-parser.add_argument("-p", "--pull-request-timestamp", required=True, help="Pull request timestamp")
-
-args = parser.parse_args()
-
-if args.file_path.lower().endswith(".json") == False:
-    logger.error("Changed file is not a job config")
-    exit(0)
-else:
-    logger.info("Changed file is a job config")
-
-with open(args.file_path) as json_file:
-    job_config = json.load(json_file)
-job_name = job_config.get("name")
-
-pull_request_timestamp = datetime.strptime(args.pull_request_timestamp, "%Y-%m-%dT%H:%M:%SZ").astimezone(timezone.utc)
-logger.info(f"Validating job: {job_name}. Pull request timestamp: {pull_request_timestamp}.")
-
-# Clean the databricks hostname if needed
-dbx_hostname = clean_dbx_hostname(hostname=args.databricks_hostname)
-databricks_token = args.databricks_token
-
-# Validate that the job has been run successfully in the dev environment since the pull request
-job_id = fetch_job_id(dbx_hostname, databricks_token, job_name)
-if job_id == "":
-    logger.info(f"Job {job_name} does not exist in the dev environment.")
-    exit(1)
-
-run_status = fetch_latest_job_run_status(dbx_hostname, databricks_token, job_id, pull_request_timestamp)
-
-if run_status == "":
-    logger.error(f"Job {job_name} has not been run in the dev environment since the pull request was opened.")
-    exit(1)
-elif run_status == "SUCCESS":
-    logger.info(f"Job {job_name} has been run successfully in the dev environment since the pull request was opened.")
-    exit(0)
-else:
-    logger.error(
-        f"Job {job_name} has not been run successfully in the dev environment since the pull request was opened. Last result state: {run_status}"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="Validate job on Databricks",
+        description="This script takes json DBX job config files and validates that the jobs have been run in the dev environment.",
+    )
+    parser.add_argument("-n", "--databricks-hostname", required=True, help="The Databricks Hostname to run SQL on")
+    parser.add_argument("-t", "--databricks-token", required=True, help="Databricks Token for authentication")
+    parser.add_argument("-f", "--file-path", required=True, nargs="+", help="File paths of the jobs to be validated")
+    parser.add_argument("-p", "--pull-request-timestamp", required=True, help="Pull request timestamp")
+    parser.add_argument("-r", "--report-path", default=None, help="Path of the JSON validation report")
+    parser.add_argument(
+        "-w", "--max-workers", type=int, default=DEFAULT_MAX_WORKERS, help="Jobs whose runs are fetched concurrently"
+    )
+
+    args = parser.parse_args()
+
+    # a single argument may hold several space separated paths
+    file_paths = [file_path for argument in args.file_path for file_path in argument.split()]
+
+    pull_request_timestamp = datetime.strptime(args.pull_request_timestamp, "%Y-%m-%dT%H:%M:%SZ").astimezone(
+        timezone.utc
     )
-    exit(1)
+
+    # Clean the databricks hostname if needed
+    dbx_hostname = clean_dbx_hostname(hostname=args.databricks_hostname)
+
+    # Validate that the jobs have been run successfully in the dev environment since the pull request
+    client = DatabricksClient(dbx_hostname, args.databricks_token)
+    results = validate_job_configs(client, file_paths, pull_request_timestamp, args.max_workers)
+    write_report(results, args.report_path, os.environ.get("GITHUB_STEP_SUMMARY"))
+
+    failed = [result for result in results if result.status == "FAILED"]
+    logger.info(f"{len(results) - len(failed)} of {len(results)} changed files passed validation")
+    if failed:
+        exit(1)
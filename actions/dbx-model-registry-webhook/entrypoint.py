@@ -3,166 +3,344 @@
 import os
 import json
 import sys
-import requests
+import argparse
 import random
 import string
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dbx-common"))
+from dbx_client import DatabricksClient, DatabricksAPIError
 
-def validate_local_webhook_json(webhook_path: str):
+# Number of webhooks created or updated concurrently
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_DESCRIPTION = "auto-generated description from a GitHub Action"
+
+# (model_name, events, url) identifying a webhook, model_name is None for registry-wide webhooks
+WebhookKey = Tuple[Optional[str], Tuple[str, ...], str]
+
+
+class WebhookSpec(NamedTuple):
+    """
+    A validated local webhook definition.
+    Args:
+        file_name (str): Name of the webhook JSON file
+        model_name (str): Registered model the webhook is attached to, None for a registry-wide webhook
+        events (tuple): Sorted model registry events triggering the webhook
+        url (str): Url called when the webhook is triggered
+        description (str): Description of the webhook
+    """
+
+    file_name: str
+    model_name: Optional[str]
+    events: Tuple[str, ...]
+    url: str
+    description: str
+
+    @property
+    def key(self) -> WebhookKey:
+        return (self.model_name, self.events, self.url)
+
+
+class WebhookPlan(NamedTuple):
+    """
+    Change needed to bring the registry in line with one local webhook definition.
+    Args:
+        spec (WebhookSpec): The local webhook definition
+        webhook_id (str): Id of the matching registry webhook, None if it has to be created
+        action (str): "create" or "update"
+    """
+
+    spec: WebhookSpec
+    webhook_id: Optional[str]
+    action: str
+
+
+###---------Functions----------###
+def validate_local_webhook_json(webhook_definition: dict, file_name: str):
+    """
+    This method validates a parsed webhook definition to make sure it meets the custom webhook schema
+    Args:
+        webhook_definition (dict): Parsed content of the webhook JSON file
+        file_name (str): Name of the webhook JSON file
+    """
+    print("Checking json schema for " + file_name)
+    if "events" not in webhook_definition:
+        sys.exit("ERROR: Missing events from json schema.")
+    elif "caller_url" not in webhook_definition:
+        sys.exit("ERROR: Missing caller_url from json schema.")
+    elif "caller_auth_type" not in webhook_definition:
+        sys.exit("ERROR: Missing caller_auth_type from json schema.")
+
+    if webhook_definition["caller_auth_type"].strip().lower() != "bearer":
+        sys.exit('ERROR: The only caller_auth_type supported is "bearer".')
+
+
+def load_webhook_spec(webhook_path: str) -> WebhookSpec:
     """
-    This method validates a provided JSON file to make sure it meets the custom webhook schema
+    This method reads, validates and normalizes a custom webhook JSON file, parsing it only once
     Args:
-        webhook_path (str): path to JSON file
+        webhook_path (str): Path to custom webhook JSON file
+    Returns:
+        WebhookSpec: The validated webhook definition
     """
-    with open(webhook_path, "r+") as local_webhook_json_file:
+    file_name = os.path.basename(webhook_path)
+    with open(webhook_path, "r") as local_webhook_json_file:
         webhook_definition = json.load(local_webhook_json_file)
-        print("Checking json schema for " + os.path.basename(webhook_path))
-        if "events" not in webhook_definition:
-            sys.exit("ERROR: Missing events from json schema.")
-        elif "caller_url" not in webhook_definition:
-            sys.exit("ERROR: Missing caller_url from json schema.")
-        elif "caller_auth_type" not in webhook_definition:
-            sys.exit("ERROR: Missing caller_auth_type from json schema.")
+    validate_local_webhook_json(webhook_definition, file_name)
+
+    # Handle optional json objects
+    model_name = webhook_definition.get("model_name")
+    if model_name is not None and model_name.strip() == "":
+        print("WARNING: model_name detected but is blank. Please add a model name or remove object.")
+        model_name = None
+    events = tuple(sorted(event.strip() for event in webhook_definition["events"].split(",") if event.strip()))
+    return WebhookSpec(
+        file_name,
+        model_name.strip() if model_name else None,
+        events,
+        webhook_definition["caller_url"],
+        webhook_definition.get("description", DEFAULT_DESCRIPTION),
+    )
 
-        if webhook_definition["caller_auth_type"].strip().lower() != "bearer":
-            sys.exit('ERROR: The only caller_auth_type supported is "bearer".')
+
+def load_webhook_specs(webhook_paths: List[str]) -> List[WebhookSpec]:
+    """
+    This method loads every webhook file and rejects files defining the same webhook twice
+    Args:
+        webhook_paths (list): Paths to custom webhook JSON files
+    Returns:
+        list: A WebhookSpec per file, in the same order
+    """
+    specs = [load_webhook_spec(webhook_path) for webhook_path in webhook_paths]
+    files_by_key = {}
+    for spec in specs:
+        if spec.key in files_by_key:
+            sys.exit(f"ERROR: {spec.file_name} and {files_by_key[spec.key]} define the same webhook.")
+        files_by_key[spec.key] = spec.file_name
+    return specs
 
 
-def generate_mlflow_api_json_from_local_json(
-    webhook_path: str, caller_auth_string: str
-) -> dict:
+def generate_mlflow_api_json_from_local_json(spec: WebhookSpec, caller_auth_string: str) -> dict:
     """
     This method builds a proper MLFlow API JSON schema from the custom webhook schema that can be used with the MLFlow API to create a Databricks Model Registry webhook.
     Args:
-        webhook_path (str): Path to custom webhook JSON file
+        spec (WebhookSpec): The validated webhook definition
         caller_auth_string (str): The authentication string used to authenticate the caller_url when triggered
     Returns:
         dict: Json Dict representation of a proper MLFlow JSON schema
     """
-    with open(webhook_path, "r+") as local_webhook_json_file:
-        local_webhook_definition = json.load(local_webhook_json_file)
-        # Handle optional json objects
-        mlflow_proper_definition = {}
-        if "model_name" in local_webhook_definition:  # TODO: clean up if statement
-            if local_webhook_definition["model_name"].strip() == "":
-                print(
-                    "WARNING: model_name detected but is blank. Please add a model name or remove object."
-                )
-            else:
-                mlflow_proper_json["model_name"] = local_webhook_definition[
-                    "model_name"
-                ]
-
-        if "description" not in local_webhook_definition:
-            mlflow_proper_definition[
-                "description"
-            ] = "auto-generated description from a GitHub Action"
-        # Add the assumed json objects
-        mlflow_proper_definition["status"] = "ACTIVE"
-        events_array = local_webhook_definition["events"].split(",")
-        mlflow_proper_definition["events"] = events_array
-        # Build the http_utl_spec
-        http_url_spec = {}
-        http_url_spec["url"] = local_webhook_definition["caller_url"]
-        http_url_spec["secret"] = "".join(random.choices(string.ascii_lowercase, k=10))
-        if local_webhook_definition["caller_auth_type"].strip().lower() == "bearer":
-            http_url_spec["authorization"] = "Bearer " + caller_auth_string
-
-        mlflow_proper_definition["http_url_spec"] = http_url_spec
-        return mlflow_proper_definition
-
-
-def create_model_registry_webhook(
-    webhook_json: dict, dbx_instance: str, dbx_token: str
-) -> str:
-    """
-    This method creates a Databricks Model Registry webhook in the provided Databricks Instance using the MLFlow API.
+    mlflow_proper_definition = {}
+    if spec.model_name:
+        mlflow_proper_definition["model_name"] = spec.model_name
+    mlflow_proper_definition["description"] = spec.description
+    # Add the assumed json objects
+    mlflow_proper_definition["status"] = "ACTIVE"
+    mlflow_proper_definition["events"] = list(spec.events)
+    # Build the http_url_spec
+    mlflow_proper_definition["http_url_spec"] = {
+        "url": spec.url,
+        "secret": "".join(random.choices(string.ascii_lowercase, k=10)),
+        "authorization": "Bearer " + caller_auth_string,
+    }
+    return mlflow_proper_definition
+
+
+def registry_webhook_key(webhook: dict) -> WebhookKey:
+    """
+    This method returns the (model_name, events, url) key of a webhook returned by the registry webhooks API
     Args:
-        webhook_json (dict): The JSON definition used to create the webhook
-        dbx_instance (str): The url for the Databricks Instance
-        dbx_token (str): The personal access token used to authenticate against the Databricks Instance
+        webhook (dict): Registry webhook
     Returns:
-        dict: Json Dict representation of cluster policy based on file path
-    """
-    # Databricks API URL (strip trailing slash if it exists)
-    url = dbx_instance.rstrip("/") + "/api/2.0/mlflow/registry-webhooks/create"
-    # Databricks API Headers
-    headers = {
-        "Authorization": "Bearer " + dbx_token,
-        "Content-Type": "text/plain",
-    }
-    json_body = json.dumps(webhook_json).encode("utf-8")
-    if DRY_RUN == "true":
-        print("DRY RUN DETECTED, not actually creating webhook")
-        return "none"
-    else:
-        try:
-            resp = requests.post(url, headers=headers, data=json_body)
-            jsonResponse = resp.json()
-            resp.raise_for_status()
-        except Exception as e:
-            print(str(e))
-            sys.exit(1)
-        return jsonResponse["webhook"]["id"]
+        tuple: The key used to match the webhook with a local definition
+    """
+    return (
+        webhook.get("model_name") or None,
+        tuple(sorted(webhook.get("events", []))),
+        webhook.get("http_url_spec", {}).get("url", ""),
+    )
 
 
-###----------Main Start-------------###
+def get_webhook_index(client: DatabricksClient) -> Dict[WebhookKey, dict]:
+    """
+    This method lists the registry webhooks once and indexes them by key. For duplicates the first one listed is used.
+    Args:
+        client (DatabricksClient): Client for the Databricks instance
+    Returns:
+        dict: Registry webhooks keyed by (model_name, events, url)
+    """
+    webhook_index = {}
+    for webhook in client.iter_registry_webhooks():
+        key = registry_webhook_key(webhook)
+        if key in webhook_index:
+            print(f"WARNING: Webhooks {webhook_index[key]['id']} and {webhook['id']} are duplicates, using the first")
+            continue
+        webhook_index[key] = webhook
+    return webhook_index
 
-# Set Argument Variables
-DBX_INSTANCE = sys.argv[1]
-DBX_ACCESS_TOKEN = sys.argv[2]
-WEBHOOKS_DIR = sys.argv[3]
-CALLER_AUTH_STRING = sys.argv[4]
-DRY_RUN = sys.argv[5].lower()
-
-# Validate variable values
-print("Validating Input Parameters...")
-if DRY_RUN != "true" and DRY_RUN != "false":
-    sys.exit('ERROR: Dry run variable must be set to "true" or "false".')
-print("SUCCESS")
-# Validate files exist in webhooks_dir
-print("Validating scripts exists in provided directory: " + WEBHOOKS_DIR)
-
-if not os.path.isdir(WEBHOOKS_DIR):
-    sys.exit("ERROR: " + WEBHOOKS_DIR + " does not exist!")
-
-if len(os.listdir(WEBHOOKS_DIR)) == 0:
-    sys.exit("ERROR: " + WEBHOOKS_DIR + " does not contain any files!")
-print("SUCCESS")
-
-print("Verifying files in " + WEBHOOKS_DIR)
-webhook_files = os.listdir(WEBHOOKS_DIR)
-for file in webhook_files:
-    if not file.endswith(".json"):
-        sys.exit(
-            "ERROR: " + file + " must be a JSON file. Please fix file and try again."
-        )
-    file_full_path = WEBHOOKS_DIR + "/" + file
-    validate_local_webhook_json(file_full_path)
-print("SUCCESS")
-
-
-# Create the webhooks
-webhooks = []
-try:
-    for webhook in webhook_files:
-        webhook_full_path = WEBHOOKS_DIR + "/" + webhook
-        print("Creating MLFlow proper API JSON from " + webhook_full_path)
-        mlflow_proper_json = generate_mlflow_api_json_from_local_json(
-            webhook_full_path, CALLER_AUTH_STRING
-        )
-        print("SUCCESS")
-        print("Creating webhook in provided DBX instance for " + webhook_full_path)
-        webhook_id = create_model_registry_webhook(
-            mlflow_proper_json, DBX_INSTANCE, DBX_ACCESS_TOKEN
+
+def plan_webhooks(client: DatabricksClient, specs: List[WebhookSpec]) -> List[WebhookPlan]:
+    """
+    This method plans the change for every local webhook from a single listing of the registry webhooks.
+    A matching webhook is always updated: the API does not return its authorization, so a rotated
+    caller authentication string can only be detected by sending it again.
+    Args:
+        client (DatabricksClient): Client for the Databricks instance
+        specs (list): The local webhook definitions
+    Returns:
+        list: A WebhookPlan per local webhook, in the same order
+    """
+    webhook_index = get_webhook_index(client)
+    plans = []
+    for spec in specs:
+        webhook = webhook_index.get(spec.key)
+        if webhook is None:
+            plans.append(WebhookPlan(spec, None, "create"))
+        else:
+            plans.append(WebhookPlan(spec, webhook["id"], "update"))
+    return plans
+
+
+def format_plan(plans: List[WebhookPlan]) -> str:
+    """
+    This method renders the plans as a summary of what would change in the model registry
+    Args:
+        plans (list): The WebhookPlans to render
+    Returns:
+        str: The rendered plan
+    """
+    symbols = {"create": "+", "update": "~"}
+    lines = [
+        f"{symbols[plan.action]} webhook {plan.spec.file_name} "
+        f"({plan.action}{', id ' + plan.webhook_id if plan.webhook_id else ''})"
+        for plan in plans
+    ]
+    creates = sum(plan.action == "create" for plan in plans)
+    lines.append(f"Plan: {creates} webhooks to create, {len(plans) - creates} to update")
+    return "\n".join(lines)
+
+
+def apply_webhook_plan(client: DatabricksClient, plan: WebhookPlan, caller_auth_string: str) -> str:
+    """
+    This method creates or updates a Databricks Model Registry webhook, as planned, using the MLFlow API.
+    Args:
+        client (DatabricksClient): Client for the Databricks instance
+        plan (WebhookPlan): The change planned for the webhook
+        caller_auth_string (str): The authentication string used to authenticate the caller_url when triggered
+    Returns:
+        str: The id of the webhook
+    """
+    if plan.action == "create":
+        webhook_json = generate_mlflow_api_json_from_local_json(plan.spec, caller_auth_string)
+        webhook_id = client.create_registry_webhook(webhook_json)["id"]
+        print("Created webhook " + webhook_id + " for " + plan.spec.file_name)
+        return webhook_id
+    if plan.action == "update":
+        # the existing secret is kept, the authorization is sent again in case it was rotated
+        client.update_registry_webhook(
+            plan.webhook_id,
+            {
+                "description": plan.spec.description,
+                "status": "ACTIVE",
+                "http_url_spec": {"url": plan.spec.url, "authorization": "Bearer " + caller_auth_string},
+            },
         )
-        webhooks.append(webhook_id)
-        print("Created webhook: " + webhook_id)  # Load this into the array
-except Exception as e:
-    print(str(e))
-    sys.exit(1)
+        print("Updated webhook " + plan.webhook_id + " for " + plan.spec.file_name)
+    return plan.webhook_id
+
+
+def apply_webhook_plans(
+    client: DatabricksClient,
+    plans: List[WebhookPlan],
+    caller_auth_string: str,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Tuple[List[str], Dict[str, Exception]]:
+    """
+    This method applies the plans concurrently. A webhook that fails is reported without stopping the others.
+    Args:
+        client (DatabricksClient): Client for the Databricks instance
+        plans (list): The WebhookPlans to apply
+        caller_auth_string (str): The authentication string used to authenticate the caller_url when triggered
+        max_workers (int): Number of webhooks applied concurrently
+    Returns:
+        tuple: Ids of the created webhooks, in plan order, and the exception of every failed webhook keyed by file name
+    """
+    created = []
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            (plan, executor.submit(apply_webhook_plan, client, plan, caller_auth_string))
+            for plan in plans
+        ]
+        for plan, future in futures:
+            try:
+                webhook_id = future.result()
+            except DatabricksAPIError as e:
+                print("ERROR: Failed to " + plan.action + " webhook " + plan.spec.file_name + ": " + str(e))
+                failures[plan.spec.file_name] = e
+                continue
+            if plan.action == "create":
+                created.append(webhook_id)
+    return created, failures
+
+
+###----------Main Start-------------###
+if __name__ == "__main__":
+    # Set Argument Variables
+    parser = argparse.ArgumentParser()
+    parser.add_argument("DBX_INSTANCE")
+    parser.add_argument("DBX_ACCESS_TOKEN")
+    parser.add_argument("WEBHOOKS_DIR")
+    parser.add_argument("CALLER_AUTH_STRING")
+    parser.add_argument("DRY_RUN")
+    parser.add_argument("-w", "--max-workers", type=int, default=DEFAULT_MAX_WORKERS)
+    args = parser.parse_args()
+    args.DRY_RUN = args.DRY_RUN.lower()
+
+    # Validate variable values
+    print("Validating Input Parameters...")
+    if args.DRY_RUN != "true" and args.DRY_RUN != "false":
+        sys.exit('ERROR: Dry run variable must be set to "true" or "false".')
+    print("SUCCESS")
+    # Validate files exist in webhooks_dir
+    print("Validating scripts exists in provided directory: " + args.WEBHOOKS_DIR)
+
+    if not os.path.isdir(args.WEBHOOKS_DIR):
+        sys.exit("ERROR: " + args.WEBHOOKS_DIR + " does not exist!")
+
+    if len(os.listdir(args.WEBHOOKS_DIR)) == 0:
+        sys.exit("ERROR: " + args.WEBHOOKS_DIR + " does not contain any files!")
+    print("SUCCESS")
+
+    print("Verifying files in " + args.WEBHOOKS_DIR)
+    webhook_files = sorted(os.listdir(args.WEBHOOKS_DIR))
+    for file in webhook_files:
+        if not file.endswith(".json"):
+            sys.exit(
+                "ERROR: " + file + " must be a JSON file. Please fix file and try again."
+            )
+    specs = load_webhook_specs([os.path.join(args.WEBHOOKS_DIR, file) for file in webhook_files])
+    print("SUCCESS")
+
+    client = DatabricksClient(args.DBX_INSTANCE, args.DBX_ACCESS_TOKEN)
+    print("Planning webhook changes")
+    try:
+        plans = plan_webhooks(client, specs)
+    except DatabricksAPIError as e:
+        print(str(e))
+        sys.exit(1)
+    print(format_plan(plans))
+
+    created, failures = [], {}
+    if args.DRY_RUN == "true":
+        print("DRY RUN DETECTED, not actually creating or updating webhooks")
+    else:
+        created, failures = apply_webhook_plans(client, plans, args.CALLER_AUTH_STRING, args.max_workers)
 
-with open(os.environ['GITHUB_OUTPUT'], "a") as github_output:
-    print(f"webhooks-created={','.join(webhooks)}", file=github_output)
+    # only the webhooks created by this run are reported, including when other webhooks failed
+    with open(os.environ["GITHUB_OUTPUT"], "a") as github_output:
+        print(f"webhooks-created={','.join(created)}", file=github_output)
+    if failures:
+        sys.exit("ERROR: Failed to apply " + str(len(failures)) + " webhooks: " + ", ".join(failures))
 
-print("DONE")
+    print("DONE")
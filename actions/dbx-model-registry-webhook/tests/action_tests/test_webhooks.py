@@ -0,0 +1,101 @@
+import json
+
+from entrypoint import apply_webhook_plans, load_webhook_spec, plan_webhooks
+
+WEBHOOK_URL = "https://example.com/hooks/registry"
+
+
+class FakeClient:
+    def __init__(self, webhooks):
+        self.webhooks = webhooks
+        self.calls = []
+        self.updates = {}
+
+    def iter_registry_webhooks(self):
+        self.calls.append(("list",))
+        return iter(self.webhooks)
+
+    def create_registry_webhook(self, webhook):
+        self.calls.append(("create", webhook["model_name"]))
+        return {"id": "new-" + webhook["model_name"]}
+
+    def update_registry_webhook(self, webhook_id, changes):
+        self.calls.append(("update", webhook_id))
+        self.updates[webhook_id] = changes
+        return {"id": webhook_id, **changes}
+
+
+def write_webhook(tmp_path, file_name, model_name, events):
+    path = tmp_path / file_name
+    path.write_text(
+        json.dumps(
+            {
+                "model_name": model_name,
+                "events": events,
+                "caller_url": WEBHOOK_URL,
+                "caller_auth_type": "bearer",
+                "description": "Notify the model team",
+            }
+        )
+    )
+    return load_webhook_spec(str(path))
+
+
+def test_load_webhook_spec(tmp_path):
+    """
+    This test asserts that the webhook file is parsed into a spec with the model name and normalized events.
+    """
+    spec = write_webhook(tmp_path, "churn.json", "churn", "TRANSITION_REQUEST_CREATED, MODEL_VERSION_CREATED")
+
+    assert spec.model_name == "churn"
+    assert spec.events == ("MODEL_VERSION_CREATED", "TRANSITION_REQUEST_CREATED")
+    assert spec.key == ("churn", spec.events, WEBHOOK_URL)
+
+
+def test_plan_and_apply_webhooks_reconciles(tmp_path):
+    """
+    This test asserts that webhooks are matched on model, events and url from a single listing, that
+    matched webhooks are updated with the current authorization, and that only the webhooks actually
+    created are returned.
+    """
+    specs = [
+        write_webhook(tmp_path, "churn.json", "churn", "MODEL_VERSION_CREATED"),
+        write_webhook(tmp_path, "fraud.json", "fraud", "MODEL_VERSION_CREATED"),
+        write_webhook(tmp_path, "risk.json", "risk", "MODEL_VERSION_CREATED"),
+    ]
+    existing = [
+        {
+            "id": "1",
+            "model_name": "churn",
+            "events": ["MODEL_VERSION_CREATED"],
+            "status": "ACTIVE",
+            "description": "Notify the model team",
+            "http_url_spec": {"url": WEBHOOK_URL},
+        },
+        {
+            "id": "2",
+            "model_name": "fraud",
+            "events": ["MODEL_VERSION_CREATED"],
+            "status": "DISABLED",
+            "description": "Notify the model team",
+            "http_url_spec": {"url": WEBHOOK_URL},
+        },
+        {
+            "id": "3",
+            "model_name": "risk",
+            "events": ["MODEL_VERSION_CREATED"],
+            "status": "ACTIVE",
+            "http_url_spec": {"url": "https://example.com/other"},
+        },
+    ]
+    client = FakeClient(existing)
+
+    plans = plan_webhooks(client, specs)
+    created, failures = apply_webhook_plans(client, plans, "secret-token")
+
+    assert [plan.action for plan in plans] == ["update", "update", "create"]
+    assert created == ["new-risk"]
+    assert failures == {}
+    assert sorted(client.calls) == [("create", "risk"), ("list",), ("update", "1"), ("update", "2")]
+    assert client.updates["1"]["http_url_spec"] == {"url": WEBHOOK_URL, "authorization": "Bearer secret-token"}
+    assert client.updates["2"]["status"] == "ACTIVE"
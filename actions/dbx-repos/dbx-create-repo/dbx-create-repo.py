@@ -1,10 +1,15 @@
 #!/usr/local/bin/python
 
 import argparse
+import logging
 import sys
 import os
 
-logger = LM.get_logger(__name__)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "dbx-common"))
+from dbx_client import DatabricksClient
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
 
 
 if __name__ == "__main__":
@@ -25,8 +30,8 @@ if __name__ == "__main__":
 
     try:
         # create connection to databricks and call reusable methods
-        dbx = Databricks(host=args.databricks_host, token=args.databricks_access_token, api_version="2.0")
-        resp = dbx.create_repo(repository_url=args.repository_url, repository_path=args.repository_path)
+        dbx = DatabricksClient(args.databricks_host, args.databricks_access_token)
+        resp = dbx.create_repo(url=args.repository_url, path=args.repository_path)
         # create environment variable repo_id to pass to the update and delete methods
         repo_id = resp["id"]
         with open(os.environ["GITHUB_OUTPUT"], "a") as github_output:
@@ -0,0 +1,106 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dbx-common"))
+from dbx_client import DatabricksClient
+from dbx_resolver import JOB, RESOURCE_KINDS, resolve_job_configs
+from dbx_snapshot import get_snapshot_store
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def report_unresolved(unresolved_by_path, fail_on_missing):
+    """
+    Logs every unresolved reference at once.
+    Returns True if any of them is of a type that must be resolved.
+    """
+    failed = False
+    for job_path, unresolved in unresolved_by_path.items():
+        for reference in unresolved:
+            message = f"{job_path}: {reference.kind} {reference.value} at {reference.location} not found in workspace"
+            if reference.kind in fail_on_missing:
+                logger.error(message)
+                failed = True
+            else:
+                logger.warning(f"{message}, assuming it is defined in the job config")
+    return failed
+
+
+def resolve_job_files(client, job_paths, kinds, fail_on_missing, snapshot_store=None):
+    """
+    Resolves the names used in the job config files into IDs and saves the updated configs back to the files.
+    Run job tasks always fail on a missing job, other types only when listed in fail_on_missing.
+    Returns False, leaving every file untouched, if a reference that must be resolved is not found.
+    """
+    job_configs = []
+    for job_path in job_paths:
+        with open(job_path) as f:
+            job_configs.append(json.load(f))
+
+    unresolved = resolve_job_configs(client, job_configs, kinds, snapshot_store=snapshot_store)
+
+    # a run job task always needs its job to exist
+    if report_unresolved(dict(zip(job_paths, unresolved)), set(fail_on_missing) | {JOB}):
+        return False
+
+    # Save the updated jobs back to the JSON files
+    for job_path, job_config in zip(job_paths, job_configs):
+        with open(job_path, "w") as f:
+            json.dump(job_config, f)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Resolve cluster policy, cluster, SQL warehouse and job names in Databricks job configs into IDs."
+    )
+    parser.add_argument(
+        "-d",
+        "--dbx_instance_url",
+        required=True,
+        help="URL for the databricks instance",
+    )
+    parser.add_argument(
+        "-t",
+        "--dbx_token",
+        required=True,
+        help="Personal access token for the databricks instance",
+    )
+    parser.add_argument(
+        "-j",
+        "--job_paths",
+        required=True,
+        help="Space seperated string of job config file paths",
+    )
+    parser.add_argument(
+        "-r",
+        "--resolve",
+        nargs="*",
+        choices=RESOURCE_KINDS,
+        default=list(RESOURCE_KINDS),
+        help="Resource types to resolve",
+    )
+    parser.add_argument(
+        "-f",
+        "--fail_on_missing",
+        nargs="*",
+        choices=RESOURCE_KINDS,
+        default=list(RESOURCE_KINDS),
+        help="Resource types that fail the action when a name is not found",
+    )
+
+    args = parser.parse_args()
+
+    client = DatabricksClient(args.dbx_instance_url, args.dbx_token)
+    if not resolve_job_files(
+        client,
+        args.job_paths.split(),
+        args.resolve,
+        args.fail_on_missing,
+        snapshot_store=get_snapshot_store(args.dbx_instance_url),
+    ):
+        exit(1)
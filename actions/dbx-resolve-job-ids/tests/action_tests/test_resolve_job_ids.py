@@ -0,0 +1,106 @@
+import json
+import logging
+
+from resolve_job_ids import report_unresolved, resolve_job_files
+from dbx_resolver import CLUSTER, JOB, POLICY, RESOURCE_KINDS, Reference
+
+
+class FakeClient:
+    """
+    Stands in for DatabricksClient, serving the resources of a workspace and counting the listings.
+    """
+
+    def __init__(self):
+        self.listings = []
+
+    def list_cluster_policies(self):
+        self.listings.append(POLICY)
+        return [{"name": "small", "policy_id": "P1"}]
+
+    def iter_clusters(self):
+        self.listings.append(CLUSTER)
+        yield {"cluster_name": "shared", "cluster_id": "0101-abc"}
+
+    def list_warehouses(self):
+        self.listings.append("warehouse")
+        return [{"name": "reporting", "id": "w1"}]
+
+    def iter_jobs(self):
+        self.listings.append(JOB)
+        yield {"job_id": 42, "settings": {"name": "upstream"}}
+
+
+def write_job_configs(tmp_path, job_configs):
+    paths = []
+    for file_name, job_config in job_configs.items():
+        path = tmp_path / file_name
+        path.write_text(json.dumps(job_config))
+        paths.append(str(path))
+    return paths
+
+
+def test_report_unresolved(caplog):
+    """
+    This test asserts that every unresolved reference is logged, as an error for the types that must be resolved
+    and as a warning for the others, and that only the former fail the report.
+    """
+    unresolved = {
+        "a.json": [Reference(CLUSTER, "missing_cluster", {}, "existing_cluster_id", "tasks[t].existing_cluster_id")],
+        "b.json": [Reference(POLICY, "missing_policy", {}, "policy_id", "tasks[t].new_cluster.policy_id")],
+    }
+
+    with caplog.at_level(logging.WARNING):
+        assert report_unresolved(unresolved, {POLICY})
+        assert not report_unresolved(unresolved, set())
+
+    errors = [record.getMessage() for record in caplog.records if record.levelno == logging.ERROR]
+    assert errors == ["b.json: policy missing_policy at tasks[t].new_cluster.policy_id not found in workspace"]
+    assert "assuming it is defined in the job config" in caplog.text
+
+
+def test_resolve_job_files_writes_resolved_configs(tmp_path):
+    """
+    This test asserts that names are resolved into IDs in every config file, that each referenced type is listed
+    once, and that types not referenced by name are not listed at all.
+    """
+    paths = write_job_configs(
+        tmp_path,
+        {
+            "a.json": {
+                "name": "a",
+                "tasks": [
+                    {"task_key": "t", "existing_cluster_id": "shared", "new_cluster": {"policy_id": "small"}},
+                ],
+            },
+            "b.json": {"name": "b", "tasks": [{"task_key": "t", "run_job_task": {"job_id": "upstream"}}]},
+        },
+    )
+    client = FakeClient()
+
+    assert resolve_job_files(client, paths, RESOURCE_KINDS, RESOURCE_KINDS)
+
+    with open(paths[0]) as f:
+        task = json.load(f)["tasks"][0]
+    assert task["existing_cluster_id"] == "0101-abc"
+    assert task["new_cluster"]["policy_id"] == "P1"
+    with open(paths[1]) as f:
+        assert json.load(f)["tasks"][0]["run_job_task"]["job_id"] == 42
+    assert sorted(client.listings) == [CLUSTER, JOB, POLICY]
+
+
+def test_resolve_job_files_fails_on_missing(tmp_path):
+    """
+    This test asserts that a missing job always fails, a missing type left out of fail_on_missing does not,
+    and that no config file is written when the action fails.
+    """
+    job_configs = {
+        "a.json": {"name": "a", "tasks": [{"task_key": "t", "existing_cluster_id": "other"}]},
+        "b.json": {"name": "b", "tasks": [{"task_key": "t", "run_job_task": {"job_id": "missing_job"}}]},
+    }
+    paths = write_job_configs(tmp_path, job_configs)
+
+    assert not resolve_job_files(FakeClient(), paths, RESOURCE_KINDS, [])
+    assert [json.loads(open(path).read()) for path in paths] == list(job_configs.values())
+
+    assert resolve_job_files(FakeClient(), paths[:1], RESOURCE_KINDS, [])
+    assert not resolve_job_files(FakeClient(), paths[:1], RESOURCE_KINDS, [CLUSTER])
@@ -0,0 +1,66 @@
+"""
+Microbenchmark for the SQL statement lexer.
+
+Generates comment-heavy DDL scripts of increasing size and times splitting them, so the
+per-MB cost can be checked to stay flat (linear scaling) as scripts grow.
+
+Usage: python benchmarks/benchmark_sql_lexer.py [--sizes-mb 1 2 4 8]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sql_lexer import iter_sql_statements
+
+STATEMENT_TEMPLATE = """-- table {i}: it's generated; do not edit
+/* owner: data-eng; "quoted" text */
+CREATE TABLE IF NOT EXISTS cat_dev.schema_{i}.`table;{i}` (
+  id BIGINT COMMENT 'identifier; primary',
+  name STRING COMMENT "display name -- not a comment"
+);
+ALTER TABLE cat_dev.schema_{i}.`table;{i}` SET TBLPROPERTIES ('delta.appendOnly' = 'true');
+"""
+
+
+def generate_script(size_bytes):
+    """
+    Build a script of at least size_bytes characters out of STATEMENT_TEMPLATE blocks.
+    """
+    blocks = []
+    total = 0
+    i = 0
+    while total < size_bytes:
+        block = STATEMENT_TEMPLATE.format(i=i)
+        blocks.append(block)
+        total += len(block)
+        i += 1
+    return "".join(blocks)
+
+
+def time_split(script, repeat):
+    """
+    Return the best of repeat timings of splitting the script, and the statement count.
+    """
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_sql_statements(io.StringIO(script)))
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SQL statement lexer")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 2, 4, 8], help="Script sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Timings per size, the best is reported")
+    args = parser.parse_args()
+
+    print(f"{'size (MB)':>10} {'statements':>11} {'seconds':>9} {'s/MB':>7}")
+    for size_mb in args.sizes_mb:
+        script = generate_script(int(size_mb * 1024 * 1024))
+        seconds, count = time_split(script, args.repeat)
+        print(f"{size_mb:>10g} {count:>11} {seconds:>9.3f} {seconds / size_mb:>7.3f}")
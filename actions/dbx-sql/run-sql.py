@@ -1,63 +1,28 @@
 """
 A script for running SQL on Databricks using the Databricks API.
 """
-from databricks import sql
 import argparse
-import pandas as pd
+import queue
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 
-def split_sql_statements(script):
-    """
-    Split a SQL script into individual statements. This will strip comments out of the statements as well.
-
-    :param script: A string containing one or more SQL statements.
-    :return: A list of individual SQL statements.
-    """
-    statements = []      # initialize an empty list to hold the SQL statements
-    statement = ""       # initialize an empty string to hold the current statement
-    in_string = False    # initialize a boolean variable to track whether we're inside a string literal
-    in_comment = False   # initialize a boolean variable to track whether we're inside a comment
-    comment_start = None # initialize a variable to track the start index of the current comment
-    
-    # Loop over each character in the script string
-    i = 0
-    while i < len(script):
-        c = script[i]
-        # If we encounter a semicolon that's not inside a string or comment,
-        # we've reached the end of a statement. Add the statement to the list
-        # of statements and start building a new statement.
-        if c == ";" and not in_string and not in_comment:
-            statements.append(statement.strip())
-            statement = ""
-        elif c == "'" and (i == 0 or script[i-1] != "\\"):
-            in_string = not in_string   # Toggle the in_string variable if we encounter a single-quote character
-            statement += c
-        elif c == "-" and i < len(script) - 1 and script[i+1] == "-":
-            in_comment = True   # Set the in_comment variable to True if we encounter a double-dash sequence
-            comment_start = i
-        elif c == "/" and i < len(script) - 1 and script[i+1] == "*":
-            in_comment = True   # Set the in_comment variable to True if we encounter a /* sequence
-            comment_start = i
-        elif c == "*" and i < len(script) - 1 and script[i+1] == "/":
-            in_comment = False   # Set the in_comment variable to False if we encounter a */ sequence
-            script = script[:comment_start] + script[i+2:]
-            i = comment_start - 1
-        elif c == "\n":
-            if in_comment and comment_start is not None:
-                script = script[:comment_start] + script[i+1:]
-                i = comment_start - 1
-            in_comment = False  # Reset the in_comment variable if we encounter a newline character
-            statement += c
-        elif not in_comment:
-            statement += c  # Add the current character to the statement string
-        i += 1
-    
-    # If there's still an unfinished statement at the end of the script, add it to the list of statements.
-    if statement.strip():
-        statements.append(statement.strip())
-    
-    return statements   # Return the list of individual SQL statements
+from sql_batch import SqlFileResult, format_results_table, read_manifest, resolve_sql_files, write_step_summary
+from sql_dependencies import creates_session_objects, run_in_dependency_order
+from sql_explain import find_planning_error, iter_plan_rows
+from sql_lexer import iter_sql_statements
 
+def databricks_sql():
+    """
+    Import the Databricks SQL connector on first use. The connector pulls in pyarrow and its
+    dependencies, so runs that stop before connecting, such as rejected inputs, never load it.
+
+    :return: The databricks.sql module.
+    """
+    from databricks import sql
+    return sql
 
 def clean_dbx_hostname(hostname):
     """
@@ -72,96 +37,304 @@ def clean_dbx_hostname(hostname):
         hostname = hostname.split(".net")[0] + ".net"
     return hostname
 
-def run_sql_on_dbx(host, warehouse_id, access_token, script):
+def validate_statement(statement):
     """
-    Connects to Databricks API and executes the SQL script on the specified Databricks SQL warehouse.
+    Check that a CREATE TABLE statement targets a DEV catalog. Other statements are not checked.
+
+    :param statement: The SQL statement to validate.
+    :return: True if the statement may be run, False otherwise.
+    """
+    if not statement.strip().upper().startswith("CREATE"):
+        return True
+    match = re.search(r'CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([`"]?[a-zA-Z0-9_]+[`"]?(?:\.[`"]?[a-zA-Z0-9_]+[`"]?){1,2})', statement, re.IGNORECASE)
+    if match:
+        full_name = match.group(1).replace("`", "").replace('"', '')
+        parts = full_name.split('.')
+        if len(parts) == 3:
+            catalog = parts[0]
+            if not catalog.lower().endswith('_dev'):
+                print("ERROR: Only those tables, whose catalog names conclude with '_dev', from DEV Catalogs, are permitted in the CREATE statements")
+                return False
+        elif len(parts) == 2:
+            print("INFO: Detected Hive Metastore format (schema.table) — skipping catalog validation.")
+        else:
+            print("ERROR: Invalid object name. Use schema.table or catalog.schema.table format.")
+            return False
+    else:
+        print("ERROR: No valid object identifier (schema.table or catalog.schema.table) found in CREATE statement.")
+        return False
+    return True
+
+# DDL and DML statements, skipped on a dry run. Other statements, such as USE, SET or GRANT, are never run
+MODIFYING_STATEMENTS = ("CREATE", "ALTER", "DROP", "TRUNCATE", "COMMENT", "DELETE", "UPDATE", "INSERT", "MERGE")
+
+def statement_needs_cursor(sql_statement, dry_run):
+    """
+    Check whether running a statement sends it to Databricks. Only those statements open a connection.
+
+    :param sql_statement: The SqlStatement to run.
+    :param dry_run: If True, DDL and DML statements are not sent to Databricks.
+    :return: True for EXPLAIN statements, and for DDL and DML statements outside of a dry run.
+    """
+    statement = sql_statement.text.strip().upper()
+    return statement.startswith("EXPLAIN") or (not dry_run and statement.startswith(MODIFYING_STATEMENTS))
+
+def execute_statement(cursor, sql_statement, dry_run):
+    """
+    Execute a single statement on the cursor.
+
+    :param cursor: The Databricks SQL cursor to execute the statement on, None if statement_needs_cursor is False.
+    :param sql_statement: The SqlStatement to execute.
+    :param dry_run: If True, DDL and DML statements are not sent to Databricks.
+    :return: True if the statement succeeded, False otherwise.
+    """
+    statement = sql_statement.text
+    print(f"------RUNNING SQL STATEMENT (line {sql_statement.line})-----\n {statement}")
+    if statement.strip().upper().startswith(MODIFYING_STATEMENTS):
+        try:
+            if not dry_run:
+                cursor.execute(statement)
+            else:
+                print("DRY RUN DETECTED: NOT RUNNING STATEMENT ON DATABRICKS")
+        except databricks_sql().Error as e:
+            print('ERROR:', e.args[0])
+            return False
+        else:
+            print(f"{statement.strip().split(' ')[0].upper()} SUCCESS\n")
+    elif statement.strip().upper().startswith(("EXPLAIN")):
+        try:
+            cursor.execute(statement)
+            planning_error = find_planning_error(iter_plan_rows(cursor))
+            if planning_error is not None:
+                print('ERROR:', planning_error)
+                return False
+        except Exception as e:
+            print(f"An unexpected error has occurred: {e}")
+            return False
+        else:
+            print("EXPLAIN successfully ran")
+    else:
+        print("INFO: Statement type not supported, skipping statement\n")
+    return True
+
+class ConnectionPool:
+    """
+    Connections to one SQL warehouse. Connections are opened when first needed and reused by
+    every statement and file run on the warehouse, with at most size of them open at once.
 
     :param host: The Databricks hostname to connect to.
     :param warehouse_id: The ID of the SQL Warehouse to execute SQL commands on.
     :param access_token: The Databricks access token.
-    :param script: The SQL script to be executed.
-    """
-    connection = sql.connect(
-        server_hostname=host,
-        http_path=f"/sql/1.0/warehouses/{warehouse_id}",
-        access_token=access_token)
-
-    cursor = connection.cursor()
-
-    # Split the script into individual statements and remove comments
-    sql_statements = split_sql_statements(script)
-    for statement in sql_statements:
-        print(f"------CHECKING FOR CREATE STATEMENT-----\n")
-        if statement.strip().upper().startswith("CREATE"):
-            match = re.search(r'CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?([`"]?[a-zA-Z0-9_]+[`"]?(?:\.[`"]?[a-zA-Z0-9_]+[`"]?){1,2})', statement, re.IGNORECASE)
-            if match:
-                full_name = match.group(1).replace("`", "").replace('"', '')
-                parts = full_name.split('.')
-                if len(parts) == 3:
-                    catalog = parts[0]
-                    if not catalog.lower().endswith('_dev'):
-                        print("ERROR: Only those tables, whose catalog names conclude with '_dev', from DEV Catalogs, are permitted in the CREATE statements")
-                        exit(1)
-                elif len(parts) == 2:
-                    print("INFO: Detected Hive Metastore format (schema.table) — skipping catalog validation.")
-                else:
-                    print("ERROR: Invalid object name. Use schema.table or catalog.schema.table format.")
-                    exit(1)
-            else:
-                print("ERROR: No valid object identifier (schema.table or catalog.schema.table) found in CREATE statement.")
-                exit(1)
-        
-            print(f"------RUNNING SQL STATEMENT-----\n {statement}")
-            if statement.strip().upper().startswith(("CREATE", "ALTER", "DROP", "TRUNCATE", "COMMENT", "DELETE", "UPDATE", "INSERT")):
-                try:
-                    if not args.dry_run:
-                        cursor.execute(statement)
-                    else:
-                        print("DRY RUN DETECTED: NOT RUNNING STATEMENT ON DATABRICKS")
-                except sql.Error as e:
-                    print('ERROR:', e.args[0])
-                    exit(1)
-                else:
-                    print(f"{statement.strip().split(' ')[0].upper()} SUCCESS\n")
-            elif statement.strip().upper().startswith(("EXPLAIN")):
-                try:
-                    ls = cursor.execute(statement).fetchall()
-                    df = pd.DataFrame(ls, columns=["plan"])
-                    output_message = ""
-                    for row in range(df["plan"].count()):
-                        output_message = output_message + str(df["plan"].loc[row])
-                    if "error occurred during query planning" in output_message.lower():
-                        print('ERROR:', output_message)
-                        exit(1)
-                except Exception as e:
-                    print(f"An unexpected error has occurred: {e}")
-                    exit(1)
-                else:
-                    print("EXPLAIN successfully ran")
-            else:
-                print("ERROR: Statement type not supported")
-                exit(1)
+    :param size: Maximum number of connections opened to the warehouse.
+    """
+    def __init__(self, host, warehouse_id, access_token, size=1):
+        self.host = host
+        self.warehouse_id = warehouse_id
+        self.access_token = access_token
+        self.size = size
+        self._idle_cursors = queue.LifoQueue()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock:
+            if len(self._connections) >= self.size:
+                return None
+            connection = databricks_sql().connect(
+                server_hostname=self.host,
+                http_path=f"/sql/1.0/warehouses/{self.warehouse_id}",
+                access_token=self.access_token)
+            self._connections.append(connection)
+            return connection.cursor()
+
+    @contextmanager
+    def cursor(self):
+        """
+        Borrow a cursor, opening a new connection if every open one is busy and the pool is not full.
+        """
+        try:
+            cursor = self._idle_cursors.get_nowait()
+        except queue.Empty:
+            cursor = self._connect() or self._idle_cursors.get()
+        try:
+            yield cursor
+        finally:
+            self._idle_cursors.put(cursor)
 
-    cursor.close()
-    connection.close()
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+
+def load_sql_file(file_path):
+    """
+    Read and split a SQL file into its statements.
+
+    :param file_path: Path of the SQL file.
+    :return: A list of the SqlStatements of the file.
+    """
+    with open(file_path, 'r') as sql_file:
+        return list(iter_sql_statements(sql_file))
+
+def validate_sql_files(sql_scripts):
+    """
+    Validate the statements of every file before any of them is run. Every invalid statement is reported.
+
+    :param sql_scripts: A mapping of file path to the SqlStatements of the file.
+    :return: True if every statement may be run, False otherwise.
+    """
+    valid = True
+    for file_path, sql_statements in sql_scripts.items():
+        print(f"------CHECKING FOR CREATE STATEMENTS IN {file_path}-----\n")
+        for sql_statement in sql_statements:
+            if not validate_statement(sql_statement.text):
+                print(f"ERROR: Invalid statement at {file_path}:{sql_statement.line}")
+                valid = False
+    return valid
+
+def run_statements(pool, sql_statements, dry_run=False, parallelism=1):
+    """
+    Executes the statements of a SQL script on a warehouse, stopping at the first failure.
+
+    With a parallelism above 1 independent statements are run concurrently on the pool's
+    connections. Statements touching the same object still run in source order, see sql_dependencies.
+    Scripts creating temporary views or functions run one statement after another on a single
+    connection, as those objects only exist in the session that created them.
+
+    :param pool: The ConnectionPool of the warehouse to run the statements on.
+    :param sql_statements: The SqlStatements of the script, in source order.
+    :param dry_run: If True, DDL and DML statements are not sent to Databricks.
+    :param parallelism: Maximum number of statements run concurrently.
+    :return: Whether every statement succeeded, and the number of statements that succeeded.
+    """
+    if parallelism > 1 and creates_session_objects(sql_statements):
+        print("Script creates temporary objects, running its statements on a single connection")
+        parallelism = 1
+    if parallelism <= 1:
+        statements_run = 0
+        with ExitStack() as stack:
+            cursor = None
+            for sql_statement in sql_statements:
+                # the cursor is borrowed by the first statement sent to Databricks
+                if cursor is None and statement_needs_cursor(sql_statement, dry_run):
+                    cursor = stack.enter_context(pool.cursor())
+                if not execute_statement(cursor, sql_statement, dry_run):
+                    return False, statements_run
+                statements_run += 1
+        return True, statements_run
+
+    succeeded_statements = []
+
+    def execute_on_pool(sql_statement):
+        if not statement_needs_cursor(sql_statement, dry_run):
+            succeeded = execute_statement(None, sql_statement, dry_run)
+        else:
+            with pool.cursor() as cursor:
+                succeeded = execute_statement(cursor, sql_statement, dry_run)
+        if succeeded:
+            succeeded_statements.append(sql_statement)
+        return succeeded
+
+    succeeded = run_in_dependency_order(sql_statements, execute_on_pool, parallelism)
+    return succeeded, len(succeeded_statements)
+
+def run_sql_on_dbx(host, warehouse_ids, access_token, sql_file_paths, dry_run=False, parallelism=1):
+    """
+    Connects to Databricks API and executes SQL files on the specified Databricks SQL warehouses.
+
+    Every file is validated before any is run. Files are then run one at a time per warehouse,
+    each warehouse taking the next pending file over connections reused across files. A failing
+    file stops at its failing statement without stopping the other files. An unexpected error,
+    such as a failed connection, fails the file and stops its warehouse from taking more files;
+    files no warehouse could run are reported as failed.
+
+    :param host: The Databricks hostname to connect to.
+    :param warehouse_ids: The IDs of the SQL Warehouses to spread the files over.
+    :param access_token: The Databricks access token.
+    :param sql_file_paths: Paths of the SQL files to be executed.
+    :param dry_run: If True, DDL and DML statements are not sent to Databricks.
+    :param parallelism: Maximum number of statements of a file run concurrently.
+    :return: A list of SqlFileResult, in the order of sql_file_paths.
+    """
+    sql_scripts = {file_path: load_sql_file(file_path) for file_path in sql_file_paths}
+    if not validate_sql_files(sql_scripts):
+        exit(1)
+
+    pending_files = queue.Queue()
+    for file_path in sql_file_paths:
+        pending_files.put(file_path)
+    results = {}
+
+    def run_files_on_warehouse(pool):
+        while True:
+            try:
+                file_path = pending_files.get_nowait()
+            except queue.Empty:
+                return
+            print(f"======RUNNING {file_path} ON SQL WAREHOUSE {pool.warehouse_id}======\n")
+            start = time.monotonic()
+            try:
+                succeeded, statements_run = run_statements(pool, sql_scripts[file_path], dry_run, parallelism)
+            except Exception as e:
+                print(f"ERROR: {file_path} failed on SQL warehouse {pool.warehouse_id}: {e}")
+                results[file_path] = SqlFileResult(
+                    file_path, pool.warehouse_id, "FAILED", 0, len(sql_scripts[file_path]), time.monotonic() - start)
+                return
+            results[file_path] = SqlFileResult(
+                file_path,
+                pool.warehouse_id,
+                "SUCCESS" if succeeded else "FAILED",
+                statements_run,
+                len(sql_scripts[file_path]),
+                time.monotonic() - start)
+
+    pools = [ConnectionPool(host, warehouse_id, access_token, parallelism) for warehouse_id in warehouse_ids]
+    try:
+        with ThreadPoolExecutor(max_workers=len(pools)) as executor:
+            for future in [executor.submit(run_files_on_warehouse, pool) for pool in pools]:
+                future.result()
+    finally:
+        for pool in pools:
+            pool.close()
+    for file_path in sql_file_paths:
+        if file_path not in results:
+            print(f"ERROR: {file_path} was not run, no SQL warehouse was available")
+            results[file_path] = SqlFileResult(file_path, "-", "FAILED", 0, len(sql_scripts[file_path]), 0.0)
+    return [results[file_path] for file_path in sql_file_paths]
 
 ## Main
-parser = argparse.ArgumentParser(
-                prog='Run SQL on Databricks',
-                description='This script takes an SQL file and runs it on the provided Databricks SQL Warehouse')
-parser.add_argument("-n", "--databricks-hostname", required=True, help="The Databricks Hostname to run SQL on")
-parser.add_argument("-w", "--sql-warehouse-id", required=True, help="The Databricks SQL Warehouse HTTP path")
-parser.add_argument("-t", "--databricks-token", required=True, help="Databricks Token for authentication")
-parser.add_argument("-f", "--file-path", required=True, help="File path to SQL to be run")
-parser.add_argument("--dry-run", action='store_true', help="Initiate a dry run of the script. This will do everything except run the script on Databricks.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+                    prog='Run SQL on Databricks',
+                    description='This script takes SQL files and runs them on the provided Databricks SQL Warehouses')
+    parser.add_argument("-n", "--databricks-hostname", required=True, help="The Databricks Hostname to run SQL on")
+    parser.add_argument("-w", "--sql-warehouse-id", required=True, nargs="+", help="The Databricks SQL Warehouse IDs, files are spread over the warehouses")
+    parser.add_argument("-t", "--databricks-token", required=True, help="Databricks Token for authentication")
+    parser.add_argument("-f", "--file-path", nargs="*", default=[], help="File paths or globs of the SQL to be run")
+    parser.add_argument("-m", "--manifest", help="File listing the paths or globs of the SQL to be run, one per line")
+    parser.add_argument("--dry-run", action='store_true', help="Initiate a dry run of the script. This will do everything except run the script on Databricks.")
+    parser.add_argument("-p", "--parallelism", type=int, default=1, help="Maximum number of independent statements run concurrently, 1 runs them one after another")
+
+    args = parser.parse_args()
 
-args = parser.parse_args()
+    sql_file_patterns = list(args.file_path)
+    if args.manifest:
+        sql_file_patterns += read_manifest(args.manifest)
+    if not sql_file_patterns:
+        parser.error("at least one SQL file must be given with --file-path or --manifest")
+    try:
+        sql_file_paths = resolve_sql_files(sql_file_patterns)
+    except FileNotFoundError as e:
+        print('ERROR:', e)
+        exit(1)
 
-with open(args.file_path, 'r') as sql_file:
-    script = sql_file.read()
+    # Clean the Databricks hostname if needed
+    dbx_hostname = clean_dbx_hostname(args.databricks_hostname)
 
-# Clean the Databricks hostname if needed
-dbx_hostname = clean_dbx_hostname(args.databricks_hostname)
+    # Run the SQL files
+    results = run_sql_on_dbx(dbx_hostname, args.sql_warehouse_id, args.databricks_token, sql_file_paths, args.dry_run, args.parallelism)
 
-# Run the SQL script
-run_sql_on_dbx(dbx_hostname, args.sql_warehouse_id, args.databricks_token, script)
+    results_table = format_results_table(results)
+    print(results_table)
+    write_step_summary(results_table)
+    if any(result.status != "SUCCESS" for result in results):
+        exit(1)
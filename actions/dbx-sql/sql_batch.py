@@ -0,0 +1,94 @@
+"""
+Helpers for running many SQL files in one run-sql.py process: resolving the files to run from
+paths, globs and manifests, and reporting the result of each file.
+"""
+import glob
+import os
+from typing import Iterable, List, NamedTuple, Optional
+
+
+class SqlFileResult(NamedTuple):
+    """
+    The outcome of running one SQL file.
+
+    :ivar path: Path of the SQL file.
+    :ivar warehouse_id: ID of the SQL warehouse the file was run on.
+    :ivar status: SUCCESS or FAILED.
+    :ivar statements_run: Number of statements that succeeded.
+    :ivar statements_total: Number of statements in the file.
+    :ivar seconds: Time spent running the file.
+    """
+
+    path: str
+    warehouse_id: str
+    status: str
+    statements_run: int
+    statements_total: int
+    seconds: float
+
+
+def read_manifest(manifest_path: str) -> List[str]:
+    """
+    Read a manifest listing one SQL file path or glob per line. Blank lines and lines starting with # are ignored.
+
+    :param manifest_path: Path of the manifest file.
+    :return: The paths and globs listed in the manifest, in order.
+    """
+    with open(manifest_path, "r") as manifest:
+        lines = [line.strip() for line in manifest]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def resolve_sql_files(patterns: Iterable[str]) -> List[str]:
+    """
+    Expand paths and globs (``**`` is recursive) into the list of SQL files to run.
+    Glob matches are sorted, and a file matched more than once is only run the first time.
+
+    :param patterns: Paths or globs, in the order the files should run.
+    :return: The resolved file paths.
+    :raises FileNotFoundError: If a path does not exist or a glob matches no file.
+    """
+    resolved = {}
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        else:
+            matches = [pattern] if os.path.isfile(pattern) else []
+        if not matches:
+            raise FileNotFoundError(f"No SQL file found for {pattern}")
+        for path in matches:
+            resolved.setdefault(os.path.normpath(path), None)
+    return list(resolved)
+
+
+def format_results_table(results: Iterable[SqlFileResult]) -> str:
+    """
+    Format the per-file results as a markdown table, readable in logs and in the job summary.
+
+    :param results: The results of the files, in the order they were given.
+    :return: The markdown table.
+    """
+    lines = [
+        "| File | Warehouse | Status | Statements | Seconds |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    for result in results:
+        lines.append(
+            f"| {result.path} | {result.warehouse_id} | {result.status} "
+            f"| {result.statements_run}/{result.statements_total} | {result.seconds:.1f} |"
+        )
+    return "\n".join(lines)
+
+
+def write_step_summary(markdown: str, summary_path: Optional[str] = None) -> None:
+    """
+    Append markdown to the GitHub Actions job summary, if the script runs in a workflow.
+
+    :param markdown: The markdown to append.
+    :param summary_path: Path of the summary file, defaults to $GITHUB_STEP_SUMMARY.
+    """
+    summary_path = summary_path or os.environ.get("GITHUB_STEP_SUMMARY")
+    if not summary_path:
+        return
+    with open(summary_path, "a") as summary:
+        print(markdown, file=summary)
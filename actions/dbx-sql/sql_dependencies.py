@@ -0,0 +1,197 @@
+"""
+Dependency analysis and scheduling of SQL statements for parallel execution.
+
+Each statement is reduced to the objects (catalogs, schemas, tables, views...) it reads and
+writes. Two statements conflict when one writes an object the other reads or writes, and
+conflicting statements keep their source order. Statements that cannot be analysed act as
+barriers: they run after every earlier statement and before every later one. Scripts creating
+temporary views or functions cannot be spread over connections at all, see creates_session_objects.
+
+Object names are compared conservatively: ``s.t`` and ``cat.s.t`` may name the same table
+and ``cat.s`` contains ``cat.s.t``, so names conflict whenever the parts of one appear
+contiguously in the other.
+"""
+import heapq
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, FrozenSet, List, NamedTuple, Sequence, Tuple
+
+from sql_lexer import SqlStatement
+
+ObjectName = Tuple[str, ...]
+
+_IDENTIFIER = r"(?:`(?:[^`]|``)+`|\w+)"
+_NAME = rf"{_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER})*"
+_OBJECT_TYPES = r"(?:TABLE|VIEW|SCHEMA|DATABASE|CATALOG|FUNCTION|VOLUME)"
+
+# String literals are blanked before analysis so their contents cannot look like object names
+_STRING_LITERALS = re.compile(r"'(?:\\.|''|[^'\\])*'|\"(?:\\.|\"\"|[^\"\\])*\"", re.DOTALL)
+_EXPLAIN_PREFIX = re.compile(r"^\s*EXPLAIN\s+(?:(?:EXTENDED|CODEGEN|COST|FORMATTED)\s+)?", re.IGNORECASE)
+_DYNAMIC_NAMES = re.compile(r"\bIDENTIFIER\s*\(", re.IGNORECASE)
+
+_WRITE_PATTERNS = [
+    re.compile(
+        r"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:GLOBAL\s+)?(?:TEMP(?:ORARY)?\s+)?(?:EXTERNAL\s+)?"
+        rf"(?:MATERIALIZED\s+|STREAMING\s+)?{_OBJECT_TYPES}\s+(?:IF\s+NOT\s+EXISTS\s+)?({_NAME})",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        rf"^\s*(?:ALTER|DROP)\s+(?:MATERIALIZED\s+|STREAMING\s+)?{_OBJECT_TYPES}\s+(?:IF\s+EXISTS\s+)?({_NAME})",
+        re.IGNORECASE,
+    ),
+    re.compile(rf"^\s*TRUNCATE\s+TABLE\s+({_NAME})", re.IGNORECASE),
+    re.compile(rf"^\s*COMMENT\s+ON\s+(?:TABLE|SCHEMA|DATABASE|CATALOG|VOLUME)\s+({_NAME})", re.IGNORECASE),
+    re.compile(rf"^\s*DELETE\s+FROM\s+({_NAME})", re.IGNORECASE),
+    re.compile(rf"^\s*UPDATE\s+({_NAME})", re.IGNORECASE),
+    re.compile(rf"^\s*INSERT\s+(?:INTO|OVERWRITE)\s+(?:TABLE\s+)?({_NAME})", re.IGNORECASE),
+    re.compile(rf"^\s*MERGE\s+INTO\s+({_NAME})", re.IGNORECASE),
+    re.compile(rf"\bRENAME\s+TO\s+({_NAME})", re.IGNORECASE),
+]
+# COMMENT ON COLUMN names the column, the object written is its table
+_COMMENT_ON_COLUMN = re.compile(rf"^\s*COMMENT\s+ON\s+COLUMN\s+({_NAME})", re.IGNORECASE)
+# USING names the source of a MERGE, and the data source of a CREATE TABLE (a harmless extra read)
+_READ_PATTERN = re.compile(rf"\b(?:FROM|JOIN|REFERENCES|LIKE|CLONE|USING)\s+({_NAME})", re.IGNORECASE)
+# Temporary views and functions only exist in the session, i.e. the connection, that created them
+_SESSION_OBJECT = re.compile(
+    r"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:GLOBAL\s+)?TEMP(?:ORARY)?\s+(?:VIEW|FUNCTION|TABLE)\b", re.IGNORECASE
+)
+
+
+class StatementObjects(NamedTuple):
+    """
+    The objects a statement depends on.
+
+    :ivar reads: Names of the objects the statement reads.
+    :ivar writes: Names of the objects the statement creates, modifies or drops.
+    :ivar barrier: True when the statement could not be analysed and must not run concurrently with any other.
+    """
+
+    reads: FrozenSet[ObjectName]
+    writes: FrozenSet[ObjectName]
+    barrier: bool
+
+
+def parse_object_name(name: str) -> ObjectName:
+    """
+    Split a possibly qualified and backtick quoted object name into its lower-cased parts.
+
+    :param name: An object name such as ``cat.`my schema`.tbl``.
+    :return: The parts of the name, e.g. ``("cat", "my schema", "tbl")``.
+    """
+    parts = re.findall(_IDENTIFIER, name)
+    return tuple(part[1:-1].replace("``", "`").lower() if part.startswith("`") else part.lower() for part in parts)
+
+
+def statement_objects(statement: str) -> StatementObjects:
+    """
+    Work out which objects a statement reads and writes.
+
+    :param statement: A single SQL statement without comments.
+    :return: The objects read and written by the statement.
+    """
+    statement = _STRING_LITERALS.sub("''", statement)
+    explain = _EXPLAIN_PREFIX.match(statement)
+    if explain:
+        statement = statement[explain.end():]
+
+    if _DYNAMIC_NAMES.search(statement):
+        return StatementObjects(frozenset(), frozenset(), True)
+
+    writes = {parse_object_name(match.group(1)) for pattern in _WRITE_PATTERNS for match in pattern.finditer(statement)}
+    column = _COMMENT_ON_COLUMN.match(statement)
+    if column:
+        writes.add(parse_object_name(column.group(1))[:-1])
+    reads = {parse_object_name(match.group(1)) for match in _READ_PATTERN.finditer(statement)}
+
+    if explain:
+        # EXPLAIN only plans the statement, but planning needs every object it touches to exist
+        return StatementObjects(frozenset(reads | writes), frozenset(), False)
+    return StatementObjects(frozenset(reads), frozenset(writes), not writes)
+
+
+def creates_session_objects(statements: Sequence[SqlStatement]) -> bool:
+    """
+    Whether a script creates temporary objects, which later statements can only see on the same connection.
+
+    :param statements: The statements of the script.
+    :return: True if any statement creates a temporary view or function.
+    """
+    return any(_SESSION_OBJECT.match(statement.text) for statement in statements)
+
+
+def names_overlap(first: ObjectName, second: ObjectName) -> bool:
+    """
+    Whether two object names may refer to the same object or to an object and its container.
+    """
+    shorter, longer = sorted((first, second), key=len)
+    return any(longer[start : start + len(shorter)] == shorter for start in range(len(longer) - len(shorter) + 1))
+
+
+def _conflict(earlier: StatementObjects, later: StatementObjects) -> bool:
+    if earlier.barrier or later.barrier:
+        return True
+    return any(
+        names_overlap(written, name)
+        for written in earlier.writes
+        for name in later.reads | later.writes
+    ) or any(names_overlap(written, name) for written in later.writes for name in earlier.reads)
+
+
+def build_dependency_graph(statements: Sequence[SqlStatement]) -> List[List[int]]:
+    """
+    Build the dependency graph of a script's statements.
+
+    :param statements: The statements of the script, in source order.
+    :return: For each statement, the indexes of the earlier statements it must run after.
+    """
+    objects = [statement_objects(statement.text) for statement in statements]
+    return [
+        [earlier for earlier in range(later) if _conflict(objects[earlier], objects[later])]
+        for later in range(len(statements))
+    ]
+
+
+def run_in_dependency_order(
+    statements: Sequence[SqlStatement],
+    execute: Callable[[SqlStatement], bool],
+    max_workers: int,
+) -> bool:
+    """
+    Run statements on a pool of worker threads, starting each one as soon as every statement it
+    depends on has succeeded. Ready statements are started in source order. After the first
+    failure no further statements are started, and the ones already running are waited for.
+
+    :param statements: The statements of the script, in source order.
+    :param execute: Runs a statement on the calling worker thread, returning False if it failed.
+    :param max_workers: Number of statements run concurrently.
+    :return: True if every statement succeeded.
+    """
+    dependencies = build_dependency_graph(statements)
+    dependents: List[List[int]] = [[] for _ in statements]
+    for later, earlier_statements in enumerate(dependencies):
+        for earlier in earlier_statements:
+            dependents[earlier].append(later)
+    remaining = [len(earlier_statements) for earlier_statements in dependencies]
+    ready = [index for index, count in enumerate(remaining) if count == 0]
+    heapq.heapify(ready)
+
+    succeeded = True
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while True:
+            while ready and succeeded:
+                index = heapq.heappop(ready)
+                running[executor.submit(execute, statements[index])] = index
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                if not future.result():
+                    succeeded = False
+                    continue
+                for later in dependents[index]:
+                    remaining[later] -= 1
+                    if remaining[later] == 0:
+                        heapq.heappush(ready, later)
+    return succeeded
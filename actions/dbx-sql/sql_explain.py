@@ -0,0 +1,48 @@
+"""
+Streaming evaluation of EXPLAIN output.
+
+Databricks reports a plan that cannot be built as a successful EXPLAIN whose plan text contains
+PLANNING_ERROR_MARKER. Plan rows are fetched a batch at a time and scanning stops at the first
+occurrence of the marker, so large plans are never held in memory.
+"""
+from typing import Iterable, Iterator, Optional
+
+PLANNING_ERROR_MARKER = "error occurred during query planning"
+# Plan rows fetched per round trip
+PLAN_FETCH_SIZE = 100
+
+
+def iter_plan_rows(cursor, fetch_size: int = PLAN_FETCH_SIZE) -> Iterator[str]:
+    """
+    Yield the plan text of each row of an executed EXPLAIN, fetching fetch_size rows at a time.
+
+    :param cursor: A cursor on which an EXPLAIN statement was executed.
+    :param fetch_size: Number of rows fetched per call to ``fetchmany``.
+    :return: A generator of the plan text of each row.
+    """
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield str(row[0])
+
+
+def find_planning_error(plan_rows: Iterable[str], marker: str = PLANNING_ERROR_MARKER) -> Optional[str]:
+    """
+    Search plan text for the planning error marker, stopping at the first match.
+    The marker is matched case-insensitively, including when it is split across rows.
+
+    :param plan_rows: The plan text of each row, in order.
+    :param marker: The text reporting a planning error.
+    :return: The row in which the marker was found, or None if the plan has no planning error.
+    """
+    marker = marker.lower()
+    # end of the text already scanned, long enough to hold all but the last character of the marker
+    tail = ""
+    for text in plan_rows:
+        window = tail + text.lower()
+        if marker in window:
+            return text
+        tail = window[max(0, len(window) - len(marker) + 1) :]
+    return None
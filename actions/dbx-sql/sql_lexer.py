@@ -0,0 +1,134 @@
+"""
+Single-pass SQL statement splitter for Databricks SQL scripts.
+
+Statements are yielded lazily from a text stream, with comments stripped. The lexer
+understands every Databricks SQL quoting form:
+
+- single and double quoted string literals, with backslash escapes and doubled quotes,
+- backtick quoted identifiers, with doubled backticks,
+- ``--`` line comments and (nested) ``/* */`` block comments.
+
+A ``;`` inside any of these does not end a statement.
+"""
+import io
+import re
+from typing import Iterator, List, NamedTuple, TextIO
+
+# Tokens that change the lexer state outside of literals and comments
+_NORMAL_TOKENS = re.compile(r"[;'\"`]|--|/\*")
+# Tokens that can end a quoted literal, backslash escapes are consumed as a pair
+_QUOTED_TOKENS = {
+    "'": re.compile(r"\\.|'", re.DOTALL),
+    '"': re.compile(r'\\.|"', re.DOTALL),
+    "`": re.compile(r"`"),
+}
+_BLOCK_COMMENT_TOKENS = re.compile(r"/\*|\*/")
+
+
+class SqlStatement(NamedTuple):
+    """
+    A statement of a SQL script.
+
+    :ivar text: The statement without comments, surrounding whitespace or the terminating ``;``.
+    :ivar line: 1-based line on which the statement starts.
+    :ivar offset: 0-based character offset in the script at which the statement starts.
+    """
+
+    text: str
+    line: int
+    offset: int
+
+
+def iter_sql_statements(stream: TextIO) -> Iterator[SqlStatement]:
+    """
+    Split a SQL script into individual statements, stripping comments.
+
+    The stream is read one line at a time and each statement is yielded as soon as its
+    terminating ``;`` (or the end of the stream) is reached, so the work and memory are
+    linear in the size of the script.
+
+    :param stream: A text stream containing one or more SQL statements.
+    :return: A generator of the non-empty statements, in source order.
+    """
+    pieces: List[str] = []
+    start_line = start_offset = None
+    quote = None  # quote character of the literal being read, if any
+    comment_depth = 0  # nesting depth of the block comment being read, if any
+    line_offset = 0
+
+    for line_number, line in enumerate(stream, start=1):
+        pos = 0
+        length = len(line)
+        while pos < length:
+            if comment_depth:
+                match = _BLOCK_COMMENT_TOKENS.search(line, pos)
+                if match is None:
+                    break
+                comment_depth += 1 if match.group() == "/*" else -1
+                pos = match.end()
+                continue
+
+            if quote:
+                match = _QUOTED_TOKENS[quote].search(line, pos)
+                if match is None:
+                    pieces.append(line[pos:])
+                    break
+                pieces.append(line[pos : match.end()])
+                pos = match.end()
+                if match.group() == quote:
+                    if quote == "`" and line.startswith("`", pos):
+                        # doubled backtick inside an identifier
+                        pieces.append("`")
+                        pos += 1
+                    else:
+                        quote = None
+                continue
+
+            match = _NORMAL_TOKENS.search(line, pos)
+            end = match.start() if match else length
+            text = line[pos:end]
+            if start_line is None and text.strip():
+                start_line = line_number
+                start_offset = line_offset + pos + len(text) - len(text.lstrip())
+            pieces.append(text)
+            if match is None:
+                break
+
+            token = match.group()
+            pos = match.end()
+            if token == ";":
+                statement = "".join(pieces).strip()
+                if statement:
+                    yield SqlStatement(statement, start_line, start_offset)
+                pieces = []
+                start_line = start_offset = None
+            elif token == "--":
+                # drop the rest of the line but keep its line break
+                if line.endswith("\n"):
+                    pieces.append("\n")
+                break
+            elif token == "/*":
+                comment_depth = 1
+                pieces.append(" ")
+            else:
+                if start_line is None:
+                    start_line = line_number
+                    start_offset = line_offset + match.start()
+                quote = token
+                pieces.append(token)
+
+        line_offset += length
+
+    statement = "".join(pieces).strip()
+    if statement:
+        yield SqlStatement(statement, start_line, start_offset)
+
+
+def split_sql_statements(script: str) -> List[str]:
+    """
+    Split a SQL script into individual statements. This will strip comments out of the statements as well.
+
+    :param script: A string containing one or more SQL statements.
+    :return: A list of individual SQL statements.
+    """
+    return [statement.text for statement in iter_sql_statements(io.StringIO(script))]
@@ -0,0 +1,213 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+# run-sql.py is not importable by name because of the hyphen
+spec = importlib.util.spec_from_file_location(
+    "run_sql", os.path.join(os.path.dirname(__file__), "..", "..", "run-sql.py")
+)
+run_sql = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(run_sql)
+
+
+class FakeSqlError(Exception):
+    pass
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, statement):
+        if "fail" in statement:
+            raise FakeSqlError("statement failed")
+        with self.connection.connector.lock:
+            self.connection.connector.executed.append((self.connection.warehouse_id, statement.strip()))
+
+    def fetchmany(self, size):
+        return []
+
+
+class FakeConnection:
+    def __init__(self, connector, warehouse_id):
+        self.connector = connector
+        self.warehouse_id = warehouse_id
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnector:
+    """
+    Stands in for the databricks.sql module, recording the statements run on each warehouse.
+    Connections to the warehouses in unreachable fail, and the other warehouses only connect once
+    a connection has been refused, so every warehouse takes a file.
+    """
+
+    Error = FakeSqlError
+
+    def __init__(self, unreachable=()):
+        self.unreachable = unreachable
+        self.executed = []
+        self.connections = []
+        self.lock = threading.Lock()
+        self.refused = threading.Event()
+
+    def connect(self, server_hostname, http_path, access_token):
+        warehouse_id = http_path.rsplit("/", 1)[-1]
+        if warehouse_id in self.unreachable:
+            self.refused.set()
+            raise ConnectionError(f"cannot reach {warehouse_id}")
+        if self.unreachable:
+            self.refused.wait(timeout=5)
+        connection = FakeConnection(self, warehouse_id)
+        with self.lock:
+            self.connections.append(connection)
+        return connection
+
+
+@pytest.fixture
+def connector(monkeypatch):
+    connector = FakeConnector()
+    monkeypatch.setattr(run_sql, "databricks_sql", lambda: connector)
+    return connector
+
+
+def write_sql_files(tmp_path, scripts):
+    paths = []
+    for name, script in scripts.items():
+        path = tmp_path / name
+        path.write_text(script)
+        paths.append(str(path))
+    return paths
+
+
+def test_run_sql_on_dbx(connector, tmp_path):
+    """
+    This test asserts that every file is run statement by statement and that a failing statement
+    only fails its own file.
+    """
+    paths = write_sql_files(
+        tmp_path,
+        {
+            "a.sql": "CREATE TABLE a_dev.s.a (id INT);\nINSERT INTO a_dev.s.a VALUES (1);",
+            "b.sql": "INSERT INTO a_dev.s.fail VALUES (1);\nDROP TABLE a_dev.s.b;",
+        },
+    )
+
+    results = run_sql.run_sql_on_dbx("host", ["w1"], "token", paths)
+
+    assert [(result.status, result.statements_run, result.statements_total) for result in results] == [
+        ("SUCCESS", 2, 2),
+        ("FAILED", 0, 2),
+    ]
+    assert [statement for _, statement in connector.executed] == [
+        "CREATE TABLE a_dev.s.a (id INT)",
+        "INSERT INTO a_dev.s.a VALUES (1)",
+    ]
+    assert all(connection.closed for connection in connector.connections)
+
+
+def test_run_sql_on_dbx_skips_unsupported_statements(connector, tmp_path):
+    """
+    This test asserts that MERGE statements are run and that statements the action does not run,
+    such as USE, SET or GRANT, are skipped without failing the file.
+    """
+    paths = write_sql_files(
+        tmp_path,
+        {
+            "a.sql": "USE CATALOG a_dev;\nSET spark.sql.ansi.enabled = true;\nCREATE TABLE a_dev.s.t (id INT);\n"
+            "MERGE INTO a_dev.s.t USING a_dev.s.u ON t.id = u.id WHEN NOT MATCHED THEN INSERT *;\n"
+            "GRANT SELECT ON TABLE a_dev.s.t TO users;"
+        },
+    )
+
+    results = run_sql.run_sql_on_dbx("host", ["w1"], "token", paths)
+
+    assert [(result.status, result.statements_run, result.statements_total) for result in results] == [
+        ("SUCCESS", 5, 5)
+    ]
+    assert [statement.split()[0] for _, statement in connector.executed] == ["CREATE", "MERGE"]
+
+
+def test_run_sql_on_dbx_unreachable_warehouse(monkeypatch, tmp_path):
+    """
+    This test asserts that a warehouse failing to connect fails its file instead of aborting the run,
+    and that the other warehouse runs the remaining files.
+    """
+    connector = FakeConnector(unreachable=("down",))
+    monkeypatch.setattr(run_sql, "databricks_sql", lambda: connector)
+    paths = write_sql_files(
+        tmp_path, {f"{name}.sql": f"CREATE TABLE a_dev.s.{name} (id INT);" for name in ["a", "b", "c", "d"]}
+    )
+
+    results = run_sql.run_sql_on_dbx("host", ["down", "up"], "token", paths)
+
+    failed = [result for result in results if result.status == "FAILED"]
+    assert len(failed) == 1 and failed[0].warehouse_id == "down"
+    assert {result.warehouse_id for result in results if result.status == "SUCCESS"} == {"up"}
+    assert len(connector.executed) == 3
+
+
+def test_run_sql_on_dbx_no_warehouse(monkeypatch, tmp_path):
+    """
+    This test asserts that files are reported as failed when no warehouse can run them.
+    """
+    monkeypatch.setattr(run_sql, "databricks_sql", lambda: FakeConnector(unreachable=("down",)))
+    paths = write_sql_files(tmp_path, {"a.sql": "CREATE TABLE a_dev.s.a (id INT);", "b.sql": "DROP TABLE a_dev.s.b;"})
+
+    results = run_sql.run_sql_on_dbx("host", ["down"], "token", paths)
+
+    assert [(result.warehouse_id, result.status) for result in results] == [("down", "FAILED"), ("-", "FAILED")]
+
+
+def test_run_statements_pins_temporary_objects_to_one_connection(connector, tmp_path):
+    """
+    This test asserts that a script creating a temporary view runs on a single connection in
+    source order, even with a parallelism above 1.
+    """
+    statements = run_sql.load_sql_file(
+        write_sql_files(
+            tmp_path,
+            {
+                "a.sql": "CREATE TEMP VIEW v AS SELECT 1;\nCREATE TABLE a_dev.s.t AS SELECT * FROM v;\n"
+                "CREATE TABLE a_dev.s.u (id INT);"
+            },
+        )[0]
+    )
+    pool = run_sql.ConnectionPool("host", "w1", "token", size=4)
+
+    assert run_sql.run_statements(pool, statements, parallelism=4) == (True, 3)
+    assert len(connector.connections) == 1
+    assert [statement.split()[1] for _, statement in connector.executed] == ["TEMP", "TABLE", "TABLE"]
+
+
+def test_dry_run_of_ddl_never_imports_connector(tmp_path):
+    """
+    This test asserts that a dry run of a DDL only file neither connects to a warehouse nor imports
+    the Databricks SQL connector.
+    """
+    sql_file = tmp_path / "ddl.sql"
+    sql_file.write_text("CREATE TABLE a_dev.s.t (id INT);\nALTER TABLE a_dev.s.t SET TBLPROPERTIES ('k' = 'v');")
+    env = {key: value for key, value in os.environ.items() if key != "GITHUB_STEP_SUMMARY"}
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", spec.origin, "-n", "host", "-w", "w1", "-t", "token",
+         "-f", str(sql_file), "--dry-run"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env=env,
+    )
+
+    assert process.returncode == 0, process.stdout + process.stderr
+    assert "| SUCCESS | 2/2 |" in process.stdout
+    assert not [line for line in process.stderr.splitlines() if line.split("|")[-1].strip().startswith("databricks")]
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from sql_batch import SqlFileResult, format_results_table, read_manifest, resolve_sql_files, write_step_summary
+
+
+def test_resolve_sql_files(tmp_path):
+    """
+    This test asserts that paths and globs are expanded in order, sorted per glob and without duplicates.
+    """
+    for name in ["b.sql", "a.sql", "nested/c.sql"]:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text("SELECT 1")
+
+    resolved = resolve_sql_files([str(tmp_path / "b.sql"), str(tmp_path / "**" / "*.sql")])
+    assert resolved == [
+        os.path.normpath(tmp_path / "b.sql"),
+        os.path.normpath(tmp_path / "a.sql"),
+        os.path.normpath(tmp_path / "nested" / "c.sql"),
+    ]
+
+    with pytest.raises(FileNotFoundError):
+        resolve_sql_files([str(tmp_path / "*.missing")])
+
+
+def test_read_manifest(tmp_path):
+    """
+    This test asserts that blank lines and comments are ignored in a manifest.
+    """
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# tables\nddl/a.sql\n\n  ddl/views/*.sql  \n")
+    assert read_manifest(str(manifest)) == ["ddl/a.sql", "ddl/views/*.sql"]
+
+
+def test_format_results_table(tmp_path):
+    """
+    This test asserts that the results table has one row per file and is appended to the step summary.
+    """
+    table = format_results_table(
+        [
+            SqlFileResult("a.sql", "w1", "SUCCESS", 3, 3, 1.23),
+            SqlFileResult("b.sql", "w2", "FAILED", 1, 4, 0.5),
+        ]
+    )
+    assert table.splitlines()[2:] == [
+        "| a.sql | w1 | SUCCESS | 3/3 | 1.2 |",
+        "| b.sql | w2 | FAILED | 1/4 | 0.5 |",
+    ]
+
+    summary = tmp_path / "summary.md"
+    write_step_summary(table, str(summary))
+    assert summary.read_text() == table + "\n"
@@ -0,0 +1,120 @@
+import threading
+
+from sql_dependencies import (
+    build_dependency_graph,
+    creates_session_objects,
+    names_overlap,
+    run_in_dependency_order,
+    statement_objects,
+)
+from sql_lexer import SqlStatement, split_sql_statements
+
+
+def to_statements(script):
+    return [SqlStatement(text, line, 0) for line, text in enumerate(split_sql_statements(script), start=1)]
+
+
+def test_statement_objects():
+    """
+    This test asserts that the objects read and written by a statement are extracted, ignoring string literals.
+    """
+    objects = statement_objects("CREATE VIEW a_dev.s.v COMMENT 'copy from a_dev.s.x' AS SELECT * FROM a_dev.s.`My Table` JOIN s.t")
+    assert objects.writes == {("a_dev", "s", "v")}
+    assert objects.reads == {("a_dev", "s", "my table"), ("s", "t")}
+    assert not objects.barrier
+
+    assert statement_objects("COMMENT ON COLUMN a_dev.s.t.id IS 'key'").writes == {("a_dev", "s", "t")}
+    assert statement_objects("ALTER TABLE s.t RENAME TO s.u").writes == {("s", "t"), ("s", "u")}
+    assert statement_objects("EXPLAIN INSERT INTO a_dev.s.t SELECT * FROM a_dev.s.u").writes == frozenset()
+    assert statement_objects("SELECT * FROM IDENTIFIER(:table)").barrier
+
+
+def test_names_overlap():
+    """
+    This test asserts that partially qualified names and containers are treated as overlapping.
+    """
+    assert names_overlap(("s", "t"), ("a_dev", "s", "t"))
+    assert names_overlap(("a_dev", "s"), ("a_dev", "s", "t"))
+    assert not names_overlap(("a_dev", "s", "t"), ("a_dev", "s", "u"))
+
+
+def test_build_dependency_graph():
+    """
+    This test asserts that only statements touching the same object depend on each other.
+    """
+    statements = to_statements(
+        """
+        CREATE SCHEMA IF NOT EXISTS a_dev.s;
+        CREATE TABLE a_dev.s.t (id INT);
+        CREATE TABLE a_dev.s.u (id INT);
+        COMMENT ON TABLE a_dev.s.t IS 't';
+        ALTER TABLE a_dev.s.u SET TBLPROPERTIES ('k' = 'v');
+        EXPLAIN SELECT * FROM a_dev.s.t;
+        EXPLAIN SELECT * FROM a_dev.s.u;
+        """
+    )
+    assert build_dependency_graph(statements) == [[], [0], [0], [0, 1], [0, 2], [0, 1, 3], [0, 2, 4]]
+
+
+def test_run_in_dependency_order():
+    """
+    This test asserts that independent statements run concurrently and dependent statements keep their order.
+    """
+    statements = to_statements(
+        "CREATE TABLE a_dev.s.t (id INT); CREATE TABLE a_dev.s.u (id INT); "
+        "ALTER TABLE a_dev.s.t SET TBLPROPERTIES ('k' = 'v'); ALTER TABLE a_dev.s.u SET TBLPROPERTIES ('k' = 'v')"
+    )
+    both_creates_started = threading.Barrier(2, timeout=5)
+    completed = []
+    lock = threading.Lock()
+
+    def execute(statement):
+        if statement.text.startswith("CREATE"):
+            # only passes if both creates run at the same time
+            both_creates_started.wait()
+        with lock:
+            completed.append(statement.line)
+        return True
+
+    assert run_in_dependency_order(statements, execute, max_workers=4)
+    assert completed.index(1) < completed.index(3)
+    assert completed.index(2) < completed.index(4)
+
+
+def test_run_in_dependency_order_failure():
+    """
+    This test asserts that no further statements are started after a statement fails.
+    """
+    statements = to_statements("CREATE TABLE a_dev.s.t (id INT); ALTER TABLE a_dev.s.t SET TBLPROPERTIES ('k' = 'v')")
+    executed = []
+
+    def execute(statement):
+        executed.append(statement.line)
+        return False
+
+    assert not run_in_dependency_order(statements, execute, max_workers=2)
+    assert executed == [1]
+
+
+def test_merge_runs_after_writes_to_its_source():
+    """
+    This test asserts that the source of a MERGE is read, so the MERGE waits for an INSERT into that source.
+    """
+    objects = statement_objects("MERGE INTO a_dev.s.t USING a_dev.s.src ON t.id = src.id WHEN MATCHED THEN DELETE")
+    assert objects.reads == {("a_dev", "s", "src")}
+    assert objects.writes == {("a_dev", "s", "t")}
+
+    statements = to_statements(
+        "INSERT INTO a_dev.s.src VALUES (1); "
+        "MERGE INTO a_dev.s.t USING a_dev.s.src ON t.id = src.id WHEN MATCHED THEN DELETE"
+    )
+    assert build_dependency_graph(statements) == [[], [0]]
+
+
+def test_creates_session_objects():
+    """
+    This test asserts that scripts creating temporary views or functions are recognised.
+    """
+    assert creates_session_objects(to_statements("CREATE OR REPLACE TEMP VIEW v AS SELECT 1; SELECT * FROM v"))
+    assert creates_session_objects(to_statements("CREATE TEMPORARY FUNCTION f() RETURNS INT RETURN 1"))
+    assert not creates_session_objects(to_statements("CREATE VIEW a_dev.s.v AS SELECT 1"))
@@ -0,0 +1,35 @@
+from sql_explain import find_planning_error, iter_plan_rows
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = 0
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+def test_find_planning_error():
+    """
+    This test asserts that the planning error marker is found case-insensitively, even across rows.
+    """
+    assert find_planning_error(["== Physical Plan ==", "Scan a_dev.s.t"]) is None
+    assert find_planning_error(["== Physical Plan ==", "An ERROR occurred during query planning: x"]) == (
+        "An ERROR occurred during query planning: x"
+    )
+    assert find_planning_error(["... error occurred during ", "query planning"]) == "query planning"
+
+
+def test_find_planning_error_stops_early():
+    """
+    This test asserts that plan rows are fetched in batches and no batch after the error is fetched.
+    """
+    cursor = FakeCursor(
+        [("row",)] * 150 + [("Error occurred during query planning",)] + [("row",)] * 1000
+    )
+    assert find_planning_error(iter_plan_rows(cursor, fetch_size=100)) == "Error occurred during query planning"
+    assert cursor.fetches == 2
+    assert len(cursor.rows) == 951
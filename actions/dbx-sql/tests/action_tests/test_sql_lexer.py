@@ -0,0 +1,82 @@
+import io
+
+from sql_lexer import SqlStatement, iter_sql_statements, split_sql_statements
+
+
+def test_split_sql_statements():
+    """
+    This test asserts that statements are split on semicolons and comments are stripped.
+    """
+    script = """
+-- create the table
+CREATE TABLE a_dev.b.c (id INT); -- trailing comment
+/* block
+   comment; with a semicolon */
+ALTER TABLE a_dev.b.c SET TBLPROPERTIES ('x' = 'y');
+COMMENT ON TABLE a_dev.b.c IS 'no terminator'
+"""
+    assert split_sql_statements(script) == [
+        "CREATE TABLE a_dev.b.c (id INT)",
+        "ALTER TABLE a_dev.b.c SET TBLPROPERTIES ('x' = 'y')",
+        "COMMENT ON TABLE a_dev.b.c IS 'no terminator'",
+    ]
+
+
+def test_split_sql_statements_quoting():
+    """
+    This test asserts that semicolons and comment markers inside every quoting form are kept in the statement.
+    """
+    script = (
+        "SELECT 'a;b', 'it''s; -- not a comment', 'esc\\'; /*' FROM t;\n"
+        'SELECT "x;y", "say \\"hi;\\"" FROM t;\n'
+        "SELECT `weird;col`, `back``tick;` FROM t;\n"
+        "SELECT 'multi\nline; string' FROM t"
+    )
+    assert split_sql_statements(script) == [
+        "SELECT 'a;b', 'it''s; -- not a comment', 'esc\\'; /*' FROM t",
+        'SELECT "x;y", "say \\"hi;\\"" FROM t',
+        "SELECT `weird;col`, `back``tick;` FROM t",
+        "SELECT 'multi\nline; string' FROM t",
+    ]
+
+
+def test_split_sql_statements_comments():
+    """
+    This test asserts that quotes inside comments are ignored and nested block comments are handled.
+    """
+    script = (
+        "SELECT 1; -- it's a comment with a quote\n"
+        "SELECT /* outer /* inner; */ still comment; */ 2;\n"
+        "SELECT 3 /* it's */;;\n"
+    )
+    assert split_sql_statements(script) == ["SELECT 1", "SELECT   2", "SELECT 3"]
+
+
+def test_iter_sql_statements_positions():
+    """
+    This test asserts that each statement reports the line and character offset at which it starts.
+    """
+    script = "-- header\n  SELECT 1;\n\n/* c */ SELECT\n 2; 'x'"
+    assert list(iter_sql_statements(io.StringIO(script))) == [
+        SqlStatement("SELECT 1", 2, 12),
+        SqlStatement("SELECT\n 2", 4, 31),
+        SqlStatement("'x'", 5, 42),
+    ]
+    for statement in iter_sql_statements(io.StringIO(script)):
+        assert script[statement.offset :].startswith(statement.text.split()[0])
+
+
+def test_iter_sql_statements_is_lazy():
+    """
+    This test asserts that the first statement is yielded before the rest of the stream is read.
+    """
+    lines_read = []
+
+    def stream():
+        for line in ["SELECT 1;\n", "SELECT 2;\n", "SELECT 3;\n"]:
+            lines_read.append(line)
+            yield line
+
+    statements = iter_sql_statements(stream())
+    assert next(statements).text == "SELECT 1"
+    assert len(lines_read) == 1